@@ -10,7 +10,7 @@ a = Analysis(
     hookspath=[],
     hooksconfig={},
     runtime_hooks=[],
-    excludes=[],
+    excludes=['tkinter', 'tkcalendar', 'matplotlib', 'IPython', 'pytest'],
     noarchive=False,
     optimize=0,
 )
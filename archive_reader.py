@@ -0,0 +1,148 @@
+import os
+import re
+import gzip
+import struct
+import zipfile
+from datetime import datetime
+from collections import namedtuple
+
+# A CSV file inside a zip archive is addressed as '<archive path>::<member name>'
+ARCHIVE_MEMBER_SEPARATOR = "::"
+ZIP_SUFFIX = ".zip"
+GZIP_SUFFIX = ".csv.gz"
+ARCHIVE_MEMBER_PATTERN = re.compile(r"^(.*?\.zip)::(.+)$", re.IGNORECASE | re.DOTALL)
+
+# Same fields as the os.stat() result that the parse cache, the SQLite store and the watcher compare
+SourceStat = namedtuple("SourceStat", ["st_size", "st_mtime", "st_mtime_ns"])
+
+# Archives whose member index source_stat() keeps, so the central directory is not read again for every member
+ZIP_INDEX_CACHE_SIZE = 64
+# archive path -> (archive size, archive mtime_ns, {member name: (size, mtime)})
+_zip_indexes = {}
+
+def archive_member_path(archive_path, member_name):
+    """Returns the path of a zip archive member, e.g. 'exports_2024-05.zip::2024-05/.24-05-02.KE5538 01.Defects.csv'."""
+    return f"{archive_path}{ARCHIVE_MEMBER_SEPARATOR}{member_name}"
+
+def split_archive_path(file_path):
+    """Returns (archive path, member name) for a zip archive member, or (file_path, None) for any other file."""
+    match = ARCHIVE_MEMBER_PATTERN.match(file_path)
+    if match is None:
+        return file_path, None
+    return match.group(1), match.group(2)
+
+def is_zip_file_name(file_name):
+    return file_name.lower().endswith(ZIP_SUFFIX)
+
+def is_gzip_file_name(file_name):
+    return file_name.lower().endswith(GZIP_SUFFIX)
+
+def is_csv_member_name(member_name, excluded_suffix):
+    """Returns True if a zip member is a CSV file that is not one of our own outputs (excluded_suffix)."""
+    member_name = member_name.lower()
+    return member_name.endswith(".csv") and not member_name.endswith(excluded_suffix)
+
+def is_compressed_source(file_path):
+    """Returns True if the file is read through decompression (a zip member or a .csv.gz file)."""
+    return split_archive_path(file_path)[1] is not None or is_gzip_file_name(file_path)
+
+def source_file_name(file_path):
+    """
+    Returns the name the Coil No and the date are taken from: the member name without its folders for a zip member,
+    the file name otherwise.
+    """
+    _, member_name = split_archive_path(file_path)
+    if member_name is not None:
+        return member_name.replace("\\", "/").rsplit("/", 1)[-1]
+    return os.path.basename(file_path)
+
+def zip_member_mtime(member_info):
+    """Returns the modification time stored for a zip member, as a timestamp in local time."""
+    return datetime(*member_info.date_time).timestamp()
+
+def zip_member_index(archive_path):
+    """
+    Returns {member name: (size, mtime)} of every member of a zip archive. The index is kept per archive path
+    and read again only when the size or mtime of the archive file has changed.
+    """
+    archive_stat = os.stat(archive_path)
+    cached_index = _zip_indexes.get(archive_path)
+    if cached_index is not None and cached_index[0] == archive_stat.st_size and cached_index[1] == archive_stat.st_mtime_ns:
+        return cached_index[2]
+
+    with zipfile.ZipFile(archive_path) as archive:
+        member_index = {
+            member_info.filename: (member_info.file_size, zip_member_mtime(member_info))
+            for member_info in archive.infolist()
+            if not member_info.is_dir()
+        }
+    _zip_indexes.pop(archive_path, None)
+    if len(_zip_indexes) >= ZIP_INDEX_CACHE_SIZE:
+        del _zip_indexes[next(iter(_zip_indexes))]
+    _zip_indexes[archive_path] = (archive_stat.st_size, archive_stat.st_mtime_ns, member_index)
+    return member_index
+
+def list_zip_members(archive_path, excluded_suffix):
+    """Returns [(member name, mtime, size)] of the CSV members of a zip archive."""
+    return [
+        (member_name, member_mtime, member_size)
+        for member_name, (member_size, member_mtime) in zip_member_index(archive_path).items()
+        if is_csv_member_name(member_name, excluded_suffix)
+    ]
+
+def gzip_mtime(file_path, fallback_mtime):
+    """
+    Returns the modification time of the original file from the gzip header,
+    or fallback_mtime if the header does not record one (MTIME 0).
+    """
+    with open(file_path, 'rb') as f:
+        header = f.read(8)
+    if len(header) < 8 or header[:2] != b"\x1f\x8b":
+        return fallback_mtime
+    header_mtime = struct.unpack("<I", header[4:8])[0]
+    return float(header_mtime) if header_mtime else fallback_mtime
+
+def source_stat(file_path):
+    """
+    Returns the size and modification time of a source file: os.stat() for a file on disk,
+    the uncompressed size and the stored timestamp for a zip member. Raises OSError if it does not exist.
+    The members of an archive are looked up in its cached index (see zip_member_index).
+    """
+    archive_path, member_name = split_archive_path(file_path)
+    if member_name is None:
+        return os.stat(file_path)
+    try:
+        member_size, member_mtime = zip_member_index(archive_path)[member_name]
+    except (KeyError, zipfile.BadZipFile) as e:
+        raise OSError(f"Failed to read '{member_name}' in '{archive_path}': {e}") from e
+    return SourceStat(member_size, member_mtime, int(member_mtime * 1_000_000_000))
+
+def read_source_bytes(file_path):
+    """
+    Returns the whole content of a zip member or a .csv.gz file, decompressed in memory.
+    Nothing is extracted to disk.
+    """
+    archive_path, member_name = split_archive_path(file_path)
+    if member_name is not None:
+        with zipfile.ZipFile(archive_path) as archive:
+            return archive.read(member_name)
+    with gzip.open(file_path, 'rb') as f:
+        return f.read()
+
+def open_source_file(file_path):
+    """Opens a source file as a binary stream, decompressing zip members and .csv.gz files on the fly."""
+    archive_path, member_name = split_archive_path(file_path)
+    if member_name is None:
+        if is_gzip_file_name(file_path):
+            return gzip.open(file_path, 'rb')
+        return open(file_path, 'rb')
+
+    archive = zipfile.ZipFile(archive_path)
+    try:
+        member_stream = archive.open(member_name)
+    except Exception:
+        archive.close()
+        raise
+    # The member stream keeps the archive file open until it is closed itself
+    archive.close()
+    return member_stream
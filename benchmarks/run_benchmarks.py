@@ -0,0 +1,212 @@
+import os
+import sys
+import json
+import time
+import shutil
+import tempfile
+import argparse
+from datetime import datetime
+
+from benchmarks.sdd_generator import generate_sdd_folder, make_class_weights
+from console.buffered_console import BufferedConsole
+from console.dynamic_console import DynamicConsole
+from csv_parser import parse_csv_sections, PARSER_MODES, CSV_ENGINES
+from data_processor import extract_coil_no_from_filename, process_records, concat_processed_records, PROCESSED_RECORD_COLUMNS
+from file_scanner import find_csv_files
+from excel_processor.excel_exporter import export_to_excel
+from output_processor.columnar_exporter import export_columnar, OUTPUT_FORMATS
+
+STAGES = ["scan", "parse", "transform", "concat", "export"]
+DEFAULT_BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.json")
+DEFAULT_TOLERANCE = 0.25
+# Stages faster than this in both runs are not compared; their timing is mostly noise
+MIN_COMPARED_SECONDS = 0.05
+# Written next to the generated files with the generator settings, so a --dataPath folder can be reused
+DATA_MARKER_FILE_NAME = "benchmark_data.json"
+
+def run_pipeline_once(data_path, output_path, file_count, parser_mode, csv_engine, output_format):
+    """
+    Runs scan, parse, transform, concat and export one after another on the data folder.
+    Returns ({stage: seconds}, number of compiled records, messages logged by the pipeline).
+    """
+    console_buffer = BufferedConsole()
+    stage_seconds = {}
+
+    stage_start = time.perf_counter()
+    csv_files = find_csv_files(data_path, datetime(1970, 1, 2), datetime(2100, 1, 1), console_buffer, use_manifest=False)
+    stage_seconds["scan"] = time.perf_counter() - stage_start
+    if len(csv_files) != file_count:
+        console_buffer.print_message(f"Error: The scan found {len(csv_files)} files, {file_count} were generated.", "error")
+
+    stage_start = time.perf_counter()
+    parsed_files = [(file_path, parse_csv_sections(file_path, console_buffer, parser_mode, csv_engine)) for file_path in csv_files]
+    stage_seconds["parse"] = time.perf_counter() - stage_start
+
+    stage_start = time.perf_counter()
+    processed_frames = []
+    for file_path, (top_df, bottom_df) in parsed_files:
+        coil_no = extract_coil_no_from_filename(os.path.basename(file_path), console_buffer)
+        processed_frames.append(process_records(top_df, coil_no, "Top"))
+        processed_frames.append(process_records(bottom_df, coil_no, "Bottom"))
+    stage_seconds["transform"] = time.perf_counter() - stage_start
+
+    stage_start = time.perf_counter()
+    final_df = concat_processed_records(processed_frames).reindex(columns=PROCESSED_RECORD_COLUMNS, fill_value=None)
+    stage_seconds["concat"] = time.perf_counter() - stage_start
+
+    stage_start = time.perf_counter()
+    if output_format == "xlsx":
+        export_to_excel(final_df, output_path, "Benchmark.xlsx", console_buffer, "native")
+    else:
+        export_columnar(final_df, output_path, "Benchmark", output_format, console_buffer)
+    stage_seconds["export"] = time.perf_counter() - stage_start
+
+    return stage_seconds, len(final_df), console_buffer.messages
+
+def prepare_data_folder(data_path, file_count, top_rows, bottom_rows, distinct_classes, seed, console_instance):
+    """
+    Generates the SDD files in data_path, or reuses them if the folder already holds the files of a run with the
+    same settings. Returns the total number of data rows in the files.
+    """
+    settings = {"files": file_count, "top_rows": top_rows, "bottom_rows": bottom_rows, "distinct_classes": distinct_classes, "seed": seed}
+    marker_path = os.path.join(data_path, DATA_MARKER_FILE_NAME)
+    try:
+        with open(marker_path, 'r', encoding='utf-8') as f:
+            marker = json.load(f)
+        csv_file_count = sum(1 for file_name in os.listdir(data_path) if file_name.endswith(".csv"))
+        if marker.get("settings") == settings and csv_file_count == file_count:
+            console_instance.print_message(f"Reusing the {file_count} SDD files in '{data_path}'.", "info")
+            return marker["source_rows"]
+    except (OSError, ValueError, KeyError):
+        pass
+
+    console_instance.print_message(f"Generating {file_count} SDD files in '{data_path}'...", "info")
+    # Removed first, so an interrupted generation is not taken for a complete one
+    if os.path.exists(marker_path):
+        os.remove(marker_path)
+    class_weights = make_class_weights(distinct_classes) if distinct_classes > 0 else None
+    _, source_rows = generate_sdd_folder(data_path, file_count, top_rows, bottom_rows, class_weights, seed)
+    with open(marker_path, 'w', encoding='utf-8') as f:
+        json.dump({"settings": settings, "source_rows": source_rows}, f, indent=2)
+    return source_rows
+
+def stage_results(stage_seconds, file_count, row_count):
+    """Returns {stage: {seconds, files_per_second, rows_per_second}}; rows are the data rows of the source files."""
+    return {
+        stage: {
+            "seconds": round(seconds, 4),
+            "files_per_second": round(file_count / seconds, 2) if seconds > 0 else None,
+            "rows_per_second": round(row_count / seconds, 1) if seconds > 0 else None,
+        }
+        for stage, seconds in stage_seconds.items()
+    }
+
+def compare_with_baseline(results, baseline, tolerance):
+    """
+    Returns the list of regression messages: stages whose rows/s fell more than tolerance below the baseline.
+    Throughput is compared rather than seconds, so a baseline from a run of another size still applies.
+    Stages that take less than MIN_COMPARED_SECONDS in both runs are skipped.
+    """
+    regressions = []
+    for stage, baseline_stage in baseline.get("stages", {}).items():
+        current_stage = results["stages"].get(stage)
+        if current_stage is None or not baseline_stage.get("rows_per_second") or not current_stage["rows_per_second"]:
+            continue
+        if max(current_stage["seconds"], baseline_stage["seconds"]) < MIN_COMPARED_SECONDS:
+            continue
+        ratio = current_stage["rows_per_second"] / baseline_stage["rows_per_second"]
+        if ratio < 1 - tolerance:
+            regressions.append(f"{stage}: {current_stage['rows_per_second']:.0f} rows/s is {1 - ratio:.0%} below the baseline ({baseline_stage['rows_per_second']:.0f} rows/s)")
+    return regressions
+
+def print_results(results, console_instance):
+    """Prints one line per stage and the end-to-end throughput."""
+    config = results["config"]
+    console_instance.print_message(f"{config['files']} files, {config['source_rows']} source rows, {results['records']} compiled records "
+                                   f"(parser {config['parser']}, engine {config['csv_engine']}, format {config['format']}, best of {config['repeat']}):", "info")
+    for stage in STAGES:
+        stage_result = results["stages"][stage]
+        console_instance.print_message(f"  {stage:<10} {stage_result['seconds']:>9.3f} s {stage_result['files_per_second'] or 0:>12.1f} files/s {stage_result['rows_per_second'] or 0:>14.0f} rows/s", "info")
+    total = results["total"]
+    console_instance.print_message(f"  {'total':<10} {total['seconds']:>9.3f} s {total['files_per_second'] or 0:>12.1f} files/s {total['rows_per_second'] or 0:>14.0f} rows/s", "info")
+
+def main():
+    parser = argparse.ArgumentParser(description="Measures the throughput of each stage of the SDD compiler on synthetic SDD exports.")
+    parser.add_argument("--files", type=int, default=200, help="Number of generated files. Default: 200")
+    parser.add_argument("--topRows", type=int, default=2000, help="Data rows in the Top section of each file. Default: 2000")
+    parser.add_argument("--bottomRows", type=int, default=1000, help="Data rows in the Bottom section of each file. Default: 1000")
+    parser.add_argument("--distinctClasses", type=int, default=0, help="Use this many synthetic class names instead of the default class names.")
+    parser.add_argument("--seed", type=int, default=0, help="Random seed of the generator. Default: 0")
+    parser.add_argument("--dataPath", required=False, help="Folder for the generated files. It is kept, and reused by later runs with the same --files, --topRows, --bottomRows, --distinctClasses and --seed. Default: a temporary folder")
+    parser.add_argument("--parser", choices=PARSER_MODES, default="mmap", help="CSV section parser. Default: mmap")
+    parser.add_argument("--csvEngine", choices=CSV_ENGINES, default="c", help="CSV engine. Default: c")
+    parser.add_argument("--format", choices=OUTPUT_FORMATS, default="xlsx", help="Output format of the export stage. Default: xlsx")
+    parser.add_argument("--repeat", type=int, default=3, help="Run the pipeline this many times and keep the fastest time of each stage. Default: 3")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE_PATH, help="Baseline JSON file. Default: benchmarks/baseline.json")
+    parser.add_argument("--saveBaseline", action="store_true", help="Store the results as the new baseline instead of comparing with it.")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE, help=f"Allowed slowdown of a stage against the baseline, as a fraction. Default: {DEFAULT_TOLERANCE}")
+    parser.add_argument("--output", required=False, help="Also write the results to this JSON file.")
+    args = parser.parse_args()
+
+    console_output = DynamicConsole
+    temp_folder = tempfile.mkdtemp(prefix="sdd_benchmark_")
+    data_path = args.dataPath or os.path.join(temp_folder, "data")
+    output_path = os.path.join(temp_folder, "output")
+    os.makedirs(output_path)
+
+    try:
+        source_rows = prepare_data_folder(data_path, args.files, args.topRows, args.bottomRows, args.distinctClasses, args.seed, console_output)
+
+        best_seconds = {}
+        record_count = 0
+        for run_index in range(max(args.repeat, 1)):
+            stage_seconds, record_count, messages = run_pipeline_once(data_path, output_path, args.files, args.parser, args.csvEngine, args.format)
+            BufferedConsole.replay([message for message in messages if message[1] == "error"], console_output)
+            for stage, seconds in stage_seconds.items():
+                best_seconds[stage] = min(seconds, best_seconds.get(stage, seconds))
+    finally:
+        shutil.rmtree(temp_folder, ignore_errors=True)
+
+    total_seconds = sum(best_seconds.values())
+    results = {
+        "config": {
+            "files": args.files, "source_rows": source_rows, "top_rows": args.topRows, "bottom_rows": args.bottomRows,
+            "distinct_classes": args.distinctClasses, "parser": args.parser, "csv_engine": args.csvEngine,
+            "format": args.format, "repeat": args.repeat,
+        },
+        "records": record_count,
+        "stages": stage_results(best_seconds, args.files, source_rows),
+        "total": stage_results({"total": total_seconds}, args.files, source_rows)["total"],
+    }
+    print_results(results, console_output)
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+
+    if args.saveBaseline:
+        with open(args.baseline, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+        console_output.print_message(f"Baseline saved to '{args.baseline}'.", "success")
+        return 0
+
+    if not os.path.exists(args.baseline):
+        console_output.print_message(f"No baseline at '{args.baseline}', so nothing is compared. Baselines depend on the machine and none is committed: run once with --saveBaseline to store one.", "warning")
+        return 0
+
+    with open(args.baseline, 'r', encoding='utf-8') as f:
+        baseline = json.load(f)
+    if {key: baseline.get("config", {}).get(key) for key in ["parser", "csv_engine", "format"]} != {key: results["config"][key] for key in ["parser", "csv_engine", "format"]}:
+        console_output.print_message("Warning: The baseline was recorded with another parser, engine or format. Run with the same options or store a new baseline.", "warning")
+        return 0
+
+    regressions = compare_with_baseline(results, baseline, args.tolerance)
+    if regressions:
+        for regression in regressions:
+            console_output.print_message(f"Regression: {regression}", "error")
+        return 1
+    console_output.print_message(f"No stage is more than {args.tolerance:.0%} slower than the baseline.", "success")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,109 @@
+import os
+import random
+import argparse
+from datetime import datetime, timedelta
+
+from csv_parser import COMMON_HEADER_STR
+
+# Class names in the SDD form "<Class>-<Grade>-<Area>-<Defect Name>", with relative frequencies.
+# The empty name stands for unclassified defects, which the compiler skips.
+DEFAULT_CLASS_WEIGHTS = {
+    "Scratch-A1-Center-Long Scratch": 30,
+    "Dent-B2-Edge-Small Dent": 20,
+    "Oil-C1-Center-Oil Stain": 15,
+    "Roll Mark-A2-Center-Periodic Mark": 10,
+    "Hole-A1-Edge-Pin Hole": 5,
+    "Edge Crack-B1-Edge-Crack": 5,
+    "Dirt-C3": 5,
+    "Inclusion": 5,
+    "": 5,
+}
+
+def make_class_weights(distinct_count, empty_ratio=0.05, skew=1.0):
+    """
+    Returns {class name: weight} for distinct_count synthetic class names with Zipf-like weights
+    (the first name is the most frequent), plus the empty class name for empty_ratio of the rows.
+    """
+    weights = {}
+    for rank in range(1, distinct_count + 1):
+        weights[f"Class{rank:03d}-{'ABC'[rank % 3]}{rank % 5 + 1}-Zone{rank % 4 + 1}-Defect {rank:03d}"] = 1.0 / rank ** skew
+    if empty_ratio > 0:
+        weights[""] = sum(weights.values()) * empty_ratio / (1 - empty_ratio)
+    return weights
+
+def sdd_file_name(line_name, file_date, coil_no, sequence):
+    """Returns a file name in the SDD pattern '<line>.YY-MM-DD.XX1234 NN.Defects.csv'."""
+    return f"{line_name}.{file_date.strftime('%y-%m-%d')}.{coil_no} {sequence % 100:02d}.Defects.csv"
+
+def _section_lines(row_count, first_defect_no, class_names, class_weights, rng, coil_length_m):
+    """Returns the CSV lines of one section; Top m grows along the coil like in a real export."""
+    picked_class_names = rng.choices(class_names, weights=class_weights, k=row_count)
+    positions = sorted(rng.uniform(0, coil_length_m) for _ in range(row_count))
+    lines = []
+    for row_index, (class_name, top_m) in enumerate(zip(picked_class_names, positions)):
+        distance_left = rng.uniform(0, 1500)
+        distance_right = 1500 - distance_left
+        lines.append(
+            f"{first_defect_no + row_index},{class_name},{top_m:.2f},{distance_left:.1f},{distance_right:.1f},"
+            f"{distance_left - 750:.1f},{rng.uniform(0.1, 80):.2f},{rng.uniform(0.1, 40):.2f},"
+            f"{rng.random():.4f},{rng.choice([0, 45, 90, 135])}"
+        )
+    return lines
+
+def write_sdd_file(file_path, top_rows, bottom_rows, class_weights=None, rng=None, coil_length_m=3000.0):
+    """
+    Writes one synthetic SDD export: 3 header lines, the Top rows, a blank line, the 'Bottom' line,
+    2 header lines and the Bottom rows. Returns the number of data rows written.
+    """
+    class_weights = class_weights or DEFAULT_CLASS_WEIGHTS
+    rng = rng or random.Random()
+    class_names = list(class_weights.keys())
+    weights = list(class_weights.values())
+
+    lines = ["SDD Defect Export", "Top", COMMON_HEADER_STR]
+    lines += _section_lines(top_rows, 1, class_names, weights, rng, coil_length_m)
+    lines += ["", "Bottom", "Surface,Bottom", COMMON_HEADER_STR]
+    lines += _section_lines(bottom_rows, top_rows + 1, class_names, weights, rng, coil_length_m)
+
+    with open(file_path, 'w', encoding='utf-8', newline='') as f:
+        f.write("\r\n".join(lines) + "\r\n")
+    return top_rows + bottom_rows
+
+def generate_sdd_folder(folder_path, file_count, top_rows, bottom_rows, class_weights=None, seed=0,
+                        start_date=None, line_name="Line1"):
+    """
+    Writes file_count synthetic SDD exports to the folder, one coil per file and one day per 24 files.
+    The modification times are spread over the same days, so date filters see them like real exports.
+    Returns (list of file paths, total number of data rows).
+    """
+    os.makedirs(folder_path, exist_ok=True)
+    rng = random.Random(seed)
+    start_date = start_date or datetime(2025, 1, 1)
+    file_paths = []
+    total_rows = 0
+    for file_index in range(file_count):
+        file_time = start_date + timedelta(hours=file_index)
+        coil_no = f"{'ABCDEFGHJK'[file_index // 10000 % 10]}E{file_index % 10000:04d}"
+        file_path = os.path.join(folder_path, sdd_file_name(line_name, file_time, coil_no, file_index))
+        total_rows += write_sdd_file(file_path, top_rows, bottom_rows, class_weights, rng)
+        os.utime(file_path, (file_time.timestamp(), file_time.timestamp()))
+        file_paths.append(file_path)
+    return file_paths, total_rows
+
+def main():
+    parser = argparse.ArgumentParser(description="Writes synthetic SDD CSV exports for benchmarks and tests.")
+    parser.add_argument("--path", required=True, help="Folder to write the CSV files to.")
+    parser.add_argument("--files", type=int, default=100, help="Number of files. Default: 100")
+    parser.add_argument("--topRows", type=int, default=2000, help="Data rows in the Top section of each file. Default: 2000")
+    parser.add_argument("--bottomRows", type=int, default=1000, help="Data rows in the Bottom section of each file. Default: 1000")
+    parser.add_argument("--distinctClasses", type=int, default=0, help="Use this many synthetic class names with Zipf-like frequencies instead of the default class names.")
+    parser.add_argument("--emptyClassRatio", type=float, default=0.05, help="Share of rows without a class name when --distinctClasses is used. Default: 0.05")
+    parser.add_argument("--seed", type=int, default=0, help="Random seed. Default: 0")
+    args = parser.parse_args()
+
+    class_weights = make_class_weights(args.distinctClasses, args.emptyClassRatio) if args.distinctClasses > 0 else None
+    file_paths, total_rows = generate_sdd_folder(args.path, args.files, args.topRows, args.bottomRows, class_weights, args.seed)
+    print(f"Wrote {len(file_paths)} files with {total_rows} rows to '{args.path}'.")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+import os
+import sys
+import json
+import time
+import shutil
+import tempfile
+import argparse
+import statistics
+import subprocess
+
+from console.dynamic_console import DynamicConsole
+
+PACKAGE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "startup_baseline.json")
+DEFAULT_TOLERANCE = 0.5
+# A case is only a regression if it is also this much slower in absolute terms; process start-up jitters by a few ms
+MIN_REGRESSION_SECONDS = 0.03
+# Modules that must not be loaded just to print the help or reject an argument
+HEAVY_MODULES = ["pandas", "numpy", "pyarrow", "xlsxwriter", "win32com", "tkcalendar"]
+PROBE_MARKER = "HEAVY_MODULES:"
+
+def startup_cases(empty_folder):
+    """Returns {case name: CLI arguments}. 'empty compile' loads the compile stack but finds no file."""
+    return {
+        "help": ["--help"],
+        "invalid argument": ["--format", "invalid"],
+        "query help": ["query", "--help"],
+        "empty compile": ["--path", empty_folder, "--startDate", "2000-01-01", "--endDate", "2000-01-02", "--noManifest"],
+    }
+
+def time_command(command, repeat):
+    """Runs the command repeat times and returns the wall-clock seconds of each run."""
+    run_seconds = []
+    for _ in range(repeat):
+        run_start = time.perf_counter()
+        subprocess.run(command, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, cwd=PACKAGE_DIR)
+        run_seconds.append(time.perf_counter() - run_start)
+    return run_seconds
+
+def heavy_modules_loaded(arguments):
+    """Runs main.py with the arguments in a fresh interpreter and returns the HEAVY_MODULES it imported."""
+    probe = (
+        "import sys, runpy\n"
+        f"sys.argv = ['main.py'] + {arguments!r}\n"
+        "try:\n"
+        "    runpy.run_path('main.py', run_name='__main__')\n"
+        "except SystemExit:\n"
+        "    pass\n"
+        f"print('{PROBE_MARKER}' + ','.join(name for name in {HEAVY_MODULES!r} if name in sys.modules))\n"
+    )
+    completed = subprocess.run([sys.executable, "-c", probe], capture_output=True, text=True, cwd=PACKAGE_DIR)
+    for output_line in completed.stdout.splitlines():
+        if output_line.startswith(PROBE_MARKER):
+            return [name for name in output_line[len(PROBE_MARKER):].split(",") if name]
+    return []
+
+def compare_with_baseline(results, baseline, tolerance):
+    """Returns the list of regression messages: cases whose median start-up time grew more than tolerance."""
+    regressions = []
+    for case_name, baseline_case in baseline.get("cases", {}).items():
+        current_case = results["cases"].get(case_name)
+        if current_case is None:
+            continue
+        slowdown = current_case["median_seconds"] - baseline_case["median_seconds"]
+        if slowdown > MIN_REGRESSION_SECONDS and current_case["median_seconds"] > baseline_case["median_seconds"] * (1 + tolerance):
+            regressions.append(f"{case_name}: {current_case['median_seconds'] * 1000:.0f} ms, baseline {baseline_case['median_seconds'] * 1000:.0f} ms")
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description="Measures the start-up time of the SDD compiler CLI (python main.py or a frozen executable).")
+    parser.add_argument("--executable", required=False, help="Time this executable (e.g. dist/SDDCompiler_CLI.exe) instead of 'python main.py'.")
+    parser.add_argument("--repeat", type=int, default=10, help="Runs per case; the median is reported. Default: 10")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE_PATH, help="Baseline JSON file. Default: benchmarks/startup_baseline.json")
+    parser.add_argument("--saveBaseline", action="store_true", help="Store the results as the new baseline instead of comparing with it.")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE, help=f"Allowed slowdown of a case against the baseline, as a fraction. Default: {DEFAULT_TOLERANCE}")
+    parser.add_argument("--output", required=False, help="Also write the results to this JSON file.")
+    args = parser.parse_args()
+
+    console_output = DynamicConsole
+    base_command = [args.executable] if args.executable else [sys.executable, os.path.join(PACKAGE_DIR, "main.py")]
+    empty_folder = tempfile.mkdtemp(prefix="sdd_startup_")
+    failed = False
+    try:
+        # Warm-up run, so the first case does not also pay for cold disk caches
+        time_command(base_command + ["--help"], 1)
+        cases = {}
+        for case_name, arguments in startup_cases(empty_folder).items():
+            run_seconds = time_command(base_command + arguments, max(args.repeat, 1))
+            cases[case_name] = {
+                "median_seconds": round(statistics.median(run_seconds), 4),
+                "min_seconds": round(min(run_seconds), 4),
+            }
+            console_output.print_message(f"  {case_name:<18} median {cases[case_name]['median_seconds'] * 1000:>7.0f} ms   min {cases[case_name]['min_seconds'] * 1000:>7.0f} ms", "info")
+
+        if not args.executable:
+            # Independent of timing noise: the light cases must not import pandas and the other heavy modules at all
+            for case_name in ["help", "invalid argument", "query help"]:
+                loaded_modules = heavy_modules_loaded(startup_cases(empty_folder)[case_name])
+                if loaded_modules:
+                    console_output.print_message(f"Regression: '{case_name}' imports {', '.join(loaded_modules)}.", "error")
+                    failed = True
+    finally:
+        shutil.rmtree(empty_folder, ignore_errors=True)
+
+    results = {"config": {"executable": args.executable or "python main.py", "repeat": args.repeat}, "cases": cases}
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+
+    if args.saveBaseline:
+        with open(args.baseline, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+        console_output.print_message(f"Baseline saved to '{args.baseline}'.", "success")
+        return 1 if failed else 0
+
+    if not os.path.exists(args.baseline):
+        console_output.print_message(f"No baseline at '{args.baseline}'. Run with --saveBaseline to store one.", "warning")
+        return 1 if failed else 0
+
+    with open(args.baseline, 'r', encoding='utf-8') as f:
+        baseline = json.load(f)
+    if baseline.get("config", {}).get("executable") != results["config"]["executable"]:
+        console_output.print_message("Warning: The baseline was recorded for another executable. Run with the same options or store a new baseline.", "warning")
+        return 1 if failed else 0
+
+    regressions = compare_with_baseline(results, baseline, args.tolerance)
+    for regression in regressions:
+        console_output.print_message(f"Regression: {regression}", "error")
+    if regressions or failed:
+        return 1
+    console_output.print_message(f"No case starts more than {args.tolerance:.0%} slower than the baseline.", "success")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,47 @@
+# Choices and defaults of the command-line and GUI options.
+# This module has no third-party imports, so main.py can build its argument parser (and answer --help or
+# reject an invalid argument) without loading pandas. The modules that implement each option import
+# their constants from here.
+
+# csv_parser
+PARSER_MODES = ["mmap", "lines"]
+CSV_ENGINES = ["c", "pyarrow"]
+
+# output_processor.columnar_exporter
+OUTPUT_FORMATS = ["xlsx", "parquet", "feather", "csv"]
+PARQUET_COMPRESSIONS = ["snappy", "zstd", "gzip", "none"]
+DEFAULT_ROW_GROUP_SIZE = 1000000
+
+# output_processor.sqlite_store
+SQLITE_FORMAT = "sqlite"
+DEFAULT_DATABASE_FILE_NAME = "sdd_defects.sqlite"
+
+# excel_processor
+EXCEL_WRITERS = ["native", "com"]
+# Excel worksheet limit, including the header row
+MAX_EXCEL_ROWS = 1048576
+SHARD_MODES = ["rows", "coil", "day"]
+# Largest shard that fits in one Excel sheet (the header takes one row)
+MAX_SHARD_ROWS = MAX_EXCEL_ROWS - 1
+
+# file_scanner: CSV files written by this tool end with this suffix and are never read back as SDD exports
+OUTPUT_CSV_SUFFIX = ".compiled.csv"
+
+# heatmap_aggregator: bin sizes along the coil (Top m) and across it (Distance from Left Edge mm)
+DEFAULT_LENGTH_BIN_M = 10.0
+DEFAULT_WIDTH_BIN_MM = 50.0
+# Positions beyond these are taken as corrupt and left out, so one bad value cannot make a map of millions of bins
+MAX_HEATMAP_LENGTH_M = 50000.0
+MAX_HEATMAP_WIDTH_MM = 5000.0
+# Most bins along times across the coil of one map (per side and class)
+MAX_HEATMAP_BINS = 5000000
+
+# record_filter: values of --side
+FILTER_SIDES = ["Top", "Bottom"]
+
+# parse_cache
+DEFAULT_CACHE_SIZE_MB = 1024
+
+# watcher
+DEFAULT_POLL_SECONDS = 2.0
+DEFAULT_SETTLE_SECONDS = 5.0
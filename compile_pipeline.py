@@ -0,0 +1,114 @@
+from archive_reader import source_file_name
+from data_processor import concat_processed_records, PROCESSED_RECORD_COLUMNS
+from file_processor import process_csv_files
+from profiler import profile_stage, peak_memory_bytes, format_bytes
+
+# Library-level compile API shared by the CLI, the GUI and embedding services.
+#
+# console_instance is any object with print_message(message, type), e.g. DynamicConsole,
+# DynamicConsoleGUI, BufferedConsole or console.logging_console.LoggingConsole.
+# A writer is any object with write(df, file_path) and close(); close() returns the number of rows written.
+# file_path is the source CSV file of the batch. Writers that record which source files are done (the append output,
+# the SQLite store) set skip_failed_files = True: files that could not be read completely are then not handed to them,
+# so they are read again on the next run.
+# StreamingExcelExporter writes each batch as it arrives, CollectedOutput keeps all batches for one export.
+
+class CompileResult:
+    """Counts of a compile run, returned by compile_files()."""
+    def __init__(self, total_files):
+        self.total_files = total_files
+        self.files_processed = 0
+        self.records = 0
+        self.rows_written = 0
+        self.largest_batch_bytes = 0
+        self.cancelled = False
+
+def iter_record_batches(csv_files, console_instance, workers=1, parser_mode="mmap", csv_engine="c", parse_cache=None, cancel_event=None,
+                        columns=PROCESSED_RECORD_COLUMNS, record_filter=None):
+    """
+    Yields (file_path, processed DataFrame, read_failed) for each CSV file, in the order of csv_files, with the given columns
+    (by default the output columns; the append output also takes DEFECT_NO_COLUMN).
+    read_failed is True if the file could not be read completely (see file_processor.process_csv_file).
+    Only a few files are processed ahead of the consumer, so memory stays bounded however many files there are.
+    Stops before the next file once cancel_event (a threading.Event) is set. The parse cache is saved at the end.
+    If a RecordFilter is given, only the records it selects are parsed and yielded.
+    """
+    processed_files = process_csv_files(csv_files, console_instance, workers, parser_mode, csv_engine, parse_cache, record_filter)
+    try:
+        for file_path, processed_df, read_failed in processed_files:
+            yield file_path, processed_df.reindex(columns=columns, fill_value=None), read_failed
+            if cancel_event is not None and cancel_event.is_set():
+                break
+    finally:
+        # Stops the worker processes if the consumer stopped early
+        processed_files.close()
+        if parse_cache is not None:
+            with profile_stage("cache save"):
+                parse_cache.save()
+
+def compile_files(csv_files, writer, console_instance, workers=1, parser_mode="mmap", csv_engine="c", parse_cache=None,
+                  cancel_event=None, progress_callback=None, summary=None, columns=PROCESSED_RECORD_COLUMNS, heatmaps=None,
+                  record_filter=None):
+    """
+    Processes the CSV files and hands each file's records to writer.write(df, file_path), then closes the writer.
+    progress_callback(files_processed, total_files, records) is called after every file.
+    If a DefectSummary or DefectHeatmaps is given, each file's records are added to it before they are written.
+    columns are the columns of the batches handed to the writer, record_filter selects their records (see iter_record_batches).
+    Files that could not be read completely are left out if the writer sets skip_failed_files.
+    If the run is cancelled, the writer is not closed (nothing is exported). Returns a CompileResult.
+    """
+    result = CompileResult(len(csv_files))
+    skip_failed_files = getattr(writer, "skip_failed_files", False)
+    with profile_stage("read files"):
+        for file_path, processed_df, read_failed in iter_record_batches(csv_files, console_instance, workers, parser_mode, csv_engine, parse_cache, cancel_event, columns, record_filter):
+            if read_failed and skip_failed_files:
+                console_instance.print_message(f"Warning: '{source_file_name(file_path)}' could not be read completely and is not recorded as done; it is read again on the next run.", "warning")
+            else:
+                if summary is not None:
+                    with profile_stage("summary"):
+                        summary.add(processed_df)
+                if heatmaps is not None:
+                    with profile_stage("heatmaps"):
+                        heatmaps.add(processed_df)
+                writer.write(processed_df, file_path)
+                result.records += len(processed_df)
+                result.largest_batch_bytes = max(result.largest_batch_bytes, int(processed_df.memory_usage(deep=True).sum()))
+            result.files_processed += 1
+            if progress_callback is not None:
+                progress_callback(result.files_processed, result.total_files, result.records)
+
+    console_instance.print_message(f"Memory: {result.records} records, largest file batch {format_bytes(result.largest_batch_bytes)}, peak process memory {format_bytes(peak_memory_bytes())}.", "info")
+
+    if cancel_event is not None and cancel_event.is_set():
+        result.cancelled = True
+        console_instance.print_message(f"Conversion cancelled after {result.files_processed} of {result.total_files} files. Nothing was exported.", "warning")
+        return result
+
+    result.rows_written = writer.close()
+    return result
+
+class CollectedOutput:
+    """
+    Writer that keeps every batch and exports them together on close(), for outputs that need the whole dataset,
+    such as the non-streaming Excel export. export_function(df) receives the combined DataFrame.
+    """
+    def __init__(self, export_function, console_instance):
+        self.export_function = export_function
+        self.console_instance = console_instance
+        self._frames = []
+
+    def write(self, df, file_path=None):
+        """Keeps the batch until close()."""
+        self._frames.append(df)
+
+    def close(self):
+        """Combines the batches, exports them and returns the number of rows."""
+        with profile_stage("concat"):
+            # Combine the processed sections into one DataFrame for easier Excel exports
+            final_df = concat_processed_records(self._frames).reindex(columns=PROCESSED_RECORD_COLUMNS, fill_value=None)
+        self._frames = []
+        self.console_instance.print_message(f"Memory: the combined {len(final_df)} records use {format_bytes(int(final_df.memory_usage(deep=True).sum()))}.", "info")
+
+        with profile_stage("export"):
+            self.export_function(final_df)
+        return len(final_df)
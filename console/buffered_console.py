@@ -0,0 +1,17 @@
+class BufferedConsole:
+    """
+    Collects messages instead of printing them, so work done in another process can be logged later.
+    Has the same print_message() signature as DynamicConsole and DynamicConsoleGUI.
+    """
+    def __init__(self):
+        self.messages = []
+
+    def print_message(self, message, type="info"):
+        """Stores the message and its type (info, warning, error, success)."""
+        self.messages.append((message, type))
+
+    @staticmethod
+    def replay(messages, console_instance):
+        """Prints stored (message, type) pairs to the given console in their original order."""
+        for message, message_type in messages:
+            console_instance.print_message(message, message_type)
@@ -1,8 +1,18 @@
+import queue
 import tkinter as tk
 from tkinter import scrolledtext
 from datetime import datetime # Import datetime here as well for the timestamp
 
+# Interval of the timer that moves queued messages into the text widget
+FLUSH_INTERVAL_MS = 100
+# Upper limit of messages inserted per flush, so a burst of warnings cannot block the window
+MAX_MESSAGES_PER_FLUSH = 5000
+
 class DynamicConsoleGUI:
+    """
+    Log console of the GUI. print_message() may be called from any thread: messages are queued
+    and a Tk timer inserts them into the text widget in batches.
+    """
     _instance = None # Singleton instance
 
     def __new__(cls, master=None):
@@ -15,6 +25,7 @@ class DynamicConsoleGUI:
         if self._initialized:
             return
         self.text_widget = None
+        self._message_queue = queue.Queue()
         # No need to define tags on 'master' here.
         # Tags will be defined on the 'text_widget' once it's set.
         self._initialized = True
@@ -29,22 +40,40 @@ class DynamicConsoleGUI:
             self.text_widget.tag_config("error", foreground="red")
             self.text_widget.tag_config("success", foreground="green")
             self.text_widget._console_tags_defined_on_widget = True # type: ignore
-
+        self.text_widget.after(FLUSH_INTERVAL_MS, self._flush_messages)
 
     def print_message(self, message: str, message_type: str = "info"):
-        """Prints a message to the console widget with a specified type (color)."""
+        """Queues a message for the console widget with a specified type (color). Safe to call from worker threads."""
         if self.text_widget:
-            self.text_widget.config(state='normal') # Enable editing
-            self.text_widget.insert(tk.END, f"{datetime.now().strftime('%H:%M:%S')} - {message}\n", message_type)
-            self.text_widget.see(tk.END) # Scroll to the end
-            self.text_widget.config(state='disabled') # Disable editing
+            self._message_queue.put((f"{datetime.now().strftime('%H:%M:%S')} - {message}\n", message_type))
         else:
             # Fallback to print if no text widget is set (e.g., during testing or early startup)
             print(f"[{message_type.upper()}] {message}")
 
+    def _flush_messages(self):
+        """Inserts the queued messages with one insert call and schedules the next flush."""
+        insert_arguments = []
+        try:
+            for _ in range(MAX_MESSAGES_PER_FLUSH):
+                insert_arguments.extend(self._message_queue.get_nowait())
+        except queue.Empty:
+            pass
+
+        if insert_arguments:
+            self.text_widget.config(state='normal') # Enable editing
+            self.text_widget.insert(tk.END, *insert_arguments)
+            self.text_widget.see(tk.END) # Scroll to the end
+            self.text_widget.config(state='disabled') # Disable editing
+        self.text_widget.after(FLUSH_INTERVAL_MS, self._flush_messages)
+
     def clear_log(self):
-        """Clears all messages from the console log."""
+        """Clears all messages from the console log, including the ones not shown yet."""
+        try:
+            while True:
+                self._message_queue.get_nowait()
+        except queue.Empty:
+            pass
         if self.text_widget:
             self.text_widget.config(state='normal')
             self.text_widget.delete(1.0, tk.END)
-            self.text_widget.config(state='disabled')
\ No newline at end of file
+            self.text_widget.config(state='disabled')
@@ -0,0 +1,20 @@
+import logging
+
+class LoggingConsole:
+    """
+    Sends messages to a logging.Logger, for services that embed the compiler (see compile_pipeline).
+    Has the same print_message() signature as DynamicConsole and DynamicConsoleGUI.
+    """
+    LEVELS = {
+        "info": logging.INFO,
+        "success": logging.INFO,
+        "warning": logging.WARNING,
+        "error": logging.ERROR,
+    }
+
+    def __init__(self, logger=None):
+        self.logger = logger or logging.getLogger("sdd_compiler")
+
+    def print_message(self, message, type="info"):
+        """Logs the message at the level of its type (info, warning, error, success)."""
+        self.logger.log(self.LEVELS.get(type, logging.INFO), message.strip())
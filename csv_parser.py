@@ -1,19 +1,260 @@
 import pandas as pd
 import io
 import os # Required for os.path.basename
+import re
+import mmap
+import importlib.util
 
-def parse_csv_sections(file_path, console_instance):
+from archive_reader import is_compressed_source, open_source_file, read_source_bytes, source_file_name
+from cli_options import PARSER_MODES, CSV_ENGINES
+
+# Common header that will be used to read both parts
+COMMON_HEADER_STR = "Defect No.,Class Name,Top m,Distance from Left Edge mm,Distance from Right Edge mm,Distance from Center mm,Height mm,Width mm,Segment Width Ratio,Orientation"
+COMMON_HEADER_COLUMNS = COMMON_HEADER_STR.split(',')
+
+# Explicit types for the fixed header, so pandas does not have to infer them for every section
+SECTION_DTYPES = {
+    "Defect No.": "Int32",
+    "Class Name": "category",
+    "Top m": "float32",
+    "Distance from Left Edge mm": "float32",
+    "Distance from Right Edge mm": "float32",
+    "Distance from Center mm": "float32",
+    "Height mm": "float32",
+    "Width mm": "float32",
+}
+
+# A line that only holds the word "Bottom" (any case), same test as line.strip().lower() == "bottom"
+BOTTOM_LINE_PATTERN = re.compile(rb"^[ \t]*bottom[ \t\r]*$", re.IGNORECASE | re.MULTILINE)
+NON_WHITESPACE_PATTERN = re.compile(rb"\S")
+
+def parse_csv_sections(file_path, console_instance, mode="mmap", engine="c", record_filter=None):
     """
     Reads a CSV file, separating the 'Top' and 'Bottom' parts based on the 'Bottom' delimiter.
+    mode "mmap" parses the sections straight from a memory-mapped file, "lines" uses the original line-by-line reader.
+    With a RecordFilter, a side it excludes is returned empty without being parsed.
+    Returns two DataFrame handles; a section that could not be read (or both, if the file could not be read) is None.
+    """
+    if mode == "lines":
+        return parse_csv_sections_lines(file_path, console_instance, record_filter)
+    return parse_csv_sections_mmap(file_path, console_instance, engine, record_filter)
+
+def resolve_csv_engine(engine, console_instance):
+    """
+    Returns the CSV engine to use for pandas.read_csv, falling back to "c" if pyarrow is not installed.
+    """
+    if engine == "pyarrow" and importlib.util.find_spec("pyarrow") is None:
+        console_instance.print_message("Warning: pyarrow is not installed. Using the default CSV engine.", "warning")
+        return "c"
+    return engine
+
+class SectionReader(io.RawIOBase):
+    """
+    Read-only stream over a byte range of a memory-mapped file.
+    Lets the CSV engine read one section in chunks without copying the section first.
+    A section that does not end with a newline (the last row of the file) gets one, because the pyarrow engine
+    cannot read a single row without it.
+    """
+    def __init__(self, buffer, start, end):
+        self._view = memoryview(buffer)[start:end]
+        self._position = 0
+        self._needs_newline = len(self._view) == 0 or self._view[-1] != ord(b"\n")
+
+    def readable(self):
+        return True
+
+    def readinto(self, target):
+        chunk = self._view[self._position:self._position + len(target)]
+        target[:len(chunk)] = chunk
+        self._position += len(chunk)
+        if len(chunk) < len(target) and self._needs_newline:
+            target[len(chunk)] = ord(b"\n")
+            self._needs_newline = False
+            return len(chunk) + 1
+        return len(chunk)
+
+    def close(self):
+        # Release the view so the memory map can be closed afterwards
+        if not self.closed:
+            self._view.release()
+        super().close()
+
+def apply_section_dtypes(section_df):
+    """
+    Converts a section read with inferred types to SECTION_DTYPES, column by column.
+    Values that do not fit a numeric type become missing values.
+    """
+    for column_name, dtype in SECTION_DTYPES.items():
+        if column_name not in section_df.columns:
+            continue
+        if dtype == "category":
+            section_df[column_name] = section_df[column_name].astype("category")
+            continue
+        numeric_column = pd.to_numeric(section_df[column_name], errors="coerce")
+        try:
+            section_df[column_name] = numeric_column.astype(dtype)
+        except (TypeError, ValueError):
+            # e.g. fractional values in an integer column, keep them as floats
+            section_df[column_name] = numeric_column
+    return section_df
+
+def read_section_csv(open_section, engine="c", **read_csv_kwargs):
+    """
+    Reads one section with pandas.read_csv and SECTION_DTYPES.
+    open_section returns a new stream over the section; it is called again if a value does not fit
+    its type, and the section is then read with inferred types and converted afterwards.
+    """
+    try:
+        with open_section() as section_stream:
+            return pd.read_csv(section_stream, sep=',', na_values=['', 'NULL'], dtype=SECTION_DTYPES, engine=engine, **read_csv_kwargs)
+    except (pd.errors.EmptyDataError, pd.errors.ParserError):
+        # A malformed section fails the same way with inferred types; only type mismatches are read again
+        raise
+    except (TypeError, ValueError):
+        with open_section() as section_stream:
+            section_df = pd.read_csv(section_stream, sep=',', na_values=['', 'NULL'], engine=engine, **read_csv_kwargs)
+        return apply_section_dtypes(section_df)
+
+def _skip_lines(buffer, offset, line_count):
+    """
+    Returns the offset of the line that starts line_count lines after offset (or the end of the buffer).
+    """
+    for _ in range(line_count):
+        newline_index = buffer.find(b"\n", offset)
+        if newline_index == -1:
+            return len(buffer)
+        offset = newline_index + 1
+    return offset
+
+def find_section_offsets(buffer):
+    """
+    Finds the byte ranges of the 'Top' and 'Bottom' data rows in an SDD export.
+    Returns ((top_start, top_end), (bottom_start, bottom_end)); the bottom range is None if there is no 'Bottom' line.
+    """
+    # Skip the first 3 header rows
+    top_start = _skip_lines(buffer, 0, 3)
+
+    bottom_match = BOTTOM_LINE_PATTERN.search(buffer)
+    if bottom_match is None:
+        # If there is no "Bottom", the whole file is "Top" after the header
+        return (top_start, len(buffer)), None
+
+    # Stop before "Bottom" and the blank row above it
+    bottom_line_start = bottom_match.start()
+    top_end = buffer.rfind(b"\n", 0, max(bottom_line_start - 1, 0)) + 1 if bottom_line_start > 0 else 0
+    # Skip "Bottom" and the next 2 header lines
+    bottom_start = _skip_lines(buffer, bottom_line_start, 3)
+    return (top_start, max(top_start, top_end)), (bottom_start, len(buffer))
+
+def select_matching_lines(buffer, start, end, line_pattern):
+    """
+    Returns the lines of buffer[start:end] that contain a match of line_pattern, joined as bytes.
+    Only the matches are visited, so the Python work grows with the lines selected, not with the section.
+    """
+    selected_lines = []
+    next_line_start = start
+    for match in line_pattern.finditer(buffer, start, end):
+        if match.start() < next_line_start:
+            # Another match in a line that is already selected
+            continue
+        line_start = max(buffer.rfind(b"\n", start, match.start()) + 1, start)
+        line_end = buffer.find(b"\n", match.end(), end)
+        line_end = end if line_end == -1 else line_end + 1
+        selected_lines.append(buffer[line_start:line_end])
+        next_line_start = line_end
+    return b"".join(selected_lines)
+
+def _read_section(buffer, section_range, engine, line_pattern=None):
+    """
+    Parses one section of the memory-mapped file with the common header.
+    If line_pattern is given, only the lines that contain a match are parsed.
+    """
+    start, end = section_range
+    if line_pattern is not None:
+        buffer = select_matching_lines(buffer, start, end, line_pattern)
+        start, end = 0, len(buffer)
+    if NON_WHITESPACE_PATTERN.search(buffer, start, end) is None:
+        return pd.DataFrame(columns=COMMON_HEADER_COLUMNS)
+
+    return read_section_csv(lambda: io.BufferedReader(SectionReader(buffer, start, end)), engine, header=None, names=COMMON_HEADER_COLUMNS)
+
+def parse_csv_sections_mmap(file_path, console_instance, engine="c", record_filter=None):
+    """
+    Reads a CSV file through a memory map and finds the 'Top' and 'Bottom' parts from byte offsets.
+    Each section is handed to the CSV engine directly, so only the mapped file is held in memory.
+    Zip members and .csv.gz files are decompressed into memory instead and parsed the same way.
+    With a RecordFilter, only the sections and (for a class filter) the lines that can hold wanted records are parsed.
+    Returns two DataFrame handles.
+    """
+    engine = resolve_csv_engine(engine, console_instance)
+    file_name = source_file_name(file_path)
+
+    if is_compressed_source(file_path):
+        try:
+            file_content = read_source_bytes(file_path)
+        except Exception as e:
+            console_instance.print_message(f"Error: Failed to read file '{file_name}': {e}", "error")
+            return None, None
+        if not file_content:
+            return pd.DataFrame(columns=COMMON_HEADER_COLUMNS), pd.DataFrame()
+        return _parse_buffer_sections(file_content, file_name, console_instance, engine, record_filter)
+
+    try:
+        with open(file_path, 'rb') as f:
+            if os.fstat(f.fileno()).st_size == 0:
+                return pd.DataFrame(columns=COMMON_HEADER_COLUMNS), pd.DataFrame()
+            file_map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    except Exception as e:
+        console_instance.print_message(f"Error: Failed to read file '{file_name}': {e}", "error")
+        return None, None
+
+    with file_map:
+        return _parse_buffer_sections(file_map, file_name, console_instance, engine, record_filter)
+
+def _parse_buffer_sections(buffer, file_name, console_instance, engine, record_filter=None):
+    """
+    Parses the 'Top' and 'Bottom' sections of a whole SDD export held in a buffer (memory map or bytes).
+    Returns two DataFrame handles.
+    """
+    top_df = pd.DataFrame()
+    bottom_df = pd.DataFrame()
+    top_range, bottom_range = find_section_offsets(buffer)
+    line_pattern = record_filter.line_pattern if record_filter is not None else None
+
+    if record_filter is None or record_filter.includes_side("Top"):
+        try:
+            top_df = _read_section(buffer, top_range, engine, line_pattern)
+        except pd.errors.EmptyDataError:
+            console_instance.print_message(f"    Warning: TOP section in '{file_name}' is empty.", "warning")
+        except Exception as e:
+            console_instance.print_message(f"    Error: Failed to read TOP data from '{file_name}': {e}", "error")
+            top_df = None
+
+    if bottom_range is not None and (record_filter is None or record_filter.includes_side("Bottom")):
+        try:
+            bottom_df = _read_section(buffer, bottom_range, engine, line_pattern)
+        except pd.errors.EmptyDataError:
+            console_instance.print_message(f"    Warning: The BOTTOM section in '{file_name}' is empty.", "warning")
+        except Exception as e:
+            console_instance.print_message(f"    Error: Failed to read BOTTOM data from '{file_name}': {e}", "error")
+            bottom_df = None
+
+    return top_df, bottom_df
+
+def parse_csv_sections_lines(file_path, console_instance, record_filter=None):
+    """
+    Reads a CSV file line by line, separating the 'Top' and 'Bottom' parts based on the 'Bottom' delimiter.
+    A side excluded by the RecordFilter is not parsed.
     Returns two DataFrame handles.
     """
     file_content = []
     try:
-        with open(file_path, 'r', encoding='utf-8') as f:
+        # Zip members and .csv.gz files are decompressed while they are read
+        with io.TextIOWrapper(open_source_file(file_path), encoding='utf-8') as f:
             file_content = f.readlines()
     except Exception as e:
-        console_instance.print_message(f"Error: Failed to read file '{os.path.basename(file_path)}': {e}", "error")
-        return pd.DataFrame(), pd.DataFrame()
+        console_instance.print_message(f"Error: Failed to read file '{source_file_name(file_path)}': {e}", "error")
+        return None, None
 
     bottom_section_start_index = -1
     for i, line in enumerate(file_content):
@@ -21,9 +262,7 @@ def parse_csv_sections(file_path, console_instance):
             bottom_section_start_index = i
             break
 
-    # Common header that will be used to read both parts
-    common_header_str = "Defect No.,Class Name,Top m,Distance from Left Edge mm,Distance from Right Edge mm,Distance from Center mm,Height mm,Width mm,Segment Width Ratio,Orientation"
-    # common_header_list = [h.strip() for h in common_header_str.split(',')] # No need to be explicit as pandas handles it
+    common_header_str = COMMON_HEADER_STR
 
     top_df = pd.DataFrame()
     bottom_df = pd.DataFrame()
@@ -37,19 +276,21 @@ def parse_csv_sections(file_path, console_instance):
         # If there is no "Bottom", the whole file is "Top" after the header
         top_data_lines = file_content[3:]
     
-    # Filter empty rows and create CSV string for pandas
-    top_csv_string = common_header_str + "\n" + "".join([line for line in top_data_lines if line.strip()])
-    
-    try:
-        # Using StringIO to read strings as files
-        top_df = pd.read_csv(io.StringIO(top_csv_string), sep=',', na_values=['', 'NULL'])
-    except pd.errors.EmptyDataError:
-        console_instance.print_message(f"    Warning: TOP section in '{os.path.basename(file_path)}' is empty.", "warning")
-    except Exception as e:
-        console_instance.print_message(f"    Error: Failed to read TOP data from '{os.path.basename(file_path)}': {e}", "error")
+    if record_filter is None or record_filter.includes_side("Top"):
+        # Filter empty rows and create CSV string for pandas
+        top_csv_string = common_header_str + "\n" + "".join([line for line in top_data_lines if line.strip()])
+
+        try:
+            # Using StringIO to read strings as files
+            top_df = read_section_csv(lambda: io.StringIO(top_csv_string))
+        except pd.errors.EmptyDataError:
+            console_instance.print_message(f"    Warning: TOP section in '{source_file_name(file_path)}' is empty.", "warning")
+        except Exception as e:
+            console_instance.print_message(f"    Error: Failed to read TOP data from '{source_file_name(file_path)}': {e}", "error")
+            top_df = None
 
     # Processing the 'Bottom' part
-    if bottom_section_start_index != -1:
+    if bottom_section_start_index != -1 and (record_filter is None or record_filter.includes_side("Bottom")):
         # Skip "Bottom" and the next 2 header lines
         bottom_data_lines = file_content[bottom_section_start_index + 3:]
         
@@ -57,10 +298,11 @@ def parse_csv_sections(file_path, console_instance):
         bottom_csv_string = common_header_str + "\n" + "".join([line for line in bottom_data_lines if line.strip()])
         
         try:
-            bottom_df = pd.read_csv(io.StringIO(bottom_csv_string), sep=',', na_values=['', 'NULL'])
+            bottom_df = read_section_csv(lambda: io.StringIO(bottom_csv_string))
         except pd.errors.EmptyDataError:
-            console_instance.print_message(f"    Warning: The BOTTOM section in '{os.path.basename(file_path)}' is empty.", "warning")
+            console_instance.print_message(f"    Warning: The BOTTOM section in '{source_file_name(file_path)}' is empty.", "warning")
         except Exception as e:
-            console_instance.print_message(f"    Error: Failed to read BOTTOM data from '{os.path.basename(file_path)}': {e}", "error")
+            console_instance.print_message(f"    Error: Failed to read BOTTOM data from '{source_file_name(file_path)}': {e}", "error")
+            bottom_df = None
             
     return top_df, bottom_df
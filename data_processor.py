@@ -1,15 +1,55 @@
 import re
+import numpy as np
 import pandas as pd # Required for pandas Series
 
+# Source CSV column -> output column, in the order process_record() adds them after "Top/Bottom"
+RECORD_COLUMN_MAP = {
+    "Top m": "Distance from HE CGL (m)",
+    "Distance from Left Edge mm": "Distance Left (mm)",
+    "Distance from Right Edge mm": "Distance Right (mm)",
+    "Distance from Center mm": "Distance Center (mm)",
+    "Height mm": "Height",
+    "Width mm": "Width",
+    "Segment Width Ratio": "Segment Width Ratio",
+    "Orientation": "Orientation",
+}
+
+PROCESSED_RECORD_COLUMNS = ["Coil No", "Class Name", "Defect Name", "Grade Defect", "Top/Bottom"] + list(RECORD_COLUMN_MAP.values())
+# The source 'Defect No.' is kept after the output columns; only the append output writes it,
+# to recognise records it already holds by (Coil No, Defect No., Top/Bottom)
+DEFECT_NO_COLUMN = "Defect No."
+APPEND_KEY_COLUMNS = ["Coil No", DEFECT_NO_COLUMN, "Top/Bottom"]
+
+COIL_NO_PATTERN = re.compile(r"\.\d{2}-\d{2}-\d{2}\.([A-Z]{2}\d{4})\s+\d{2}\.Defects\.csv")
+COIL_NO_KEY_PATTERN = re.compile(r"[A-Z]{2}\d{4}")
+FILE_DATE_PATTERN = re.compile(r"\.(\d{2})-(\d{2})-(\d{2})\.[A-Z]{2}\d{4}\s+\d{2}\.Defects\.csv")
+
+def match_coil_no(filename):
+    """
+    Returns the 'Coil No' in the file name, or an empty string if the name does not match the pattern.
+    """
+    match = COIL_NO_PATTERN.search(filename)
+    if match and len(match.groups()) > 0:
+        return match.group(1)
+    return ""
+
+def extract_date_from_filename(filename):
+    """
+    Returns the date in the file name (.YY-MM-DD.) as 'YYYY-MM-DD', or an empty string if there is none.
+    """
+    match = FILE_DATE_PATTERN.search(filename)
+    if match:
+        return f"20{match.group(1)}-{match.group(2)}-{match.group(3)}"
+    return ""
+
 def extract_coil_no_from_filename(filename, console_instance):
     """
     Extracts the 'Coil No' (for example, KE5538) from the file name.
     Pattern: 2 uppercase letters followed by 4 numbers.
     """
-    pattern = r"\.\d{2}-\d{2}-\d{2}\.([A-Z]{2}\d{4})\s+\d{2}\.Defects\.csv"
-    match = re.search(pattern, filename)
-    if match and len(match.groups()) > 0:
-        return match.group(1)
+    coil_no = match_coil_no(filename)
+    if coil_no:
+        return coil_no
     console_instance.print_message(
         f"    Warning: Coil No is not found in file name '{filename}' or does not match the new pattern. Using an empty string.", "warning"
     )
@@ -52,3 +92,130 @@ def process_record(record_series: pd.Series, coil_no: str, top_bottom_status: st
     new_record["Orientation"] = record_series.get("Orientation", None)
 
     return new_record
+
+def _categorical_from_unique_values(unique_values: pd.Series, codes):
+    """
+    Builds a categorical column from per-distinct-value results and the row codes that point into them.
+    """
+    part_codes, part_categories = pd.factorize(unique_values)
+    return pd.Categorical.from_codes(part_codes[codes], part_categories)
+
+def process_records(section_df: pd.DataFrame, coil_no: str, top_bottom_status: str, record_filter=None) -> pd.DataFrame:
+    """
+    Process a whole 'Top' or 'Bottom' section (pandas DataFrame) with column operations.
+    Produces the same rows and values as calling process_record() on every row,
+    without building a dictionary per record. Returns an empty DataFrame if nothing is kept.
+    With a RecordFilter, only the records it selects are kept; they are dropped before any output column is built.
+    A section that could not be read (None) gives an empty DataFrame.
+    """
+    if section_df is None or section_df.empty or (record_filter is not None and not record_filter.includes_side(top_bottom_status)):
+        return pd.DataFrame(columns=PROCESSED_RECORD_COLUMNS)
+
+    # Class names repeat a lot, so split each distinct value only once and map back by code.
+    # A categorical Class Name from the parser already carries its codes.
+    if "Class Name" in section_df.columns:
+        codes, unique_class_names = pd.factorize(section_df["Class Name"])
+        unique_class_names = pd.Series(np.asarray(unique_class_names, dtype=object)).astype(str)
+    else:
+        codes, unique_class_names = np.full(len(section_df), -1), pd.Series([], dtype=object)
+
+    # Same normalisation as process_record(): missing values and "nan" become an empty Class Name
+    codes = np.where(codes == -1, len(unique_class_names), codes)
+    unique_class_names = pd.concat([unique_class_names, pd.Series([""])], ignore_index=True).astype(object).str.strip()
+    unique_class_names = unique_class_names.mask(unique_class_names == "nan", "")
+
+    class_name_parts = unique_class_names.str.split('-', expand=True)
+    unique_class = class_name_parts[0].str.strip()
+    unique_defect = class_name_parts[3].str.strip().fillna("") if 3 in class_name_parts.columns else pd.Series("", index=class_name_parts.index)
+    unique_grade = class_name_parts[1].str.strip().str[0].fillna("") if 1 in class_name_parts.columns else pd.Series("", index=class_name_parts.index)
+
+    # IF THE CLASS NAME IS EMPTY, DO NOT ADD THIS LINE
+    unique_keep_mask = (unique_class != "").to_numpy()
+    if record_filter is not None:
+        unique_keep_mask = unique_keep_mask & record_filter.class_mask(unique_class, unique_grade)
+    keep_mask = unique_keep_mask[codes]
+    if record_filter is not None:
+        size_mask = record_filter.size_mask(section_df)
+        if size_mask is not None:
+            keep_mask = keep_mask & size_mask
+    if not keep_mask.any():
+        return pd.DataFrame(columns=PROCESSED_RECORD_COLUMNS)
+    kept_codes = codes[keep_mask]
+    kept_count = len(kept_codes)
+
+    processed_df = pd.DataFrame({
+        "Coil No": pd.Categorical.from_codes(np.zeros(kept_count, dtype=np.int8), [coil_no]),
+        "Class Name": _categorical_from_unique_values(unique_class, kept_codes),
+        "Defect Name": _categorical_from_unique_values(unique_defect, kept_codes),
+        "Grade Defect": _categorical_from_unique_values(unique_grade, kept_codes),
+        "Top/Bottom": pd.Categorical.from_codes(np.zeros(kept_count, dtype=np.int8), [top_bottom_status]),
+    }, index=pd.RangeIndex(kept_count))
+
+    # Other column mappings
+    for source_column, output_column in RECORD_COLUMN_MAP.items():
+        if source_column in section_df.columns:
+            processed_df[output_column] = section_df[source_column].array[keep_mask]
+        else:
+            processed_df[output_column] = None
+    if DEFECT_NO_COLUMN in section_df.columns:
+        processed_df[DEFECT_NO_COLUMN] = section_df[DEFECT_NO_COLUMN].array[keep_mask]
+    else:
+        processed_df[DEFECT_NO_COLUMN] = pd.array([pd.NA] * kept_count, dtype="Int32")
+
+    return processed_df
+
+def concat_processed_records(processed_frames: list) -> pd.DataFrame:
+    """
+    Concatenates the per-section DataFrames returned by process_records() into one DataFrame.
+    Empty sections are left out so they cannot change the column types of the result.
+    """
+    non_empty_frames = [frame for frame in processed_frames if not frame.empty]
+    if not non_empty_frames:
+        return pd.DataFrame()
+
+    # Give categorical columns the same categories in every frame, so the result stays categorical
+    for column_name in non_empty_frames[0].columns:
+        column_dtypes = [frame[column_name].dtype if column_name in frame.columns else None for frame in non_empty_frames]
+        if len(non_empty_frames) < 2 or not all(isinstance(dtype, pd.CategoricalDtype) for dtype in column_dtypes):
+            continue
+        categories = pd.Index(np.concatenate([dtype.categories.to_numpy(dtype=object) for dtype in column_dtypes])).unique()
+        non_empty_frames = [frame.assign(**{column_name: frame[column_name].cat.set_categories(categories)}) for frame in non_empty_frames]
+
+    return pd.concat(non_empty_frames, ignore_index=True)
+
+def encode_defect_keys(df: pd.DataFrame):
+    """
+    Returns the (Coil No, Defect No., Top/Bottom) key of every record as one int64, and a mask of the records
+    that have a complete key (a Coil No of the 'AB1234' pattern or empty, a whole Defect No. below 2**32 and Top or Bottom).
+    """
+    # Each distinct Coil No is encoded once: 2 letters and 4 digits, plus 1 so an empty Coil No is 0
+    coil_codes, coil_values = pd.factorize(df["Coil No"].astype(object).fillna(""))
+    coil_keys = np.array([
+        0 if coil_no == "" else
+        ((ord(coil_no[0]) - 65) * 26 + ord(coil_no[1]) - 65) * 10000 + int(coil_no[2:]) + 1 if COIL_NO_KEY_PATTERN.fullmatch(coil_no) else -1
+        for coil_no in coil_values
+    ] + [-1], dtype=np.int64)[coil_codes]
+
+    side = df["Top/Bottom"].astype(object)
+    side_keys = np.where(side == "Bottom", 1, np.where(side == "Top", 0, -1)).astype(np.int64)
+    defect_no = pd.to_numeric(df[DEFECT_NO_COLUMN], errors="coerce").fillna(-1).to_numpy(dtype=np.float64)
+    # A Defect No. outside 32 bits would collide with another key, so such records are not keyed
+    valid_mask = (coil_keys >= 0) & (side_keys >= 0) & (defect_no >= 0) & (defect_no < 2**32) & (defect_no % 1 == 0)
+    defect_keys = np.where(valid_mask, defect_no, 0).astype(np.int64)
+
+    return (coil_keys << 33) | (side_keys << 32) | defect_keys, valid_mask
+
+def widen_float32_columns(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Returns the DataFrame with float32 columns converted to float64 holding the same decimal value
+    (12.3 instead of 12.300000190734863), for outputs that store every number as a double, such as Excel.
+    """
+    float32_columns = [column_name for column_name in df.columns if df[column_name].dtype == np.float32]
+    if not float32_columns:
+        return df
+    df = df.copy()
+    for column_name in float32_columns:
+        # Converting through text is slow, so each distinct value is converted once; code -1 (NaN) picks the appended NaN
+        codes, unique_values = pd.factorize(df[column_name].to_numpy())
+        df[column_name] = np.append(unique_values.astype(str).astype(np.float64), np.nan)[codes]
+    return df
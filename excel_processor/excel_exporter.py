@@ -1,33 +1,148 @@
 import pandas as pd
 import os
-from excel_processor.xlsb_converter import xlsb_converter
+from excel_processor import xlsx_writer
+from data_processor import widen_float32_columns
+from profiler import profile_stage
 
-def export_to_excel(df: pd.DataFrame, folder_path: str, output_file_name: str, console_instance): # type: ignore
+def export_to_excel(df: pd.DataFrame, folder_path: str, output_file_name: str, console_instance, writer: str = "native", summary_df: pd.DataFrame = None): # type: ignore
     """
     Export DataFrame to Excel file (.xlsx).
+    writer "native" writes the final workbook directly from Python, "com" converts it to .xlsb with Microsoft Excel.
+    If summary_df is given, it is written to a second sheet named 'Summary'.
     """
     if df.empty:
         console_instance.print_message("No data is processed for export to Excel.", "warning")
         return
-    
+
     output_path = os.path.join(folder_path, output_file_name)
 
+    if writer == "native":
+        if xlsx_writer.is_available():
+            try:
+                with profile_stage("write xlsx"):
+                    xlsx_writer.write_xlsx(df, output_path, summary_df)
+                console_instance.print_message(f"The XLSX file was created successfully: {output_path}", "success")
+            except Exception as e:
+                console_instance.print_message(f"Error saving Excel file: {e}", "error")
+            return
+        console_instance.print_message("Warning: xlsxwriter is not installed. Falling back to the Excel (COM) export.", "warning")
+
+    export_to_excel_com(df, output_path, console_instance, summary_df)
+
+def export_to_excel_com(df: pd.DataFrame, output_path: str, console_instance, summary_df: pd.DataFrame = None): # type: ignore
+    """
+    Export DataFrame to an .xlsx file, then convert it to .xlsb with Microsoft Excel and delete the .xlsx.
+    """
     try:
         # Save DataFrame to Excel file without indexes
-        df.to_excel(output_path, index=False)
+        with profile_stage("write xlsx"):
+            with pd.ExcelWriter(output_path) as excel_file:
+                widen_float32_columns(df).to_excel(excel_file, sheet_name=xlsx_writer.SHEET_NAME, index=False)
+                if summary_df is not None:
+                    widen_float32_columns(summary_df).to_excel(excel_file, sheet_name=xlsx_writer.SUMMARY_SHEET_NAME, index=False)
         console_instance.print_message(f"The XLSX file was created successfully: {output_path}", "success")
-        
-        # convert xlsx to xlsb
-        if xlsb_converter(output_path, console_instance):
-             # Delete xlsx file after convert to xlsb
-            try:
-                os.remove(output_path)
-            except FileNotFoundError:
-                console_instance.print_message(f"Error: File '{output_path}' was not found.", "error")
-            except PermissionError:
-                console_instance.print_message(f"Error: No permission to delete file '{output_path}'.", "error")
-            except Exception as e:
-                console_instance.print_message(f"An error occurred while deleting the file '{output_path}': {e}", "error")
+
+        convert_to_xlsb(output_path, console_instance)
 
     except Exception as e:
         console_instance.print_message(f"Error saving Excel file: {e}", "error")
+
+def convert_to_xlsb(output_path: str, console_instance):
+    """
+    Converts the .xlsx file to .xlsb with Microsoft Excel and deletes the .xlsx if the conversion succeeded.
+    Returns True if the .xlsb file was created.
+    """
+    try:
+        # win32com is only available on Windows, so it is imported only when the conversion is requested
+        from excel_processor.xlsb_converter import xlsb_converter
+    except ImportError as e:
+        console_instance.print_message(f"Warning: Excel (COM) automation is not available, the XLSX file is kept: {e}", "warning")
+        return False
+
+    # convert xlsx to xlsb
+    with profile_stage("xlsb convert"):
+        converted = xlsb_converter(output_path, console_instance)
+    if converted:
+         # Delete xlsx file after convert to xlsb
+        try:
+            os.remove(output_path)
+        except FileNotFoundError:
+            console_instance.print_message(f"Error: File '{output_path}' was not found.", "error")
+        except PermissionError:
+            console_instance.print_message(f"Error: No permission to delete file '{output_path}'.", "error")
+        except Exception as e:
+            console_instance.print_message(f"An error occurred while deleting the file '{output_path}': {e}", "error")
+    return bool(converted)
+
+class StreamingExcelExporter:
+    """
+    Writes records to an .xlsx file as they are processed, in row chunks, with a fixed column order.
+    Only the current chunk is held in memory; column widths are tracked per chunk and applied on close.
+    If a DefectSummary is given, its result is written to a 'Summary' sheet on close.
+    """
+    def __init__(self, folder_path: str, output_file_name: str, columns: list, console_instance, writer: str = "native", summary=None):
+        self.output_path = os.path.join(folder_path, output_file_name)
+        self.columns = columns
+        self.console_instance = console_instance
+        self.writer = writer
+        self.summary = summary
+        self.rows_written = 0
+        self._column_widths = [0] * len(columns)
+        self._row_limit_reported = False
+        self._workbook, self._worksheet, self._header_format = xlsx_writer.create_workbook(self.output_path)
+        self._worksheet.write_row(0, 0, columns, self._header_format)
+
+    @staticmethod
+    def is_available():
+        """Streaming needs the native writer (xlsxwriter)."""
+        return xlsx_writer.is_available()
+
+    def write(self, df: pd.DataFrame, file_path: str = None):
+        """Appends the rows of the DataFrame below the rows already written. file_path (the source file) is not used."""
+        if df.empty:
+            return
+        with profile_stage("export"):
+            self._write_rows(df)
+
+    def _write_rows(self, df: pd.DataFrame):
+        df = df.reindex(columns=self.columns, fill_value=None)
+
+        free_rows = xlsx_writer.MAX_EXCEL_ROWS - 1 - self.rows_written
+        if len(df) > free_rows:
+            if not self._row_limit_reported:
+                self.console_instance.print_message(f"Error: The Excel row limit ({xlsx_writer.MAX_EXCEL_ROWS - 1} data rows) was reached. Remaining rows are not exported.", "error")
+                self._row_limit_reported = True
+            df = df.iloc[:free_rows]
+
+        for chunk_start in range(0, len(df), xlsx_writer.WRITE_CHUNK_ROWS):
+            chunk = df.iloc[chunk_start:chunk_start + xlsx_writer.WRITE_CHUNK_ROWS]
+            self._column_widths = [max(old_width, new_width) for old_width, new_width in zip(self._column_widths, xlsx_writer.compute_column_widths(chunk))]
+            for row_values in xlsx_writer.frame_rows(chunk):
+                self.rows_written += 1
+                self._worksheet.write_row(self.rows_written, 0, row_values)
+
+    def close(self):
+        """
+        Finishes the workbook. Returns the number of data rows written.
+        If no rows were written, the empty workbook is removed.
+        """
+        for column_index, column_width in enumerate(self._column_widths):
+            self._worksheet.set_column(column_index, column_index, column_width)
+        try:
+            with profile_stage("export"):
+                if self.summary is not None and self.rows_written > 0:
+                    xlsx_writer.write_sheet(self._workbook.add_worksheet(xlsx_writer.SUMMARY_SHEET_NAME), self.summary.result(), self._header_format)
+                self._workbook.close()
+        except Exception as e:
+            self.console_instance.print_message(f"Error saving Excel file: {e}", "error")
+            return self.rows_written
+
+        if self.rows_written == 0:
+            os.remove(self.output_path)
+            self.console_instance.print_message("No data is processed for export to Excel.", "warning")
+            return 0
+
+        self.console_instance.print_message(f"The XLSX file was created successfully: {self.output_path} ({self.rows_written} rows)", "success")
+        if self.writer == "com":
+            convert_to_xlsb(self.output_path, self.console_instance)
+        return self.rows_written
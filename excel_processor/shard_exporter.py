@@ -0,0 +1,224 @@
+import os
+import re
+import json
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+from archive_reader import source_stat
+from cli_options import MAX_SHARD_ROWS
+from data_processor import concat_processed_records, PROCESSED_RECORD_COLUMNS
+from excel_processor import xlsx_writer
+from excel_processor.excel_exporter import export_to_excel, export_to_excel_com, convert_to_xlsb
+from file_processor import resolve_worker_count, active_worker_pool
+from file_scanner import source_file_date
+from profiler import profile_stage, format_bytes
+from summary_aggregator import write_summary_file
+
+SHARD_MANIFEST_SUFFIX = "_shards.json"
+# Characters that are not allowed in Windows file names
+UNSAFE_FILE_NAME_PATTERN = re.compile(r'[<>:"/\\|?*\x00-\x1f]')
+
+def shard_key_label(shard_key):
+    """Returns the shard key as a part of a file name."""
+    label = UNSAFE_FILE_NAME_PATTERN.sub("_", str(shard_key)).strip()
+    return label or "unknown"
+
+def split_shards(keyed_frames, shard_rows):
+    """
+    Splits each (shard key, DataFrame) into parts of at most shard_rows rows.
+    Returns [(shard key, part number, DataFrame)], with part number 0 for a shard that did not have to be split.
+    """
+    shards = []
+    for shard_key, shard_df in keyed_frames:
+        if len(shard_df) <= shard_rows:
+            shards.append((shard_key, 0, shard_df))
+            continue
+        for part_index, part_start in enumerate(range(0, len(shard_df), shard_rows), start=1):
+            shards.append((shard_key, part_index, shard_df.iloc[part_start:part_start + shard_rows]))
+    return shards
+
+def _write_shard_in_worker(shard_df, output_path):
+    """Worker process entry point. Returns None, or the error message if the shard could not be written."""
+    try:
+        xlsx_writer.write_xlsx(shard_df, output_path)
+    except Exception as e:
+        return str(e)
+    return None
+
+class ShardedExcelOutput:
+    """
+    Writer that exports the compiled records as several .xlsx workbooks (shards), written in parallel worker processes.
+    shard_by "rows" splits the records into workbooks of shard_rows rows, "coil" writes one workbook per Coil No
+    and "day" one per source file date; a coil or day that does not fit in shard_rows is split further.
+    Without shard_by, one workbook is written as before, and the output is only split by rows when it would not
+    fit in one Excel sheet. A manifest '<name>_shards.json' lists the shards and the rows each one holds.
+    Has the writer interface of compile_pipeline (write(df, file_path) and close()).
+    """
+    def __init__(self, folder_path: str, output_file_name: str, console_instance, writer: str = "native",
+                 shard_by: str = None, shard_rows: int = MAX_SHARD_ROWS, workers: int = 1, summary=None):
+        self.folder_path = folder_path
+        self.output_file_name = output_file_name
+        self.output_name_base = os.path.splitext(output_file_name)[0]
+        self.console_instance = console_instance
+        self.writer = writer
+        self.shard_by = shard_by
+        self.shard_rows = max(1, min(shard_rows or MAX_SHARD_ROWS, MAX_SHARD_ROWS))
+        self.workers = workers
+        self.summary = summary
+        # (source file date, DataFrame) of each batch; the date is only needed to shard by day
+        self._frames = []
+
+    def write(self, df, file_path=None):
+        """Keeps the batch until close()."""
+        file_date = None
+        if self.shard_by == "day" and file_path is not None:
+            try:
+                file_date = source_file_date(file_path, source_stat(file_path))
+            except OSError:
+                file_date = None
+        self._frames.append((file_date, df))
+
+    def close(self):
+        """Combines the batches, writes the shards (or the single workbook) and returns the number of rows."""
+        with profile_stage("concat"):
+            keyed_frames = self._combine_frames()
+        self._frames = []
+        total_rows = sum(len(shard_df) for _, shard_df in keyed_frames)
+        if total_rows == 0:
+            self.console_instance.print_message("No data is processed for export to Excel.", "warning")
+            return 0
+
+        if self.shard_by is None and total_rows <= self.shard_rows:
+            final_df = keyed_frames[0][1]
+            self.console_instance.print_message(f"Memory: the combined {len(final_df)} records use {format_bytes(int(final_df.memory_usage(deep=True).sum()))}.", "info")
+            with profile_stage("export"):
+                export_to_excel(final_df, self.folder_path, self.output_file_name, self.console_instance, self.writer,
+                                self.summary.result() if self.summary is not None else None)
+            return total_rows
+
+        if self.shard_by is None and total_rows > MAX_SHARD_ROWS:
+            self.console_instance.print_message(f"{total_rows} rows do not fit in one Excel sheet. The output is split into workbooks of {self.shard_rows} rows.", "warning")
+        elif self.shard_by is None:
+            self.console_instance.print_message(f"The {total_rows} rows are split into workbooks of {self.shard_rows} rows (--shardRows).", "info")
+
+        shards = split_shards(keyed_frames, self.shard_rows)
+        with profile_stage("export"):
+            shard_files = self._write_shards(shards)
+        self._write_manifest(shards, shard_files, total_rows)
+
+        if self.summary is not None:
+            # The shards do not share a workbook, so the summary is written next to them
+            write_summary_file(self.summary.result(), self.folder_path, self.output_name_base, self.console_instance)
+        return total_rows
+
+    def _combine_frames(self):
+        """Returns [(shard key, DataFrame)] in output order: one entry unless sharding by coil or day."""
+        if self.shard_by == "day":
+            frames_by_day = {}
+            for file_date, df in self._frames:
+                frames_by_day.setdefault(file_date or "", []).append(df)
+            return [
+                (file_date, concat_processed_records(frames).reindex(columns=PROCESSED_RECORD_COLUMNS, fill_value=None))
+                for file_date, frames in sorted(frames_by_day.items())
+            ]
+
+        final_df = concat_processed_records([df for _, df in self._frames]).reindex(columns=PROCESSED_RECORD_COLUMNS, fill_value=None)
+        if self.shard_by == "coil":
+            coil_numbers = final_df["Coil No"].astype(object).where(final_df["Coil No"].notna(), "")
+            return [(coil_no, coil_df) for coil_no, coil_df in final_df.groupby(coil_numbers, sort=True)]
+        return [(None, final_df)]
+
+    def _shard_file_name(self, shard_index, shard_key, part_index):
+        if shard_key is None:
+            return f"{self.output_name_base}_part{shard_index + 1:03d}.xlsx"
+        part_suffix = f"_part{part_index:03d}" if part_index else ""
+        return f"{self.output_name_base}_{shard_key_label(shard_key)}{part_suffix}.xlsx"
+
+    def _write_shards(self, shards):
+        """
+        Writes the shards, in parallel worker processes if workers > 1 and xlsxwriter is installed
+        (in the shared pool of file_processor.shared_worker_pool, if one is set up). Returns the file name of each shard, or None for a shard that could not be written.
+        """
+        output_paths = [os.path.join(self.folder_path, self._shard_file_name(shard_index, shard_key, part_index))
+                        for shard_index, (shard_key, part_index, _) in enumerate(shards)]
+        if not xlsx_writer.is_available():
+            # Same fallback as export_to_excel: pandas writes each workbook and Excel converts it
+            self.console_instance.print_message("Warning: xlsxwriter is not installed. Falling back to the Excel (COM) export.", "warning")
+            for output_path, (_, _, shard_df) in zip(output_paths, shards):
+                export_to_excel_com(shard_df, output_path, self.console_instance)
+            return [self._existing_file_name(output_path) for output_path in output_paths]
+
+        shared_pool = active_worker_pool()
+        workers = min(shared_pool[1] if shared_pool is not None else resolve_worker_count(self.workers), len(shards))
+        self.console_instance.print_message(f"Writing {len(shards)} workbooks" + (f" with {workers} worker processes." if workers > 1 else "."), "info")
+        errors = [None] * len(shards)
+        if workers <= 1:
+            for shard_index, (output_path, (_, _, shard_df)) in enumerate(zip(output_paths, shards)):
+                errors[shard_index] = _write_shard_in_worker(shard_df, output_path)
+        else:
+            executor = shared_pool[0] if shared_pool is not None else ProcessPoolExecutor(max_workers=workers)
+            # Only a few shards are handed to the workers at a time, each one is a copy of its rows
+            pending_results = deque()
+            try:
+                for shard_index, (output_path, (_, _, shard_df)) in enumerate(zip(output_paths, shards)):
+                    if len(pending_results) >= workers:
+                        finished_index, future = pending_results.popleft()
+                        errors[finished_index] = future.result()
+                    pending_results.append((shard_index, executor.submit(_write_shard_in_worker, shard_df, output_path)))
+                while pending_results:
+                    finished_index, future = pending_results.popleft()
+                    errors[finished_index] = future.result()
+            finally:
+                if shared_pool is None:
+                    executor.shutdown(wait=True, cancel_futures=True)
+                else:
+                    for _, future in pending_results:
+                        future.cancel()
+
+        shard_files = []
+        for output_path, error, (_, _, shard_df) in zip(output_paths, errors, shards):
+            if error is not None:
+                self.console_instance.print_message(f"Error saving Excel file '{output_path}': {error}", "error")
+                shard_files.append(None)
+                continue
+            self.console_instance.print_message(f"The XLSX file was created successfully: {output_path} ({len(shard_df)} rows)", "success")
+            if self.writer == "com":
+                convert_to_xlsb(output_path, self.console_instance)
+            shard_files.append(self._existing_file_name(output_path))
+        return shard_files
+
+    @staticmethod
+    def _existing_file_name(output_path):
+        """Returns the name of the workbook that was kept: the .xlsb file if the .xlsx was converted, or None."""
+        xlsb_path = os.path.splitext(output_path)[0] + ".xlsb"
+        if os.path.exists(xlsb_path) and not os.path.exists(output_path):
+            return os.path.basename(xlsb_path)
+        return os.path.basename(output_path) if os.path.exists(output_path) else None
+
+    def _write_manifest(self, shards, shard_files, total_rows):
+        """
+        Writes '<name>_shards.json' with each shard's file, key and rows.
+        first_row and last_row number the data rows across all shards in manifest order, starting at 1.
+        """
+        manifest_path = os.path.join(self.folder_path, self.output_name_base + SHARD_MANIFEST_SUFFIX)
+        shard_entries = []
+        first_row = 1
+        for (shard_key, part_index, shard_df), shard_file in zip(shards, shard_files):
+            shard_entries.append({
+                "file": shard_file,
+                "key": shard_key,
+                "part": part_index,
+                "rows": len(shard_df),
+                "first_row": first_row,
+                "last_row": first_row + len(shard_df) - 1,
+            })
+            first_row += len(shard_df)
+
+        try:
+            with open(manifest_path, 'w', encoding='utf-8') as f:
+                json.dump({"shard_by": self.shard_by or "rows", "shard_rows": self.shard_rows, "total_rows": total_rows, "shards": shard_entries}, f, indent=2)
+        except Exception as e:
+            self.console_instance.print_message(f"Error saving shard manifest: {e}", "error")
+            return
+        written_files = sum(shard_file is not None for shard_file in shard_files)
+        self.console_instance.print_message(f"{written_files} of {len(shards)} workbooks were written. The shard manifest was created: {manifest_path}", "success")
@@ -0,0 +1,84 @@
+import importlib.util
+import pandas as pd
+
+from cli_options import MAX_EXCEL_ROWS
+from data_processor import widen_float32_columns
+
+SHEET_NAME = "Sheet1"
+SUMMARY_SHEET_NAME = "Summary"
+MIN_COLUMN_WIDTH = 8
+MAX_COLUMN_WIDTH = 60
+# Numbers in a column are formatted alike, so their width is estimated from the first rows only
+NUMERIC_WIDTH_SAMPLE_ROWS = 10000
+WRITE_CHUNK_ROWS = 50000
+
+def is_available():
+    """The native writer needs xlsxwriter."""
+    return importlib.util.find_spec("xlsxwriter") is not None
+
+def compute_column_widths(df: pd.DataFrame):
+    """
+    Computes an Excel column width for each column from its header and values,
+    so the workbook does not need an AutoFit pass in Excel.
+    """
+    column_widths = []
+    for column_name in df.columns:
+        series = df[column_name].dropna()
+        max_length = len(str(column_name))
+        if not series.empty:
+            if pd.api.types.is_numeric_dtype(series):
+                sample_values = widen_float32_columns(series.iloc[:NUMERIC_WIDTH_SAMPLE_ROWS].to_frame()).iloc[:, 0]
+            else:
+                # Text columns repeat a lot (Coil No, Class Name, ...), measure each distinct value once
+                sample_values = pd.Series(pd.unique(series.astype(str)))
+            max_length = max(max_length, int(sample_values.astype(str).str.len().max()))
+        column_widths.append(min(max(max_length + 2, MIN_COLUMN_WIDTH), MAX_COLUMN_WIDTH))
+    return column_widths
+
+def frame_rows(df: pd.DataFrame):
+    """Yields the rows of the DataFrame as lists of Python values, with missing values as None."""
+    for chunk_start in range(0, len(df), WRITE_CHUNK_ROWS):
+        chunk = widen_float32_columns(df.iloc[chunk_start:chunk_start + WRITE_CHUNK_ROWS]).astype(object)
+        yield from chunk.where(chunk.notna(), None).values.tolist()
+
+def create_workbook(output_path: str):
+    """
+    Opens an xlsxwriter workbook that streams rows to disk and keeps text as plain strings.
+    Returns (workbook, worksheet, header_format).
+    """
+    import xlsxwriter
+
+    workbook = xlsxwriter.Workbook(output_path, {
+        'constant_memory': True,
+        'strings_to_urls': False,
+        'strings_to_formulas': False,
+    })
+    worksheet = workbook.add_worksheet(SHEET_NAME)
+    # Same header style as DataFrame.to_excel
+    header_format = workbook.add_format({'bold': True, 'border': 1, 'align': 'center', 'valign': 'top'})
+    return workbook, worksheet, header_format
+
+def write_sheet(worksheet, df: pd.DataFrame, header_format):
+    """Writes the header and rows of the DataFrame to an empty worksheet, with the column widths fitted."""
+    for column_index, column_width in enumerate(compute_column_widths(df)):
+        worksheet.set_column(column_index, column_index, column_width)
+
+    worksheet.write_row(0, 0, [str(column_name) for column_name in df.columns], header_format)
+    for row_index, row_values in enumerate(frame_rows(df), start=1):
+        worksheet.write_row(row_index, 0, row_values)
+
+def write_xlsx(df: pd.DataFrame, output_path: str, summary_df: pd.DataFrame = None):
+    """
+    Writes the DataFrame to an .xlsx file without Excel, with the column widths already fitted.
+    If summary_df is given, it is written to a second sheet named 'Summary'.
+    """
+    if len(df) + 1 > MAX_EXCEL_ROWS:
+        raise ValueError(f"{len(df)} rows do not fit in one Excel sheet (limit {MAX_EXCEL_ROWS - 1} data rows).")
+
+    workbook, worksheet, header_format = create_workbook(output_path)
+    try:
+        write_sheet(worksheet, df, header_format)
+        if summary_df is not None:
+            write_sheet(workbook.add_worksheet(SUMMARY_SHEET_NAME), summary_df, header_format)
+    finally:
+        workbook.close()
@@ -0,0 +1,189 @@
+import os
+import time
+from collections import deque
+from contextlib import contextmanager
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+
+from archive_reader import source_file_name
+from console.buffered_console import BufferedConsole
+from csv_parser import parse_csv_sections
+from data_processor import extract_coil_no_from_filename, process_records, concat_processed_records
+from profiler import RunProfiler, active_profiler, set_active_profiler, profile_stage
+
+# Bump when a change to parsing or processing changes the records produced for a file,
+# so results stored in the parse cache by older versions are not reused
+PARSER_VERSION = 3
+
+# Files handed to the worker processes ahead of the consumer, per worker.
+# Keeps the finished but not yet consumed results (and their memory) bounded when the consumer is slow.
+FILES_IN_FLIGHT_PER_WORKER = 2
+
+# (executor, worker count) of the pool set up by shared_worker_pool(), used instead of a new pool per call
+_shared_pool = None
+
+def resolve_worker_count(workers):
+    """
+    Returns the number of worker processes to use. 0 or less means one per CPU core.
+    """
+    if workers is None or workers <= 0:
+        return os.cpu_count() or 1
+    return workers
+
+def active_worker_pool():
+    """Returns (executor, worker count) of the pool set up by shared_worker_pool(), or None outside of it."""
+    return _shared_pool
+
+@contextmanager
+def shared_worker_pool(workers):
+    """
+    Keeps one pool of worker processes for every process_csv_files() call (and every sharded Excel export)
+    inside the with block, so several compiles in one process (see job_runner) do not each start their own workers.
+    """
+    global _shared_pool
+    workers = resolve_worker_count(workers)
+    if workers <= 1:
+        yield
+        return
+    previous_pool = _shared_pool
+    executor = ProcessPoolExecutor(max_workers=workers)
+    _shared_pool = (executor, workers)
+    try:
+        yield
+    finally:
+        _shared_pool = previous_pool
+        executor.shutdown(wait=True, cancel_futures=True)
+
+def process_csv_file(file_path, console_instance, parser_mode="mmap", csv_engine="c", record_filter=None):
+    """
+    Runs the per-file work: extracts the Coil No, parses the 'Top' and 'Bottom' sections and processes the records.
+    If a RecordFilter is given, only the records it selects are parsed and kept.
+    Returns (the processed records of the file as one DataFrame, read_failed). read_failed is True if the file or one
+    of its sections could not be read; the records are then incomplete and must not be cached or recorded as done.
+    """
+    file_name = source_file_name(file_path)
+    console_instance.print_message(f"Reading file: {file_name}", "info")
+
+    # The Coil No of a zip member comes from the member name, not the archive name
+    coil_no = extract_coil_no_from_filename(file_name, console_instance)
+    try:
+        parse_start = time.perf_counter()
+        top_df, bottom_df = parse_csv_sections(file_path, console_instance, parser_mode, csv_engine, record_filter)
+        transform_start = time.perf_counter()
+        read_failed = top_df is None or bottom_df is None
+        processed_df = concat_processed_records([
+            process_records(top_df, coil_no, "Top", record_filter),
+            process_records(bottom_df, coil_no, "Bottom", record_filter),
+        ])
+        profiler = active_profiler()
+        if profiler is not None:
+            profiler.add_file_timing(file_path, transform_start - parse_start, time.perf_counter() - transform_start,
+                                     sum(len(section_df) for section_df in (top_df, bottom_df) if section_df is not None), len(processed_df))
+        return processed_df, read_failed
+    except Exception as e:
+        console_instance.print_message(f"Error processing file '{file_name}': {e}", "error")
+        return concat_processed_records([]), True
+
+def _process_csv_file_in_worker(file_path, parser_mode, csv_engine, profile=False, record_filter=None):
+    """
+    Worker process entry point. Log messages (and the file timings if profile is set) are buffered and returned with the result.
+    """
+    console_buffer = BufferedConsole()
+    worker_profiler = RunProfiler() if profile else None
+    previous_profiler = set_active_profiler(worker_profiler)
+    try:
+        processed_df, read_failed = process_csv_file(file_path, console_buffer, parser_mode, csv_engine, record_filter)
+    finally:
+        set_active_profiler(previous_profiler)
+    return processed_df, read_failed, console_buffer.messages, worker_profiler.file_timings if worker_profiler is not None else []
+
+def _process_uncached_files(csv_files, console_instance, workers, parser_mode, csv_engine, record_filter=None):
+    """
+    Processes the CSV files, in parallel worker processes if workers > 1 (or in the shared pool, if one is set up).
+    Yields (processed DataFrame, read_failed) for each file in the order of csv_files (see process_csv_file).
+    """
+    shared_pool = _shared_pool
+    if shared_pool is not None:
+        workers = shared_pool[1]
+    workers = min(resolve_worker_count(workers), max(len(csv_files), 1))
+
+    if workers <= 1:
+        for file_path in csv_files:
+            yield process_csv_file(file_path, console_instance, parser_mode, csv_engine, record_filter)
+        return
+
+    console_instance.print_message(f"Processing {len(csv_files)} files with {workers} worker processes.", "info")
+    profiler = active_profiler()
+    worker_task = partial(_process_csv_file_in_worker, parser_mode=parser_mode, csv_engine=csv_engine, profile=profiler is not None, record_filter=record_filter)
+    executor = shared_pool[0] if shared_pool is not None else ProcessPoolExecutor(max_workers=workers)
+    pending_results = deque()
+    try:
+        # Results are taken in submission order, whatever order the workers finish in.
+        # A new file is only submitted when a result is taken, unlike executor.map which submits every file at once.
+        remaining_files = iter(csv_files)
+        for file_path in remaining_files:
+            pending_results.append(executor.submit(worker_task, file_path))
+            if len(pending_results) >= workers * FILES_IN_FLIGHT_PER_WORKER:
+                break
+
+        while pending_results:
+            processed_df, read_failed, messages, file_timings = pending_results.popleft().result()
+            next_file_path = next(remaining_files, None)
+            if next_file_path is not None:
+                pending_results.append(executor.submit(worker_task, next_file_path))
+
+            BufferedConsole.replay(messages, console_instance)
+            if profiler is not None:
+                profiler.merge_file_timings(file_timings)
+            yield processed_df, read_failed
+    finally:
+        # If the caller stops early (e.g. a cancelled run), the files not started yet are dropped
+        if shared_pool is None:
+            executor.shutdown(wait=True, cancel_futures=True)
+        else:
+            for pending_result in pending_results:
+                pending_result.cancel()
+
+def process_csv_files(csv_files, console_instance, workers=1, parser_mode="mmap", csv_engine="c", parse_cache=None, record_filter=None):
+    """
+    Processes the CSV files, in parallel worker processes if workers > 1.
+    Yields (file_path, processed DataFrame, read_failed) in the order of csv_files; worker messages are
+    printed to console_instance before the result of their file is yielded.
+    If a ParseCache is given, unchanged files are loaded from it and only new or changed files are parsed.
+    Files that could not be read completely (read_failed) are not stored in the cache, so they are parsed again next time.
+    If a RecordFilter is given, only the records it selects are kept (and cached apart from unfiltered results).
+    """
+    if parse_cache is None:
+        uncached_results = _process_uncached_files(csv_files, console_instance, workers, parser_mode, csv_engine, record_filter)
+        try:
+            for file_path, (processed_df, read_failed) in zip(csv_files, uncached_results):
+                yield file_path, processed_df, read_failed
+        finally:
+            uncached_results.close()
+        return
+
+    cache_variant = csv_engine if record_filter is None or not record_filter.is_active else f"{csv_engine};{record_filter.cache_variant()}"
+    uncached_files = [file_path for file_path in csv_files if not parse_cache.contains(file_path, cache_variant)]
+    if len(uncached_files) < len(csv_files):
+        console_instance.print_message(f"{len(csv_files) - len(uncached_files)} of {len(csv_files)} files are loaded from the parse cache.", "info")
+    uncached_set = set(uncached_files)
+    uncached_results = _process_uncached_files(uncached_files, console_instance, workers, parser_mode, csv_engine, record_filter)
+    try:
+        for file_path in csv_files:
+            processed_df = None
+            read_failed = False
+            if file_path not in uncached_set:
+                with profile_stage("cache load"):
+                    processed_df = parse_cache.load(file_path, cache_variant)
+            if processed_df is None:
+                if file_path in uncached_set:
+                    processed_df, read_failed = next(uncached_results)
+                else:
+                    # The cache entry disappeared or is unreadable, parse the file again
+                    processed_df, read_failed = process_csv_file(file_path, console_instance, parser_mode, csv_engine, record_filter)
+                if not read_failed:
+                    with profile_stage("cache store"):
+                        parse_cache.store(file_path, processed_df, cache_variant)
+            yield file_path, processed_df, read_failed
+    finally:
+        uncached_results.close()
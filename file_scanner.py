@@ -0,0 +1,193 @@
+import os
+import json
+import bisect
+from datetime import datetime
+
+from archive_reader import (
+    archive_member_path, split_archive_path, source_file_name, is_zip_file_name, is_gzip_file_name, gzip_mtime, list_zip_members,
+)
+from data_processor import match_coil_no, extract_date_from_filename
+from cli_options import OUTPUT_CSV_SUFFIX
+from parse_cache import CACHE_DIR_NAME
+
+MANIFEST_FILE_NAME = "manifest.json"
+MANIFEST_VERSION = 3
+
+def source_file_date(file_path, file_stat):
+    """Returns the date of a source file as 'YYYY-MM-DD': from the file name, or from its modification time."""
+    return extract_date_from_filename(source_file_name(file_path)) or datetime.fromtimestamp(file_stat.st_mtime).strftime('%Y-%m-%d')
+
+class FileManifest:
+    """
+    Persistent list of the CSV files in a folder: name, mtime, size, Coil No and date from the file name.
+    Members of .zip archives and .csv.gz files are listed too, dated by the timestamps stored in the archive.
+    Every directory is listed (with os.scandir) and every file stat'ed on each update, so a file rewritten in place
+    is dated by its new modification time. Only the reads that cost more than a stat are skipped for unchanged files
+    (same mtime and size): the gzip header of a .csv.gz file and the member list of a .zip archive.
+    Date-range queries are answered from a sorted mtime index.
+    """
+    def __init__(self, folder_path, console_instance, use_manifest=True):
+        self.folder_path = folder_path
+        self.console_instance = console_instance
+        self.use_manifest = use_manifest
+        self.manifest_path = os.path.join(folder_path, CACHE_DIR_NAME, MANIFEST_FILE_NAME)
+        self.directories_scanned = 0
+        self._directories = {}
+        self._mtime_index = []
+
+        if use_manifest and os.path.exists(self.manifest_path):
+            try:
+                with open(self.manifest_path, 'r', encoding='utf-8') as f:
+                    manifest = json.load(f)
+                if manifest.get("version") == MANIFEST_VERSION:
+                    self._directories = manifest.get("directories", {})
+            except Exception as e:
+                self.console_instance.print_message(f"Warning: The file manifest is unreadable and will be rebuilt: {e}", "warning")
+                self._directories = {}
+
+    def update(self, recursive=False, rescan=False):
+        """
+        Brings the manifest up to date with the folder (and its subfolders if recursive).
+        rescan also reads the gzip headers and zip member lists of files whose mtime and size are unchanged.
+        """
+        updated_directories = {}
+        pending_directories = [""]
+        while pending_directories:
+            relative_dir = pending_directories.pop()
+            directory_entry = self._update_directory(relative_dir, rescan)
+            if directory_entry is None:
+                continue
+            updated_directories[relative_dir] = directory_entry
+            if recursive:
+                pending_directories.extend(os.path.join(relative_dir, subdir_name) for subdir_name in directory_entry["subdirs"])
+
+        if recursive:
+            self._directories = updated_directories
+        else:
+            # Keep the subfolders of an earlier recursive scan for the next one
+            self._directories.update(updated_directories)
+        self._build_index(updated_directories)
+
+    def _update_directory(self, relative_dir, rescan):
+        """Returns the manifest entry of one directory, reusing the entries of its unchanged files."""
+        directory_path = os.path.join(self.folder_path, relative_dir)
+        try:
+            directory_mtime_ns = os.stat(directory_path).st_mtime_ns
+        except OSError as e:
+            self.console_instance.print_message(f"Warning: Failed to read folder '{directory_path}': {e}", "warning")
+            return None
+
+        known_entry = None if rescan else self._directories.get(relative_dir)
+        known_files = known_entry["files"] if known_entry is not None else {}
+        known_archives = known_entry.get("archives", {}) if known_entry is not None else {}
+        files = {}
+        archives = {}
+        subdirs = []
+        self.directories_scanned += 1
+        with os.scandir(directory_path) as directory_entries:
+            for entry in directory_entries:
+                try:
+                    if entry.is_dir():
+                        # Skip hidden folders such as the cache folder
+                        if not entry.name.startswith('.'):
+                            subdirs.append(entry.name)
+                        continue
+                    is_zip = is_zip_file_name(entry.name)
+                    if not (is_zip or is_gzip_file_name(entry.name) or entry.name.lower().endswith(".csv")) or entry.name.lower().endswith(OUTPUT_CSV_SUFFIX):
+                        continue
+                    # On Windows the stat data comes with the directory listing, no extra call per file
+                    entry_stat = entry.stat()
+                except OSError as e:
+                    self.console_instance.print_message(f"Warning: Failed to get the modification time of file '{entry.name}': {e}", "warning")
+                    continue
+
+                if is_zip:
+                    archives[entry.name] = {"mtime": entry_stat.st_mtime, "size": entry_stat.st_size}
+                    files.update(self._archive_files(entry.path, entry.name, entry_stat, known_archives.get(entry.name), known_files))
+                    continue
+
+                known_file = known_files.get(entry.name)
+                if known_file is not None and known_file["mtime_on_disk"] == entry_stat.st_mtime and known_file["size"] == entry_stat.st_size:
+                    files[entry.name] = known_file
+                else:
+                    # A .csv.gz file is dated by the time of the original CSV file in its header
+                    mtime = gzip_mtime(entry.path, entry_stat.st_mtime) if is_gzip_file_name(entry.name) else entry_stat.st_mtime
+                    files[entry.name] = self._file_entry(entry.name, mtime, entry_stat.st_size, entry_stat.st_mtime)
+
+        return {"mtime_ns": directory_mtime_ns, "files": files, "archives": archives, "subdirs": sorted(subdirs)}
+
+    @staticmethod
+    def _file_entry(file_name, mtime, size, mtime_on_disk=None):
+        return {
+            "mtime": mtime,
+            "mtime_on_disk": mtime if mtime_on_disk is None else mtime_on_disk,
+            "size": size,
+            "coil_no": match_coil_no(source_file_name(file_name)),
+            "file_date": extract_date_from_filename(source_file_name(file_name)),
+        }
+
+    def _archive_files(self, archive_path, archive_name, archive_stat, known_archive, known_files):
+        """
+        Returns the manifest entries of the CSV members of a zip archive, keyed '<archive name>::<member name>'.
+        The members are dated by their own timestamps in the archive. An unchanged archive is not opened again.
+        """
+        member_prefix = archive_member_path(archive_name, "")
+        if known_archive is not None and known_archive["mtime"] == archive_stat.st_mtime and known_archive["size"] == archive_stat.st_size:
+            return {file_name: file_info for file_name, file_info in known_files.items() if file_name.startswith(member_prefix)}
+
+        try:
+            members = list_zip_members(archive_path, OUTPUT_CSV_SUFFIX)
+        except Exception as e:
+            self.console_instance.print_message(f"Warning: Failed to read archive '{archive_name}': {e}", "warning")
+            return {}
+        return {
+            archive_member_path(archive_name, member_name): self._file_entry(archive_member_path(archive_name, member_name), member_mtime, member_size)
+            for member_name, member_mtime, member_size in members
+        }
+
+    def _build_index(self, directories):
+        """Builds the list of (mtime, path) of the given directories, sorted by modification time."""
+        self._mtime_index = sorted(
+            (file_info["mtime"], os.path.join(self.folder_path, relative_dir, file_name))
+            for relative_dir, directory_entry in directories.items()
+            for file_name, file_info in directory_entry["files"].items()
+        )
+
+    def files_between(self, start_date, end_date):
+        """Returns the paths of the CSV files modified between start_date and end_date, oldest first."""
+        start_index = bisect.bisect_left(self._mtime_index, (start_date.timestamp(),))
+        end_index = bisect.bisect_right(self._mtime_index, (end_date.timestamp(), chr(0x10FFFF)))
+        return [file_path for _, file_path in self._mtime_index[start_index:end_index]]
+
+    def file_info(self, file_path):
+        """Returns the manifest entry (mtime, size, coil_no, file_date) of a file or zip member, or None."""
+        archive_path, member_name = split_archive_path(file_path)
+        relative_dir, file_name = os.path.split(os.path.relpath(archive_path, self.folder_path))
+        if member_name is not None:
+            file_name = archive_member_path(file_name, member_name)
+        directory_entry = self._directories.get(relative_dir)
+        if directory_entry is None:
+            return None
+        return directory_entry["files"].get(file_name)
+
+    def save(self):
+        """Writes the manifest next to the parse cache in the input folder."""
+        if not self.use_manifest:
+            return
+        try:
+            os.makedirs(os.path.dirname(self.manifest_path), exist_ok=True)
+            temp_manifest_path = self.manifest_path + ".tmp"
+            with open(temp_manifest_path, 'w', encoding='utf-8') as f:
+                json.dump({"version": MANIFEST_VERSION, "directories": self._directories}, f)
+            os.replace(temp_manifest_path, self.manifest_path)
+        except Exception as e:
+            self.console_instance.print_message(f"Warning: Failed to write the file manifest: {e}", "warning")
+
+def find_csv_files(folder_path, start_date, end_date, console_instance, recursive=False, use_manifest=True, rescan=False):
+    """
+    Returns the paths of the CSV files in the folder modified between start_date and end_date, oldest first.
+    """
+    manifest = FileManifest(folder_path, console_instance, use_manifest)
+    manifest.update(recursive, rescan)
+    manifest.save()
+    return manifest.files_between(start_date, end_date)
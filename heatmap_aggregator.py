@@ -0,0 +1,155 @@
+import os
+import numpy as np
+import pandas as pd
+
+from cli_options import DEFAULT_LENGTH_BIN_M, DEFAULT_WIDTH_BIN_MM, MAX_HEATMAP_LENGTH_M, MAX_HEATMAP_WIDTH_MM
+from excel_processor.shard_exporter import UNSAFE_FILE_NAME_PATTERN
+
+HEATMAP_SIDES = ["Top", "Bottom"]
+HEATMAP_FOLDER_SUFFIX = "_heatmaps"
+
+class CoilHeatmap:
+    """
+    Defect counts of one coil as an int32 array [side, class, length bin, width bin],
+    grown as records further along the coil or new class names arrive.
+    """
+    def __init__(self, class_names=None, counts=None):
+        self.class_names = list(class_names) if class_names is not None else []
+        self.counts = counts if counts is not None else np.zeros((len(HEATMAP_SIDES), 0, 0, 0), dtype=np.int32)
+
+    def class_indexes(self, class_names):
+        """Returns the index of each class name in self.class_names, adding the new ones."""
+        known_indexes = {class_name: class_index for class_index, class_name in enumerate(self.class_names)}
+        indexes = []
+        for class_name in class_names:
+            if class_name not in known_indexes:
+                known_indexes[class_name] = len(self.class_names)
+                self.class_names.append(class_name)
+            indexes.append(known_indexes[class_name])
+        return np.array(indexes, dtype=np.int64)
+
+    def add_counts(self, batch_counts):
+        """Adds a count array whose class axis follows self.class_names, growing self.counts to fit both."""
+        target_shape = tuple(max(current_size, batch_size) for current_size, batch_size in zip(self.counts.shape, batch_counts.shape))
+        if target_shape != self.counts.shape:
+            self.counts = np.pad(self.counts, [(0, target_size - current_size) for target_size, current_size in zip(target_shape, self.counts.shape)])
+        self.counts[tuple(slice(0, batch_size) for batch_size in batch_counts.shape)] += batch_counts
+
+class DefectHeatmaps:
+    """
+    Defect-density maps per coil, updated from each file's records while they are compiled (see compile_pipeline.compile_files).
+    Records are counted in bins of length_bin_m along the coil ('Top m') and width_bin_mm across it
+    ('Distance from Left Edge mm'), per side and per class, with one vectorised np.bincount per coil and file.
+    Only the maps of the coils in the latest file are held in memory: a coil's map is written to
+    '<heatmap_folder>/<Coil No>.npz' once a file without that coil arrives, and read back if the coil comes up again.
+    """
+    def __init__(self, heatmap_folder, console_instance, length_bin_m=DEFAULT_LENGTH_BIN_M, width_bin_mm=DEFAULT_WIDTH_BIN_MM):
+        if not (length_bin_m > 0 and width_bin_mm > 0):
+            raise ValueError("the heatmap bin sizes must be greater than 0")
+        self.heatmap_folder = heatmap_folder
+        self.console_instance = console_instance
+        self.length_bin_m = float(length_bin_m)
+        self.width_bin_mm = float(width_bin_mm)
+        self.skipped_records = 0
+        self.out_of_range_records = 0
+        self.write_failed = False
+        self._coils = {}
+        # Coil No -> file of the coils already written
+        self._written_coils = {}
+
+    def add(self, df: pd.DataFrame):
+        """
+        Adds the records of one file. Records without a position, or with a negative one, are not counted, nor are
+        records beyond MAX_HEATMAP_LENGTH_M or MAX_HEATMAP_WIDTH_MM. The maps of coils not in this file are written.
+        """
+        if df.empty:
+            return
+        positions = pd.to_numeric(df["Distance from HE CGL (m)"], errors="coerce").to_numpy(dtype=np.float64)
+        left_distances = pd.to_numeric(df["Distance Left (mm)"], errors="coerce").to_numpy(dtype=np.float64)
+        side_indexes = np.select([(df["Top/Bottom"] == side).to_numpy() for side in HEATMAP_SIDES], list(range(len(HEATMAP_SIDES))), -1)
+
+        valid_mask = (positions >= 0) & (left_distances >= 0) & (side_indexes >= 0)
+        in_range_mask = (positions <= MAX_HEATMAP_LENGTH_M) & (left_distances <= MAX_HEATMAP_WIDTH_MM)
+        self.skipped_records += int(len(valid_mask) - valid_mask.sum())
+        self.out_of_range_records += int((valid_mask & ~in_range_mask).sum())
+        valid_mask &= in_range_mask
+        if not valid_mask.any():
+            return
+
+        length_bins = (positions[valid_mask] // self.length_bin_m).astype(np.int64)
+        width_bins = (left_distances[valid_mask] // self.width_bin_mm).astype(np.int64)
+        side_indexes = side_indexes[valid_mask].astype(np.int64)
+        coil_codes, coil_values = pd.factorize(df["Coil No"].astype(object).fillna("").to_numpy()[valid_mask])
+        class_codes, class_values = pd.factorize(df["Class Name"].astype(object).fillna("").to_numpy()[valid_mask])
+
+        batch_coils = set(coil_values)
+        for coil_no in [coil_no for coil_no in self._coils if coil_no not in batch_coils]:
+            self._write_coil(coil_no)
+
+        for coil_code, coil_no in enumerate(coil_values):
+            coil_mask = coil_codes == coil_code
+            coil_heatmap = self._coils.get(coil_no)
+            if coil_heatmap is None:
+                coil_heatmap = self._coils[coil_no] = self._read_coil(coil_no)
+            # Class codes of this batch -> class axis of the coil, which only gets the classes found on the coil
+            coil_class_codes = class_codes[coil_mask]
+            present_codes = np.unique(coil_class_codes)
+            code_indexes = np.zeros(len(class_values), dtype=np.int64)
+            code_indexes[present_codes] = coil_heatmap.class_indexes(class_values[present_codes])
+            class_indexes = code_indexes[coil_class_codes]
+
+            shape = (len(HEATMAP_SIDES), len(coil_heatmap.class_names), int(length_bins[coil_mask].max()) + 1, int(width_bins[coil_mask].max()) + 1)
+            flat_indexes = np.ravel_multi_index((side_indexes[coil_mask], class_indexes, length_bins[coil_mask], width_bins[coil_mask]), shape)
+            batch_counts = np.bincount(flat_indexes, minlength=int(np.prod(shape))).astype(np.int32).reshape(shape)
+            coil_heatmap.add_counts(batch_counts)
+
+    def _coil_file_path(self, coil_no):
+        file_label = UNSAFE_FILE_NAME_PATTERN.sub("_", coil_no).strip() or "unknown"
+        return os.path.join(self.heatmap_folder, f"{file_label}.npz")
+
+    def _read_coil(self, coil_no):
+        """Returns the map of a coil: read back from its file if it was already written, otherwise an empty one."""
+        coil_file_path = self._written_coils.get(coil_no)
+        if coil_file_path is None:
+            return CoilHeatmap()
+        with np.load(coil_file_path) as coil_file:
+            return CoilHeatmap(coil_file["class_names"].tolist(), coil_file["counts"])
+
+    def _write_coil(self, coil_no):
+        """
+        Writes the map of one coil as a compressed .npz file and releases it. The file holds 'counts'
+        (int32 [side, class, length bin, width bin]), 'sides', 'class_names', 'length_bin_m' and 'width_bin_mm';
+        bin i along the coil covers [i * length_bin_m, (i + 1) * length_bin_m).
+        """
+        coil_heatmap = self._coils.pop(coil_no)
+        if self.write_failed:
+            return
+        coil_file_path = self._coil_file_path(coil_no)
+        try:
+            os.makedirs(self.heatmap_folder, exist_ok=True)
+            np.savez_compressed(
+                coil_file_path,
+                counts=coil_heatmap.counts, sides=np.array(HEATMAP_SIDES), class_names=np.array(coil_heatmap.class_names, dtype=str),
+                length_bin_m=self.length_bin_m, width_bin_mm=self.width_bin_mm,
+            )
+        except Exception as e:
+            self.console_instance.print_message(f"Error saving heatmaps: {e}", "error")
+            self.write_failed = True
+            return
+        self._written_coils[coil_no] = coil_file_path
+
+    def close(self):
+        """Writes the maps still in memory and reports the result. Returns the heatmap folder, or None if nothing was written."""
+        for coil_no in list(self._coils):
+            self._write_coil(coil_no)
+        if self.out_of_range_records:
+            self.console_instance.print_message(f"Warning: {self.out_of_range_records} records beyond {MAX_HEATMAP_LENGTH_M:g} m or {MAX_HEATMAP_WIDTH_MM:g} mm are not in the heatmaps.", "warning")
+        if self.skipped_records:
+            self.console_instance.print_message(f"Warning: {self.skipped_records} records without a position are not in the heatmaps.", "warning")
+        if self.write_failed:
+            return None
+        if not self._written_coils:
+            self.console_instance.print_message("No defect positions were found for the heatmaps.", "warning")
+            return None
+        self.console_instance.print_message(f"Heatmaps of {len(self._written_coils)} coils were created successfully: {self.heatmap_folder}", "success")
+        return self.heatmap_folder
@@ -0,0 +1,168 @@
+import os
+import json
+
+from file_scanner import FileManifest
+
+# Keys of one job in a --jobs file; the others fall back to the command-line options
+JOB_KEYS = ["path", "startDate", "endDate", "outputFileName", "format"]
+REQUIRED_JOB_KEYS = ["path", "startDate", "endDate"]
+
+class JobResult:
+    """Status and timing of one job of a --jobs run."""
+    def __init__(self, number, job):
+        self.number = number
+        self.job = job
+        self.status = "pending"
+        self.message = ""
+        self.files = 0
+        self.records = 0
+        self.seconds = 0.0
+
+    @property
+    def name(self):
+        return self.job.get("outputFileName") or os.path.basename(os.path.normpath(self.job.get("path", ""))) or f"job {self.number}"
+
+def load_jobs(jobs_path, console_instance):
+    """
+    Reads a --jobs file: a JSON list of jobs (or an object with a "jobs" list), each an object with
+    "path", "startDate" and "endDate" and optionally "outputFileName" and "format".
+    Returns the list of job dicts, or None if the file cannot be used.
+    """
+    try:
+        with open(jobs_path, 'r', encoding='utf-8') as f:
+            jobs = json.load(f)
+    except Exception as e:
+        console_instance.print_message(f"Error: Failed to read the jobs file '{jobs_path}': {e}", "error")
+        return None
+
+    if isinstance(jobs, dict):
+        jobs = jobs.get("jobs")
+    if not isinstance(jobs, list) or not all(isinstance(job, dict) for job in jobs):
+        console_instance.print_message(f"Error: '{jobs_path}' must hold a list of job objects.", "error")
+        return None
+
+    for job_number, job in enumerate(jobs, start=1):
+        unknown_keys = [key for key in job if key not in JOB_KEYS]
+        if unknown_keys:
+            console_instance.print_message(f"Warning: Job {job_number} has unknown keys that are ignored: {', '.join(unknown_keys)}.", "warning")
+
+    # Outputs are named <outputFileName>_<timestamp>, so two jobs writing the same name to the same folder
+    # within one second would overwrite each other
+    output_names = {}
+    for job_number, job in enumerate(jobs, start=1):
+        output_key = (os.path.normcase(os.path.abspath(str(job.get("path", "")))), job.get("outputFileName") or "CompiledData")
+        if output_key in output_names:
+            job["outputFileName"] = f"{output_key[1]}_job{job_number}"
+            console_instance.print_message(f"Warning: Job {job_number} has the same output name as job {output_names[output_key]} and is written as '{job['outputFileName']}'.", "warning")
+        output_names.setdefault(output_key, job_number)
+    return jobs
+
+def missing_job_keys(job):
+    return [key for key in REQUIRED_JOB_KEYS if not job.get(key)]
+
+class SharedScan:
+    """
+    Lists each folder once for all the jobs of a run: jobs over the same folder and different date windows
+    select their files from the same FileManifest.
+    """
+    def __init__(self, console_instance, recursive=False, use_manifest=True, rescan=False):
+        self.console_instance = console_instance
+        self.recursive = recursive
+        self.use_manifest = use_manifest
+        self.rescan = rescan
+        self._manifests = {}
+
+    def find_csv_files(self, folder_path, start_date, end_date):
+        """Same result as file_scanner.find_csv_files; the folder is only listed by the first job that uses it."""
+        folder_key = os.path.normcase(os.path.abspath(folder_path))
+        manifest = self._manifests.get(folder_key)
+        if manifest is None:
+            manifest = FileManifest(folder_path, self.console_instance, self.use_manifest)
+            manifest.update(self.recursive, self.rescan)
+            manifest.save()
+            self._manifests[folder_key] = manifest
+        return manifest.files_between(start_date, end_date)
+
+class SharedBatchStore:
+    """
+    Keeps the processed records of the files that more than one job reads, so each file is parsed only once per run.
+    A file's records are held from the first job that reads it until the last one is finished.
+    """
+    def __init__(self):
+        self._jobs_left = {}
+        self._batches = {}
+
+    @staticmethod
+    def _file_key(file_path):
+        return os.path.normcase(os.path.abspath(file_path))
+
+    def add_job_files(self, csv_files):
+        """Counts the files of one job before the jobs are run."""
+        for file_path in csv_files:
+            file_key = self._file_key(file_path)
+            self._jobs_left[file_key] = self._jobs_left.get(file_key, 0) + 1
+
+    def finish_job_files(self, csv_files):
+        """Called after each job with its files; drops the records no later job needs."""
+        for file_path in csv_files:
+            file_key = self._file_key(file_path)
+            self._jobs_left[file_key] = self._jobs_left.get(file_key, 1) - 1
+            if self._jobs_left[file_key] <= 0:
+                self._jobs_left.pop(file_key, None)
+                for batch_key in [batch_key for batch_key in self._batches if batch_key[0] == file_key]:
+                    del self._batches[batch_key]
+
+    def contains(self, file_path, variant):
+        return (self._file_key(file_path), variant) in self._batches
+
+    def load(self, file_path, variant):
+        return self._batches.get((self._file_key(file_path), variant))
+
+    def store(self, file_path, processed_df, variant):
+        file_key = self._file_key(file_path)
+        # The job that parses the file counts as one; only keep it if another job reads it too
+        if self._jobs_left.get(file_key, 0) > 1:
+            self._batches[(file_key, variant)] = processed_df
+
+class SharedParseCache:
+    """
+    Parse cache of one job (the interface of parse_cache.ParseCache): files already parsed by an earlier job
+    come from the SharedBatchStore, the others from the folder's on-disk cache if there is one.
+    """
+    def __init__(self, batch_store, disk_cache=None):
+        self.batch_store = batch_store
+        self.disk_cache = disk_cache
+
+    def contains(self, file_path, variant=""):
+        return self.batch_store.contains(file_path, variant) or (self.disk_cache is not None and self.disk_cache.contains(file_path, variant))
+
+    def load(self, file_path, variant=""):
+        processed_df = self.batch_store.load(file_path, variant)
+        if processed_df is None and self.disk_cache is not None:
+            processed_df = self.disk_cache.load(file_path, variant)
+        return processed_df
+
+    def store(self, file_path, processed_df, variant=""):
+        self.batch_store.store(file_path, processed_df, variant)
+        if self.disk_cache is not None:
+            self.disk_cache.store(file_path, processed_df, variant)
+
+    def save(self):
+        if self.disk_cache is not None:
+            self.disk_cache.save()
+
+def print_job_summary(job_results, total_seconds, console_instance):
+    """Prints one line per job (status, files, records, seconds) and the totals."""
+    console_instance.print_message("\nJob summary:", "info")
+    name_width = max([len(job_result.name) for job_result in job_results] + [4])
+    for job_result in job_results:
+        message_type = {"ok": "success", "failed": "error"}.get(job_result.status, "warning")
+        message = f"  {job_result.number:>3}. {job_result.name:<{name_width}}  {job_result.status:<8} {job_result.files:>6} files {job_result.records:>10} records {job_result.seconds:>8.1f} s"
+        if job_result.message:
+            message += f"  {job_result.message}"
+        console_instance.print_message(message, message_type)
+    failed_jobs = sum(1 for job_result in job_results if job_result.status == "failed")
+    console_instance.print_message(
+        f"{len(job_results) - failed_jobs} of {len(job_results)} jobs finished, {sum(job_result.records for job_result in job_results)} records in {total_seconds:.1f} s.",
+        "success" if failed_jobs == 0 else "warning",
+    )
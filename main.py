@@ -1,21 +1,308 @@
 import os
+import sys
+import time
 import argparse
+import multiprocessing
 from datetime import datetime
 
-# Import functions and classes from other modules
+# Import functions and classes from other modules.
+# Only modules without third-party imports are loaded here, so --help and invalid arguments return at once;
+# pandas, the compile pipeline and each exporter backend are imported once they are needed.
 from console.dynamic_console import DynamicConsole
-from csv_parser import parse_csv_sections
-from data_processor import extract_coil_no_from_filename, process_record
-from excel_processor.excel_exporter import export_to_excel
-import pandas as pd # Required for pd.DataFrame
+from cli_options import (
+    PARSER_MODES, CSV_ENGINES, OUTPUT_FORMATS, PARQUET_COMPRESSIONS, DEFAULT_ROW_GROUP_SIZE, SQLITE_FORMAT, DEFAULT_DATABASE_FILE_NAME,
+    EXCEL_WRITERS, SHARD_MODES, MAX_SHARD_ROWS, OUTPUT_CSV_SUFFIX, DEFAULT_CACHE_SIZE_MB, DEFAULT_POLL_SECONDS, DEFAULT_SETTLE_SECONDS,
+    DEFAULT_LENGTH_BIN_M, DEFAULT_WIDTH_BIN_MM, MAX_HEATMAP_LENGTH_M, MAX_HEATMAP_WIDTH_MM, MAX_HEATMAP_BINS, FILTER_SIDES,
+)
+from profiler import RunProfiler, set_active_profiler, profile_stage
+
+def parse_date_argument(date_str, date_formats, end_of_day=False):
+    """
+    Parses a --startDate/--endDate value with the first matching format. Returns None if no format matches.
+    If end_of_day is set and only a date is given, the time is set to the end of that day.
+    """
+    for fmt in date_formats:
+        try:
+            parsed_date = datetime.strptime(date_str, fmt)
+        except ValueError:
+            continue
+        if end_of_day and ' ' not in date_str:
+            parsed_date = parsed_date.replace(hour=23, minute=59, second=59, microsecond=999999)
+        return parsed_date
+    return None
+
+def build_record_filter(args, console_instance):
+    """Returns the RecordFilter of the --classes/--grades/--side/--minHeight/--minWidth options, or None if none is given."""
+    from record_filter import RecordFilter
+    record_filter = RecordFilter(args.classes, args.grades, args.side, args.minHeight, args.minWidth)
+    if not record_filter.is_active:
+        return None
+    console_instance.print_message(f"Only records with {record_filter.describe()} are kept.", "info")
+    return record_filter
+
+def compile_csv_files(args, folder_path, csv_files, parse_cache, record_filter, console_instance):
+    """
+    Compiles the CSV files into the output chosen by the options in args (format, summary, heatmaps, ...),
+    written to folder_path. Used for the single run and for each job of a --jobs run.
+    Returns (CompileResult, output path without extension).
+    """
+    from compile_pipeline import compile_files, CollectedOutput
+    from data_processor import PROCESSED_RECORD_COLUMNS, DEFECT_NO_COLUMN
+    from summary_aggregator import DefectSummary, write_summary_file
+
+    # Excel output file name determination logic
+    if args.outputFileName:
+        output_file_name_base = args.outputFileName
+    else:
+        output_file_name_base = "CompiledData"
+    
+    current_timestamp_for_filename = datetime.now().strftime('%Y%m%d%H%M%S')
+    # Forcefully add .xlsx extension
+    output_full_filename = f"{output_file_name_base}_{current_timestamp_for_filename}.xlsx"
+    output_base_path = os.path.join(folder_path, f"{output_file_name_base}_{current_timestamp_for_filename}")
+
+    if args.streaming and args.shardBy:
+        console_instance.print_message("Warning: --streaming writes one workbook and cannot be used with --shardBy. The records are collected in memory and sharded.", "warning")
+    use_streaming = False
+    if args.streaming and not args.shardBy and args.format == "xlsx":
+        from excel_processor.excel_exporter import StreamingExcelExporter
+        use_streaming = StreamingExcelExporter.is_available()
+    if args.streaming and not args.shardBy and not use_streaming:
+        console_instance.print_message("Warning: Streaming export is only available for xlsx output with xlsxwriter. Collecting all records in memory instead.", "warning")
+
+    # The summary and the heatmaps are updated from each file's records while they are compiled
+    summary = DefectSummary() if args.summary else None
+    heatmaps = None
+    if args.heatmaps:
+        from heatmap_aggregator import DefectHeatmaps, HEATMAP_FOLDER_SUFFIX
+        heatmaps = DefectHeatmaps(output_base_path + HEATMAP_FOLDER_SUFFIX, console_instance, args.lengthBinM, args.widthBinMM)
+
+    # Only the backend of the chosen format is imported
+    batch_columns = PROCESSED_RECORD_COLUMNS
+    if args.append:
+        from watcher import RollingCsvOutput
+        # The Defect No. is written too, so later runs can recognise the records already appended
+        batch_columns = PROCESSED_RECORD_COLUMNS + [DEFECT_NO_COLUMN]
+        writer = RollingCsvOutput(args.append, batch_columns, console_instance, record_filter)
+        csv_files = writer.files_to_append(csv_files)
+    elif args.format == SQLITE_FORMAT:
+        from output_processor.sqlite_store import SqliteDefectStore
+        writer = SqliteDefectStore(args.database or os.path.join(folder_path, DEFAULT_DATABASE_FILE_NAME), console_instance, record_filter)
+        csv_files = writer.files_to_load(csv_files)
+    elif use_streaming:
+        # Each file's records go to the workbook right away, so the whole dataset is never held in memory
+        writer = StreamingExcelExporter(folder_path, output_full_filename, PROCESSED_RECORD_COLUMNS, console_instance, args.excelWriter, summary)
+    elif args.format == "xlsx":
+        from excel_processor.shard_exporter import ShardedExcelOutput
+        # One workbook, unless --shardBy is given or the records do not fit in one sheet
+        writer = ShardedExcelOutput(folder_path, output_full_filename, console_instance, args.excelWriter, args.shardBy, args.shardRows, args.workers, summary)
+    else:
+        from output_processor.columnar_exporter import export_columnar
+        writer = CollectedOutput(lambda final_df: export_columnar(final_df, folder_path, f"{output_file_name_base}_{current_timestamp_for_filename}", args.format, console_instance, args.compression, args.rowGroupSize), console_instance)
+
+    compile_result = compile_files(csv_files, writer, console_instance, args.workers, args.parser, args.csvEngine, parse_cache, summary=summary, columns=batch_columns, heatmaps=heatmaps, record_filter=record_filter)
+
+    if summary is not None and (args.append or args.format != "xlsx") and compile_result.records > 0:
+        write_summary_file(summary.result(), folder_path, f"{output_file_name_base}_{current_timestamp_for_filename}", console_instance)
+    if heatmaps is not None and compile_result.records > 0:
+        heatmaps.close()
+
+    return compile_result, output_base_path
+
+def start_run_profiler(args):
+    """Returns the active RunProfiler of a run with --profile (with cProfile running if --cProfile is set), or None."""
+    if args.profile is None:
+        return None
+    run_profiler = RunProfiler()
+    set_active_profiler(run_profiler)
+    if args.cProfile:
+        run_profiler.start_cprofile()
+    return run_profiler
+
+def finish_run_profiler(run_profiler, args, folder_path, output_base_path, record_count, console_instance):
+    """
+    Stops the profiler and writes its report (and cProfile dump) next to the output, or to the --profile path.
+    output_base_path is None if the run ended before its output was named (e.g. no files were found).
+    """
+    if output_base_path is None:
+        output_base_path = os.path.join(folder_path, f"{args.outputFileName or 'CompiledData'}_{datetime.now().strftime('%Y%m%d%H%M%S')}")
+    run_profiler.finish(output_base_path, record_count, console_instance, args.profile)
+
+def run_jobs(args, date_formats, console_output):
+    """
+    --jobs mode: runs the jobs of a JSON file one after another in this process. Each folder is listed once,
+    one worker pool is shared by all jobs, and a file that several jobs read is parsed only once.
+    The other options (parser, filters, summary, ...) apply to every job; with --profile each job writes its own
+    report next to its output. Ends with each job's status and time.
+    """
+    from file_processor import PARSER_VERSION, shared_worker_pool
+    from job_runner import JobResult, SharedScan, SharedBatchStore, SharedParseCache, load_jobs, missing_job_keys, print_job_summary
+    from parse_cache import ParseCache
+
+    jobs = load_jobs(args.jobs, console_output)
+    if jobs is None:
+        return
+    run_start = time.perf_counter()
+    record_filter = build_record_filter(args, console_output)
+    scan = SharedScan(console_output, args.recursive, not args.noManifest, args.rescan)
+    batch_store = SharedBatchStore()
+    job_results = [JobResult(job_number, job) for job_number, job in enumerate(jobs, start=1)]
+
+    # The files of every job are listed before the first compile, so the files read by several jobs are known
+    job_files = {}
+    for job_result in job_results:
+        job = job_result.job
+        missing_keys = missing_job_keys(job)
+        start_date = parse_date_argument(str(job.get("startDate")), date_formats)
+        end_date = parse_date_argument(str(job.get("endDate")), date_formats, end_of_day=True)
+        if missing_keys:
+            job_result.message = f"Missing {', '.join(missing_keys)}."
+        elif start_date is None or end_date is None:
+            job_result.message = "Invalid date format. Use YYYY-MM-DD or YYYY-MM-DD HH:mm."
+        elif (job.get("format") or args.format) not in OUTPUT_FORMATS + [SQLITE_FORMAT]:
+            job_result.message = f"Unknown format '{job.get('format')}'."
+        elif not os.path.isdir(job["path"]):
+            job_result.message = f"The folder '{job['path']}' was not found."
+        if job_result.message:
+            job_result.status = "failed"
+            console_output.print_message(f"Error: Job {job_result.number} is skipped: {job_result.message}", "error")
+            continue
+
+        if start_date > end_date:
+            start_date, end_date = end_date, start_date
+        scan_start = time.perf_counter()
+        job_files[job_result.number] = scan.find_csv_files(job["path"], start_date, end_date)
+        job_result.seconds += time.perf_counter() - scan_start
+        batch_store.add_job_files(job_files[job_result.number])
+
+    # One parse cache per folder, shared by the jobs over that folder
+    disk_caches = {}
+    with shared_worker_pool(args.workers):
+        for job_result in job_results:
+            if job_result.status == "failed":
+                continue
+            job = job_result.job
+            csv_files = job_files[job_result.number]
+            console_output.print_message(f"\nJob {job_result.number} ({job_result.name}): {len(csv_files)} CSV files in '{job['path']}' from '{job['startDate']}' to '{job['endDate']}'.", "info")
+            job_start = time.perf_counter()
+            try:
+                if not csv_files:
+                    job_result.status = "no files"
+                    continue
+                folder_key = os.path.normcase(os.path.abspath(job["path"]))
+                if folder_key not in disk_caches:
+                    if args.clearCache:
+                        ParseCache.clear_folder(job["path"], console_output)
+                    disk_caches[folder_key] = None if args.noCache else ParseCache.for_folder(job["path"], console_output, PARSER_VERSION, args.cacheSizeMB)
+                job_args = argparse.Namespace(**{**vars(args), "path": job["path"], "outputFileName": job.get("outputFileName") or args.outputFileName, "format": job.get("format") or args.format})
+
+                compile_result = None
+                output_base_path = None
+                run_profiler = start_run_profiler(job_args)
+                try:
+                    compile_result, output_base_path = compile_csv_files(job_args, job["path"], csv_files, SharedParseCache(batch_store, disk_caches[folder_key]), record_filter, console_output)
+                finally:
+                    if run_profiler is not None:
+                        finish_run_profiler(run_profiler, job_args, job["path"], output_base_path, compile_result.records if compile_result is not None else 0, console_output)
+                job_result.files = compile_result.files_processed
+                job_result.records = compile_result.records
+                job_result.status = "ok" if compile_result.records > 0 else "empty"
+            except Exception as e:
+                job_result.status = "failed"
+                job_result.message = str(e)
+                console_output.print_message(f"Error: Job {job_result.number} failed: {e}", "error")
+            finally:
+                batch_store.finish_job_files(csv_files)
+                job_result.seconds += time.perf_counter() - job_start
+
+    print_job_summary(job_results, time.perf_counter() - run_start, console_output)
+
+def query_main(argv):
+    """
+    'query' subcommand: looks up defect records in a database written with --format sqlite, without reading any CSV file.
+    """
+    parser = argparse.ArgumentParser(prog="main.py query", description="Query the defect records stored with --format sqlite.")
+    parser.add_argument("--database", required=True, help="Path of the SQLite database.")
+    parser.add_argument("--coilNo", required=False, help="Coil No, e.g. KE5538.")
+    parser.add_argument("--className", required=False, help="Class Name, e.g. Scratch.")
+    parser.add_argument("--grade", required=False, help="Grade Defect, e.g. A.")
+    parser.add_argument("--side", required=False, choices=["Top", "Bottom"], help="Top or Bottom.")
+    parser.add_argument("--startDate", required=False, help="First source file date (YYYY-MM-DD).")
+    parser.add_argument("--endDate", required=False, help="Last source file date (YYYY-MM-DD).")
+    parser.add_argument("--limit", required=False, type=int, help="Return at most this many records.")
+    parser.add_argument("--output", required=False, help="Write the records to this CSV file instead of printing them.")
+    args = parser.parse_args(argv)
+    console_output = DynamicConsole
+
+    for date_str in [args.startDate, args.endDate]:
+        if date_str and parse_date_argument(date_str, ["%Y-%m-%d"]) is None:
+            console_output.print_message("Error: Invalid date format. Use YYYY-MM-DD.", "error")
+            return
+    if not os.path.isfile(args.database):
+        console_output.print_message(f"Error: The database '{args.database}' was not found.", "error")
+        return
+
+    from output_processor.sqlite_store import query_defects
+
+    query_start = time.perf_counter()
+    try:
+        records_df = query_defects(args.database, args.coilNo, args.className, args.grade, args.side, args.startDate, args.endDate, args.limit)
+    except Exception as e:
+        console_output.print_message(f"Error: The query failed: {e}", "error")
+        return
+    console_output.print_message(f"{len(records_df)} records found in {(time.perf_counter() - query_start) * 1000:.0f} ms.", "info")
+
+    if args.output:
+        records_df.to_csv(args.output, index=False)
+        console_output.print_message(f"The records were written to: {args.output}", "success")
+    elif not records_df.empty:
+        print(records_df.to_string(index=False, max_rows=100))
 
 def main():
+    if len(sys.argv) > 1 and sys.argv[1] == "query":
+        query_main(sys.argv[2:])
+        return
+
     parser = argparse.ArgumentParser(description="Console application to convert export results from the SDD application from CSV files to XLSB.")
-    parser.add_argument("--path", required=True, help="Path to the folder containing the CSV file.")
-    parser.add_argument("--startDate", required=True, help="Start date (YYYY-MM-DD or HH:mm) for filtering CSV files.")
-    parser.add_argument("--endDate", required=True, help="The end date (YYYY-MM-DD or HH:mm) to filter the CSV file.")
+    parser.add_argument("--path", required=False, help="Path to the folder containing the CSV file. Required unless --jobs is used.")
+    parser.add_argument("--startDate", required=False, help="Start date (YYYY-MM-DD or HH:mm) for filtering CSV files. Required unless --watch is used.")
+    parser.add_argument("--endDate", required=False, help="The end date (YYYY-MM-DD or HH:mm) to filter the CSV file. Required unless --watch is used.")
     # Optional argument for the name of the Excel output file
     parser.add_argument("--outputFileName", required=False, help="Custom Excel output file name (without extension). Default: CompiledData_{timestamp}")
+    parser.add_argument("--recursive", action="store_true", help="Also search the subfolders of --path for CSV files.")
+    parser.add_argument("--noManifest", action="store_true", help="Do not read or write the file manifest; list the folder from scratch.")
+    parser.add_argument("--rescan", action="store_true", help="Read the gzip headers and zip member lists again even for files whose size and mtime are unchanged.")
+    parser.add_argument("--format", required=False, choices=OUTPUT_FORMATS + [SQLITE_FORMAT], default="xlsx", help="Output format. 'parquet' and 'feather' (Arrow IPC) keep column types and need pyarrow; 'csv' writes a plain .compiled.csv file; 'sqlite' loads the records into a local database (see 'main.py query --help'). Default: xlsx")
+    parser.add_argument("--database", required=False, help=f"SQLite database for --format sqlite. Files already loaded (with the same filter options) are skipped. Default: <path>/{DEFAULT_DATABASE_FILE_NAME}")
+    parser.add_argument("--compression", required=False, choices=PARQUET_COMPRESSIONS, default="snappy", help="Compression of parquet/feather output (feather uses lz4 unless zstd or none is chosen). Default: snappy")
+    parser.add_argument("--rowGroupSize", required=False, type=int, default=DEFAULT_ROW_GROUP_SIZE, help=f"Rows per Parquet row group. Default: {DEFAULT_ROW_GROUP_SIZE}")
+    parser.add_argument("--excelWriter", required=False, choices=EXCEL_WRITERS, default="native", help="'native' writes the .xlsx workbook directly without Excel (requires xlsxwriter), 'com' converts it to .xlsb with Microsoft Excel. Default: native")
+    parser.add_argument("--streaming", action="store_true", help="Write each file's records to the workbook as soon as the file is processed, instead of collecting all records in memory first.")
+    parser.add_argument("--shardBy", required=False, choices=SHARD_MODES, help="Split xlsx output into several workbooks, written in parallel (see --workers): 'rows' every --shardRows rows, 'coil' one per Coil No, 'day' one per source file date. A <name>_shards.json manifest lists the workbooks and their rows. Without it, the output is only split by rows when it does not fit in one Excel sheet.")
+    parser.add_argument("--shardRows", required=False, type=int, default=MAX_SHARD_ROWS, help=f"Most rows per workbook with --shardBy; larger coils or days are split further. Default and maximum: {MAX_SHARD_ROWS}")
+    parser.add_argument("--summary", action="store_true", help="Also write summary aggregates per Coil No, Class Name, Grade Defect and Top/Bottom (count, total/max area, min/max position): a 'Summary' sheet for xlsx output, a <name>_summary.compiled.csv file for the other formats.")
+    parser.add_argument("--heatmaps", action="store_true", help="Also write a defect-density map per coil: defect counts per side and class, binned along the coil and across its width, as <name>_heatmaps/<Coil No>.npz.")
+    parser.add_argument("--lengthBinM", required=False, type=float, default=DEFAULT_LENGTH_BIN_M, help=f"Heatmap bin size along the coil ('Top m'), in m. Default: {DEFAULT_LENGTH_BIN_M:g}")
+    parser.add_argument("--widthBinMM", required=False, type=float, default=DEFAULT_WIDTH_BIN_MM, help=f"Heatmap bin size across the coil ('Distance from Left Edge mm'), in mm. Default: {DEFAULT_WIDTH_BIN_MM:g}")
+    parser.add_argument("--classes", required=False, help="Only keep records of these Class Names (comma-separated, e.g. 'Scratch,Hole'). Lines without one of the names are not parsed.")
+    parser.add_argument("--grades", required=False, help="Only keep records of these Grade Defects (comma-separated, e.g. 'A,B').")
+    parser.add_argument("--side", required=False, choices=FILTER_SIDES, help="Only keep records of this side; the other section is not parsed.")
+    parser.add_argument("--minHeight", required=False, type=float, help="Only keep records with a Height of at least this many mm.")
+    parser.add_argument("--minWidth", required=False, type=float, help="Only keep records with a Width of at least this many mm.")
+    parser.add_argument("--parser", required=False, choices=PARSER_MODES, default="mmap", help="CSV section parser. 'mmap' reads sections from a memory-mapped file, 'lines' uses the line-by-line reader. Default: mmap")
+    parser.add_argument("--csvEngine", required=False, choices=CSV_ENGINES, default="c", help="CSV engine used to parse each section. 'pyarrow' is multi-threaded and requires pyarrow. Default: c")
+    parser.add_argument("--workers", required=False, type=int, default=1, help="Number of worker processes used to parse CSV files in parallel. 0 uses one per CPU core. Default: 1")
+    parser.add_argument("--append", required=False, metavar="OUTPUT_CSV", help="Append the records of new or changed source files to this CSV file instead of writing a new output. Files already appended (same path, size, mtime and filter options) are skipped, and records already in it (same Coil No, Defect No. and Top/Bottom) are not written again. --format is ignored.")
+    parser.add_argument("--jobs", required=False, metavar="JOBS_JSON", help="Run the jobs of this JSON file in one process: a list of objects with 'path', 'startDate', 'endDate' and optionally 'outputFileName' and 'format'. The other options apply to every job. Files read by several jobs are parsed once.")
+    parser.add_argument("--watch", action="store_true", help="Keep running and append each new CSV file to a rolling output as soon as it has stopped growing. Files modified since --startDate (default: now) are included; --endDate is ignored.")
+    parser.add_argument("--watchOutput", required=False, help=f"Path of the rolling CSV output in watch mode. Default: <path>/<outputFileName>_rolling{OUTPUT_CSV_SUFFIX}")
+    parser.add_argument("--pollSeconds", required=False, type=float, default=DEFAULT_POLL_SECONDS, help=f"Seconds between folder checks in watch mode. Default: {DEFAULT_POLL_SECONDS}")
+    parser.add_argument("--settleSeconds", required=False, type=float, default=DEFAULT_SETTLE_SECONDS, help=f"Seconds a file's size must stay unchanged before it is processed in watch mode. Default: {DEFAULT_SETTLE_SECONDS}")
+    parser.add_argument("--noCache", action="store_true", help="Parse every CSV file again instead of loading unchanged files from the parse cache.")
+    parser.add_argument("--clearCache", action="store_true", help="Delete the parse cache of the folder before processing.")
+    parser.add_argument("--profile", nargs="?", const="", default=None, metavar="REPORT_PATH", help="Write a JSON report with the time of each stage, the parse time of each file, rows/s and peak memory. Default path: <path>/<output file name>_profile.json")
+    parser.add_argument("--cProfile", action="store_true", help="With --profile, also write a cProfile dump (.prof) of the main process. Use --workers 1 to include the parsing.")
+    parser.add_argument("--cacheSizeMB", required=False, type=int, default=DEFAULT_CACHE_SIZE_MB, help=f"Size limit of the parse cache in MB. Least recently used entries are removed first. Default: {DEFAULT_CACHE_SIZE_MB}")
 
     args = parser.parse_args()
 
@@ -23,30 +310,53 @@ def main():
     start_date_str = args.startDate
     end_date_str = args.endDate
     custom_output_filename_base = args.outputFileName
+    parser_mode = args.parser
+    csv_engine = args.csvEngine
+
+    if not (args.lengthBinM > 0 and args.widthBinMM > 0):
+        parser.error("--lengthBinM and --widthBinMM must be greater than 0")
+    if (MAX_HEATMAP_LENGTH_M / args.lengthBinM) * (MAX_HEATMAP_WIDTH_MM / args.widthBinMM) > MAX_HEATMAP_BINS:
+        parser.error(f"--lengthBinM and --widthBinMM are too small: a heatmap of {MAX_HEATMAP_LENGTH_M:g} m by {MAX_HEATMAP_WIDTH_MM:g} mm may have at most {MAX_HEATMAP_BINS} bins")
 
     date_formats = ["%Y-%m-%d %H:%M:%S", "%Y-%m-%d %H:%M", "%Y-%m-%d"]
     console_output = DynamicConsole
 
-    # Parsing start_date
-    start_date = None
-    for fmt in date_formats:
-        try:
-            start_date = datetime.strptime(start_date_str, fmt)
-            break
-        except ValueError:
-            continue
-    
-    # Parsing end_date
-    end_date = None
-    for fmt in date_formats:
-        try:
-            end_date = datetime.strptime(end_date_str, fmt)
-            # If only a date is given for end_date, set it to the end of the day
-            if ' ' not in end_date_str:
-                end_date = end_date.replace(hour=23, minute=59, second=59, microsecond=999999)
-            break
-        except ValueError:
-            continue
+    if args.cProfile and args.profile is None:
+        console_output.print_message("Warning: --cProfile only works together with --profile and is ignored.", "warning")
+
+    if args.jobs:
+        if args.watch:
+            parser.error("--jobs cannot be used with --watch")
+        if args.profile:
+            parser.error("--profile takes no report path with --jobs: each job writes <output>_profile.json next to its output")
+        run_jobs(args, date_formats, console_output)
+        return
+    if folder_path is None:
+        parser.error("the following arguments are required: --path (unless --jobs is used)")
+
+    if args.watch:
+        if not os.path.isdir(folder_path):
+            console_output.print_message(f"Error: The folder '{folder_path}' was not found.", "error")
+            return
+        start_date = parse_date_argument(start_date_str, date_formats) if start_date_str else datetime.now()
+        if start_date is None:
+            console_output.print_message("Error: Invalid date format. UseYYYY-MM-DD or YYYY-MM-DD HH:mm.", "error")
+            return
+        from data_processor import PROCESSED_RECORD_COLUMNS, DEFECT_NO_COLUMN
+        from watcher import watch_folder, RollingCsvOutput
+
+        rolling_output_path = args.watchOutput or os.path.join(folder_path, f"{custom_output_filename_base or 'CompiledData'}_rolling{OUTPUT_CSV_SUFFIX}")
+        record_filter = build_record_filter(args, console_output)
+        rolling_output = RollingCsvOutput(rolling_output_path, PROCESSED_RECORD_COLUMNS + [DEFECT_NO_COLUMN], console_output, record_filter)
+        watch_folder(folder_path, rolling_output, console_output, start_date, args.recursive, args.pollSeconds, args.settleSeconds, parser_mode, csv_engine, record_filter)
+        return
+
+    if start_date_str is None or end_date_str is None:
+        parser.error("the following arguments are required: --startDate, --endDate (unless --watch is used)")
+
+    # Parsing start_date and end_date
+    start_date = parse_date_argument(start_date_str, date_formats)
+    end_date = parse_date_argument(end_date_str, date_formats, end_of_day=True)
 
     if start_date is None or end_date is None:
         console_output.print_message("Error: Invalid date format. UseYYYY-MM-DD or YYYY-MM-DD HH:mm.", "error")
@@ -64,65 +374,35 @@ def main():
         console_output.print_message("Warning: The start date is greater than the end date. Reverse the order.", "warning")
         start_date, end_date = end_date, start_date
 
-    csv_files = []
-    for f_name in os.listdir(folder_path):
-        if f_name.lower().endswith(".csv"):
-            f_path = os.path.join(folder_path, f_name)
-            try:
-                file_mtime = datetime.fromtimestamp(os.path.getmtime(f_path))
-                if start_date <= file_mtime <= end_date:
-                    csv_files.append(f_path)
-            except Exception as e:
-                console_output.print_message(f"Warning: Failed to get the modification time of file '{f_name}': {e}", "warning")
+    # The compile stack loads pandas, so it is only imported once the arguments are valid
+    from file_processor import PARSER_VERSION
+    from file_scanner import find_csv_files
+    from parse_cache import ParseCache
 
-    if not csv_files:
-        console_output.print_message(f"No CSV files were found in '{folder_path}' in that date range.", "warning")
-        return
+    run_profiler = start_run_profiler(args)
+    compile_result = None
+    output_base_path = None
+    try:
+        with profile_stage("scan"):
+            csv_files = find_csv_files(folder_path, start_date, end_date, console_output, args.recursive, not args.noManifest, args.rescan)
 
-    all_processed_records_for_excel = []
-
-    for file_path in csv_files:
-        console_output.print_message(f"Reading file: {os.path.basename(file_path)}", "info")
-        
-        coil_no = extract_coil_no_from_filename(os.path.basename(file_path), console_output)
-        top_df, bottom_df = parse_csv_sections(file_path, console_output)
-
-        for index, row_series in top_df.iterrows():
-            processed_rec = process_record(row_series, coil_no, "Top")
-            if processed_rec:
-                all_processed_records_for_excel.append(processed_rec)
-        
-        for index, row_series in bottom_df.iterrows():
-            processed_rec = process_record(row_series, coil_no, "Bottom")
-            if processed_rec:
-                all_processed_records_for_excel.append(processed_rec)
-
-    # Convert list of dictionaries to DataFrame for easier Excel exports
-    final_df = pd.DataFrame(all_processed_records_for_excel)
-
-    # Define the proper column order for Excel output
-    excel_output_columns = [
-        "Coil No", "Class Name", "Defect Name", "Grade Defect", "Top/Bottom",
-        "Distance from HE CGL (m)", "Distance Left (mm)", "Distance Right (mm)",
-        "Distance Center (mm)", "Height", "Width", "Segment Width Ratio", "Orientation"
-    ]
-    
-    # Rearrange columns and fill missing values with None (NaN in pandas)
-    final_df = final_df.reindex(columns=excel_output_columns, fill_value=None)
+        if not csv_files:
+            console_output.print_message(f"No CSV files were found in '{folder_path}' in that date range.", "warning")
+            return
 
-    # Excel output file name determination logic
-    if custom_output_filename_base:
-        output_file_name_base = custom_output_filename_base
-    else:
-        output_file_name_base = "CompiledData"
-    
-    current_timestamp_for_filename = datetime.now().strftime('%Y%m%d%H%M%S')
-    # Forcefully add .xlsx extension
-    output_full_filename = f"{output_file_name_base}_{current_timestamp_for_filename}.xlsx"
-    
-    export_to_excel(final_df, folder_path, output_full_filename, console_output)
+        if args.clearCache:
+            ParseCache.clear_folder(folder_path, console_output)
+        parse_cache = None if args.noCache else ParseCache.for_folder(folder_path, console_output, PARSER_VERSION, args.cacheSizeMB)
+
+        record_filter = build_record_filter(args, console_output)
+        compile_result, output_base_path = compile_csv_files(args, folder_path, csv_files, parse_cache, record_filter, console_output)
+    finally:
+        # Also when no files were found or the run failed, so the profiler is stopped and what was measured is kept
+        if run_profiler is not None:
+            finish_run_profiler(run_profiler, args, folder_path, output_base_path, compile_result.records if compile_result is not None else 0, console_output)
 
     console_output.print_message(f"\nFinish processing the CSV files.", "info")
 
 if __name__ == "__main__":
+    multiprocessing.freeze_support() # Required for worker processes in the PyInstaller build
     main()
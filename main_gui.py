@@ -1,16 +1,18 @@
 import os
+import threading
+import multiprocessing
 from datetime import datetime
 import tkinter as tk
-from tkinter import filedialog, messagebox, scrolledtext
+from tkinter import filedialog, messagebox, scrolledtext, ttk
 from tkcalendar import DateEntry
 
 # Import functions and classes from other modules
 # Assuming these modules are in the same directory or accessible via PYTHONPATH
 from console.dynamic_console_gui import DynamicConsoleGUI # Modified to work with GUI
-from csv_parser import parse_csv_sections
-from data_processor import extract_coil_no_from_filename, process_record
-from excel_processor.excel_exporter import export_to_excel
-import pandas as pd # Required for pd.DataFrame
+from cli_options import FILTER_SIDES
+from profiler import RunProfiler, set_active_profiler, profile_stage
+# The compile stack (pandas, the parser and the Excel writer) is imported in _compile(),
+# so the window opens without waiting for it
 
 class SDDConverterApp:
     def __init__(self, master):
@@ -57,12 +59,65 @@ class SDDConverterApp:
         self.output_filename_entry.grid(row=3, column=1, sticky="ew", pady=2)
         self.output_filename_entry.insert(0, "CompiledData") # Default value
 
+        # Worker processes
+        tk.Label(input_frame, text="Worker Processes:").grid(row=4, column=0, sticky="w", pady=2)
+        self.workers_spinbox = tk.Spinbox(input_frame, from_=1, to=os.cpu_count() or 1, width=5)
+        self.workers_spinbox.grid(row=4, column=1, sticky="w", pady=2)
+
+        # Parse cache
+        self.use_cache_var = tk.BooleanVar(value=True)
+        tk.Checkbutton(input_frame, text="Load unchanged files from the parse cache", variable=self.use_cache_var).grid(row=5, column=1, sticky="w", pady=2)
+
+        # Excel writer
+        self.convert_xlsb_var = tk.BooleanVar(value=False)
+        tk.Checkbutton(input_frame, text="Convert to XLSB with Microsoft Excel", variable=self.convert_xlsb_var).grid(row=6, column=1, sticky="w", pady=2)
+
+        # Summary aggregates
+        self.summary_var = tk.BooleanVar(value=False)
+        tk.Checkbutton(input_frame, text="Add a Summary sheet (count, area and position per coil, class, grade and side)", variable=self.summary_var).grid(row=7, column=1, sticky="w", pady=2)
+
+        # Profile report
+        self.profile_var = tk.BooleanVar(value=False)
+        tk.Checkbutton(input_frame, text="Write a profile report (stage times, per-file parse times, peak memory)", variable=self.profile_var).grid(row=8, column=1, sticky="w", pady=2)
+
+        # Record filters, applied while the files are parsed
+        tk.Label(input_frame, text="Classes (Optional, comma-separated):").grid(row=9, column=0, sticky="w", pady=2)
+        self.classes_entry = tk.Entry(input_frame, width=60)
+        self.classes_entry.grid(row=9, column=1, sticky="ew", pady=2)
+
+        tk.Label(input_frame, text="Grades (Optional, comma-separated):").grid(row=10, column=0, sticky="w", pady=2)
+        self.grades_entry = tk.Entry(input_frame, width=60)
+        self.grades_entry.grid(row=10, column=1, sticky="ew", pady=2)
+
+        tk.Label(input_frame, text="Side / Min Height / Min Width (mm):").grid(row=11, column=0, sticky="w", pady=2)
+        size_frame = tk.Frame(input_frame)
+        size_frame.grid(row=11, column=1, sticky="w", pady=2)
+        self.side_combobox = ttk.Combobox(size_frame, values=["Both"] + FILTER_SIDES, state="readonly", width=8)
+        self.side_combobox.set("Both")
+        self.side_combobox.pack(side="left")
+        self.min_height_entry = tk.Entry(size_frame, width=8)
+        self.min_height_entry.pack(side="left", padx=(5, 0))
+        self.min_width_entry = tk.Entry(size_frame, width=8)
+        self.min_width_entry.pack(side="left", padx=(5, 0))
+
         # Configure column weights for resizing
         input_frame.grid_columnconfigure(1, weight=1)
 
-        # --- Run Button ---
-        self.run_button = tk.Button(master, text="Run Conversion", command=self.run_conversion, height=2)
-        self.run_button.pack(pady=10, padx=10, fill="x")
+        # --- Run and Cancel Buttons ---
+        button_frame = tk.Frame(master)
+        button_frame.pack(pady=10, padx=10, fill="x")
+        self.run_button = tk.Button(button_frame, text="Run Conversion", command=self.run_conversion, height=2)
+        self.run_button.pack(side="left", fill="x", expand=True)
+        self.cancel_button = tk.Button(button_frame, text="Cancel", command=self.cancel_conversion, height=2, width=12, state='disabled')
+        self.cancel_button.pack(side="left", padx=(5, 0))
+
+        # --- Progress ---
+        progress_frame = tk.Frame(master)
+        progress_frame.pack(padx=10, fill="x")
+        self.progress_bar = ttk.Progressbar(progress_frame, mode='determinate')
+        self.progress_bar.pack(side="left", fill="x", expand=True)
+        self.progress_label = tk.Label(progress_frame, text="", width=36, anchor="w")
+        self.progress_label.pack(side="left", padx=(5, 0))
 
         # --- Console Output Area ---
         console_frame = tk.LabelFrame(master, text="Process Log", padx=10, pady=5)
@@ -72,6 +127,14 @@ class SDDConverterApp:
         self.log_text.pack(fill="both", expand=True)
         self.console_output.set_text_widget(self.log_text) # Link DynamicConsole to this widget
 
+        # The compile runs in a background thread; the Tk thread only polls its progress
+        self.worker_thread = None
+        self.cancel_event = threading.Event()
+        # (files done, total files, records) written by the worker thread, read by _poll_worker()
+        self.progress = (0, 0, 0)
+        self.close_requested = False
+        master.protocol("WM_DELETE_WINDOW", self.on_close)
+
     def browse_folder(self):
         folder_selected = filedialog.askdirectory()
         if folder_selected:
@@ -79,10 +142,17 @@ class SDDConverterApp:
             self.path_entry.insert(0, folder_selected)
 
     def run_conversion(self):
+        if self.worker_thread is not None and self.worker_thread.is_alive():
+            return
+
         folder_path = self.path_entry.get()
         start_date_str = self.start_date_entry.get_date().strftime('%Y-%m-%d')
         end_date_str = self.end_date_entry.get_date().strftime('%Y-%m-%d')
         custom_output_filename_base = self.output_filename_entry.get()
+        try:
+            workers = int(self.workers_spinbox.get())
+        except ValueError:
+            workers = 1
 
         # Clear previous log messages
         self.console_output.clear_log()
@@ -104,6 +174,13 @@ class SDDConverterApp:
             self.console_output.print_message(f"Error: The folder '{folder_path}' was not found.", "error")
             return
 
+        try:
+            min_height = float(self.min_height_entry.get()) if self.min_height_entry.get().strip() else None
+            min_width = float(self.min_width_entry.get()) if self.min_width_entry.get().strip() else None
+        except ValueError:
+            self.console_output.print_message("Error: Min Height and Min Width must be numbers (mm).", "error")
+            return
+
         if start_date > end_date:
             self.console_output.print_message("Warning: The start date is greater than the end date. Reversing order for processing.", "warning")
             start_date, end_date = end_date, start_date
@@ -111,64 +188,102 @@ class SDDConverterApp:
         self.console_output.print_message(
             f"Search for CSV files in '{folder_path}' from '{start_date.strftime('%Y-%m-%d')}' to '{end_date.strftime('%Y-%m-%d')}'.", "info"
         )
-        self.master.update_idletasks() # Update GUI to show messages
-
-        csv_files = []
-        for f_name in os.listdir(folder_path):
-            if f_name.lower().endswith(".csv"):
-                f_path = os.path.join(folder_path, f_name)
-                try:
-                    file_mtime = datetime.fromtimestamp(os.path.getmtime(f_path))
-                    if start_date <= file_mtime <= end_date:
-                        csv_files.append(f_path)
-                except Exception as e:
-                    self.console_output.print_message(f"Warning: Failed to get the modification time of file '{f_name}': {e}", "warning")
-
-        if not csv_files:
-            self.console_output.print_message(f"No CSV files were found in '{folder_path}' in that date range.", "warning")
-            self.console_output.print_message(f"Please check the folder path and date range.", "info")
-            return
-
-        all_processed_records_for_excel = []
-
-        for file_path in csv_files:
-            self.console_output.print_message(f"Reading file: {os.path.basename(file_path)}", "info")
-            self.master.update_idletasks() # Update GUI
-
-            coil_no = extract_coil_no_from_filename(os.path.basename(file_path), self.console_output)
-            try:
-                top_df, bottom_df = parse_csv_sections(file_path, self.console_output)
 
-                for index, row_series in top_df.iterrows():
-                    processed_rec = process_record(row_series, coil_no, "Top")
-                    if processed_rec:
-                        all_processed_records_for_excel.append(processed_rec)
-
-                for index, row_series in bottom_df.iterrows():
-                    processed_rec = process_record(row_series, coil_no, "Bottom")
-                    if processed_rec:
-                        all_processed_records_for_excel.append(processed_rec)
-            except Exception as e:
-                self.console_output.print_message(f"Error processing file '{os.path.basename(file_path)}': {e}", "error")
-                continue
+        # Tk variables may only be read on the Tk thread, so the options are collected here
+        options = {
+            "use_cache": self.use_cache_var.get(),
+            "excel_writer": "com" if self.convert_xlsb_var.get() else "native",
+            "profile": self.profile_var.get(),
+            "summary": self.summary_var.get(),
+            "classes": self.classes_entry.get(),
+            "grades": self.grades_entry.get(),
+            "side": None if self.side_combobox.get() == "Both" else self.side_combobox.get(),
+            "min_height": min_height,
+            "min_width": min_width,
+        }
+
+        self.cancel_event.clear()
+        self.progress = (0, 0, 0)
+        self.run_button.config(state='disabled')
+        self.cancel_button.config(state='normal')
+        self.worker_thread = threading.Thread(
+            target=self._run_in_background,
+            args=(folder_path, start_date, end_date, custom_output_filename_base, workers, options),
+            daemon=True,
+        )
+        self.worker_thread.start()
+        self.master.after(100, self._poll_worker)
+
+    def cancel_conversion(self):
+        """Asks the running compile to stop after the file it is processing."""
+        if self.worker_thread is not None and self.worker_thread.is_alive() and not self.cancel_event.is_set():
+            self.cancel_event.set()
+            self.cancel_button.config(state='disabled')
+            self.console_output.print_message("Cancelling after the current file...", "warning")
+
+    def on_close(self):
+        """Closes the window, after stopping a running compile."""
+        if self.worker_thread is not None and self.worker_thread.is_alive():
+            self.close_requested = True
+            self.cancel_conversion()
+            return
+        self.master.destroy()
 
+    def _poll_worker(self):
+        """Shows the progress of the background compile and restores the buttons when it has finished."""
+        files_done, total_files, records = self.progress
+        self.progress_bar.config(maximum=max(total_files, 1), value=files_done)
+        if total_files:
+            self.progress_label.config(text=f"Files: {files_done} / {total_files}   Records: {records}")
 
-        if not all_processed_records_for_excel:
-            self.console_output.print_message("No data was processed from the selected CSV files. Nothing to export.", "warning")
+        if self.worker_thread.is_alive():
+            self.master.after(100, self._poll_worker)
             return
 
-        # Convert list of dictionaries to DataFrame for easier Excel exports
-        final_df = pd.DataFrame(all_processed_records_for_excel)
-
-        # Define the proper column order for Excel output
-        excel_output_columns = [
-            "Coil No", "Class Name", "Defect Name", "Grade Defect", "Top/Bottom",
-            "Distance from HE CGL (m)", "Distance Left (mm)", "Distance Right (mm)",
-            "Distance Center (mm)", "Height", "Width", "Segment Width Ratio", "Orientation"
-        ]
-        
-        # Rearrange columns and fill missing values with None (NaN in pandas)
-        final_df = final_df.reindex(columns=excel_output_columns, fill_value=None)
+        self.run_button.config(state='normal')
+        self.cancel_button.config(state='disabled')
+        if self.close_requested:
+            # Let the console show the last messages before the window goes away
+            self.master.after(200, self.master.destroy)
+
+    def _set_progress(self, files_processed, total_files, records):
+        """Progress callback of the compile, called in the worker thread."""
+        self.progress = (files_processed, total_files, records)
+
+    def _run_in_background(self, folder_path, start_date, end_date, custom_output_filename_base, workers, options):
+        """Worker thread entry point: runs the compile and logs any unexpected error instead of losing it."""
+        run_profiler = RunProfiler() if options["profile"] else None
+        set_active_profiler(run_profiler)
+        # Excel (COM) automation needs COM initialised in the thread that uses it, and this is not the main thread
+        pythoncom = None
+        if options["excel_writer"] == "com":
+            try:
+                import pythoncom
+                pythoncom.CoInitialize()
+            except ImportError:
+                # Not on Windows: convert_to_xlsb reports that the conversion is not available
+                pythoncom = None
+        try:
+            self._compile(folder_path, start_date, end_date, custom_output_filename_base, workers, options, run_profiler)
+        except Exception as e:
+            self.console_output.print_message(f"Error: The conversion failed: {e}", "error")
+        finally:
+            set_active_profiler(None)
+            if pythoncom is not None:
+                pythoncom.CoUninitialize()
+
+    def _compile(self, folder_path, start_date, end_date, custom_output_filename_base, workers, options, run_profiler):
+        """
+        Finds, processes and exports the CSV files. Writes the profile report if run_profiler is given.
+        Runs in the worker thread: it only logs through the console and never touches Tk widgets.
+        """
+        from compile_pipeline import compile_files
+        from file_processor import PARSER_VERSION
+        from file_scanner import find_csv_files
+        from parse_cache import ParseCache
+        from record_filter import RecordFilter
+        from summary_aggregator import DefectSummary
+        from excel_processor.shard_exporter import ShardedExcelOutput
 
         # Excel output file name determination logic
         if custom_output_filename_base:
@@ -179,8 +294,39 @@ class SDDConverterApp:
         current_timestamp_for_filename = datetime.now().strftime('%Y%m%d%H%M%S')
         # Forcefully add .xlsx extension
         output_full_filename = f"{output_file_name_base}_{current_timestamp_for_filename}.xlsx"
-        
-        export_to_excel(final_df, folder_path, output_full_filename, self.console_output)
+
+        compile_result = None
+        try:
+            with profile_stage("scan"):
+                csv_files = find_csv_files(folder_path, start_date, end_date, self.console_output)
+
+            if not csv_files:
+                self.console_output.print_message(f"No CSV files were found in '{folder_path}' in that date range.", "warning")
+                self.console_output.print_message(f"Please check the folder path and date range.", "info")
+                return
+
+            parse_cache = ParseCache.for_folder(folder_path, self.console_output, PARSER_VERSION) if options["use_cache"] else None
+
+            record_filter = RecordFilter(options["classes"], options["grades"], options["side"], options["min_height"], options["min_width"])
+            if record_filter.is_active:
+                self.console_output.print_message(f"Only records with {record_filter.describe()} are kept.", "info")
+            else:
+                record_filter = None
+
+            summary = DefectSummary() if options["summary"] else None
+            # One workbook, split by rows only if the records do not fit in one Excel sheet
+            writer = ShardedExcelOutput(folder_path, output_full_filename, self.console_output, options["excel_writer"], workers=workers, summary=summary)
+            self.progress = (0, len(csv_files), 0)
+            compile_result = compile_files(csv_files, writer, self.console_output, workers, parse_cache=parse_cache,
+                                           cancel_event=self.cancel_event, progress_callback=self._set_progress, summary=summary,
+                                           record_filter=record_filter)
+            if compile_result.cancelled:
+                return
+        finally:
+            # Same as the CLI: also when no files were found or the run stopped early
+            if run_profiler is not None:
+                run_profiler.finish(os.path.join(folder_path, f"{output_file_name_base}_{current_timestamp_for_filename}"),
+                                    compile_result.records if compile_result is not None else 0, self.console_output)
 
         self.console_output.print_message(f"Finish processing the CSV files.", "info")
 
@@ -191,4 +337,5 @@ def main():
     root.mainloop()
 
 if __name__ == "__main__":
+    multiprocessing.freeze_support() # Required for worker processes in the PyInstaller build
     main()
\ No newline at end of file
@@ -0,0 +1,97 @@
+import os
+import importlib.util
+import pandas as pd
+
+from data_processor import PROCESSED_RECORD_COLUMNS
+from cli_options import OUTPUT_FORMATS, PARQUET_COMPRESSIONS, DEFAULT_ROW_GROUP_SIZE, OUTPUT_CSV_SUFFIX
+
+# Fixed schema of the compiled output
+CATEGORICAL_COLUMNS = ["Coil No", "Class Name", "Defect Name", "Grade Defect", "Top/Bottom"]
+FLOAT32_COLUMNS = [
+    "Distance from HE CGL (m)", "Distance Left (mm)", "Distance Right (mm)",
+    "Distance Center (mm)", "Height", "Width",
+]
+FLOAT64_COLUMNS = ["Segment Width Ratio", "Orientation"]
+
+OUTPUT_FILE_EXTENSIONS = {
+    "parquet": ".parquet",
+    "feather": ".feather",
+    "csv": OUTPUT_CSV_SUFFIX,
+}
+
+def output_dtypes():
+    """Returns the pandas dtype of every output column."""
+    dtypes = {column_name: "category" for column_name in CATEGORICAL_COLUMNS}
+    dtypes.update({column_name: "float32" for column_name in FLOAT32_COLUMNS})
+    dtypes.update({column_name: "float64" for column_name in FLOAT64_COLUMNS})
+    return dtypes
+
+def apply_output_schema(df: pd.DataFrame, console_instance=None) -> pd.DataFrame:
+    """
+    Returns the DataFrame with the output columns in order and converted to the fixed schema:
+    categorical text columns, float32 distances and sizes, float64 for the other numbers.
+    """
+    df = df.reindex(columns=PROCESSED_RECORD_COLUMNS)
+    typed_columns = {}
+    for column_name, dtype in output_dtypes().items():
+        column = df[column_name]
+        if dtype == "category":
+            typed_columns[column_name] = column.astype("string").astype("category")
+            continue
+        numeric_column = pd.to_numeric(column, errors="coerce")
+        lost_values = int(numeric_column.isna().sum() - column.isna().sum())
+        if lost_values > 0 and console_instance is not None:
+            console_instance.print_message(f"Warning: {lost_values} non-numeric values in '{column_name}' are written as empty.", "warning")
+        typed_columns[column_name] = numeric_column.astype(dtype)
+    return pd.DataFrame(typed_columns, columns=PROCESSED_RECORD_COLUMNS)
+
+def is_format_available(output_format):
+    """Parquet and Feather need pyarrow."""
+    if output_format in ("parquet", "feather"):
+        return importlib.util.find_spec("pyarrow") is not None
+    return True
+
+def export_columnar(df: pd.DataFrame, folder_path: str, output_file_name_base: str, output_format: str, console_instance,
+                    compression: str = "snappy", row_group_size: int = DEFAULT_ROW_GROUP_SIZE):
+    """
+    Export DataFrame to a Parquet, Feather (Arrow IPC) or CSV file with the fixed output schema.
+    Returns the path of the written file, or None if nothing was written.
+    """
+    if df.empty:
+        console_instance.print_message("No data is processed for export.", "warning")
+        return None
+    if not is_format_available(output_format):
+        console_instance.print_message(f"Error: The {output_format} format requires pyarrow. Install it with 'pip install pyarrow'.", "error")
+        return None
+
+    output_path = os.path.join(folder_path, output_file_name_base + OUTPUT_FILE_EXTENSIONS[output_format])
+    typed_df = apply_output_schema(df, console_instance)
+    compression = None if compression == "none" else compression
+
+    try:
+        if output_format == "parquet":
+            typed_df.to_parquet(output_path, engine="pyarrow", index=False, compression=compression, row_group_size=row_group_size)
+        elif output_format == "feather":
+            # Feather (Arrow IPC) only supports lz4 and zstd
+            feather_compression = "uncompressed" if compression is None else ("zstd" if compression == "zstd" else "lz4")
+            typed_df.to_feather(output_path, compression=feather_compression)
+        else:
+            typed_df.to_csv(output_path, index=False)
+    except Exception as e:
+        console_instance.print_message(f"Error saving {output_format} file: {e}", "error")
+        return None
+
+    console_instance.print_message(f"The {output_format.upper()} file was created successfully: {output_path}", "success")
+    return output_path
+
+def read_compiled_output(file_path: str) -> pd.DataFrame:
+    """
+    Loads a compiled Parquet, Feather or CSV file with the output schema.
+    """
+    if file_path.lower().endswith(".parquet"):
+        return pd.read_parquet(file_path)
+    if file_path.lower().endswith(".feather"):
+        return pd.read_feather(file_path)
+    # Empty text cells are empty strings in the output, only empty numbers are missing values
+    numeric_na_values = {column_name: [""] for column_name in FLOAT32_COLUMNS + FLOAT64_COLUMNS}
+    return pd.read_csv(file_path, dtype=output_dtypes(), keep_default_na=False, na_values=numeric_na_values)
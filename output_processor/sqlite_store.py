@@ -0,0 +1,196 @@
+import os
+import sqlite3
+import pathlib
+from contextlib import closing
+from datetime import datetime
+
+import pandas as pd
+
+from archive_reader import source_stat, source_file_name
+from data_processor import PROCESSED_RECORD_COLUMNS, widen_float32_columns
+from file_scanner import source_file_date
+from record_filter import source_variant
+
+SCHEMA_VERSION = 2
+# Rows per executemany() call; a file is still loaded in one transaction
+INSERT_BATCH_ROWS = 50000
+
+# Output column -> database column
+DEFECT_COLUMN_MAP = {
+    "Coil No": "coil_no",
+    "Class Name": "class_name",
+    "Defect Name": "defect_name",
+    "Grade Defect": "grade_defect",
+    "Top/Bottom": "side",
+    "Distance from HE CGL (m)": "distance_m",
+    "Distance Left (mm)": "distance_left_mm",
+    "Distance Right (mm)": "distance_right_mm",
+    "Distance Center (mm)": "distance_center_mm",
+    "Height": "height_mm",
+    "Width": "width_mm",
+    "Segment Width Ratio": "segment_width_ratio",
+    "Orientation": "orientation",
+}
+
+SCHEMA_STATEMENTS = [
+    """CREATE TABLE IF NOT EXISTS source_files (
+        id INTEGER PRIMARY KEY,
+        path TEXT NOT NULL UNIQUE,
+        size INTEGER NOT NULL,
+        mtime_ns INTEGER NOT NULL,
+        file_date TEXT,
+        records INTEGER NOT NULL,
+        loaded_at TEXT NOT NULL,
+        variant TEXT NOT NULL DEFAULT ''
+    )""",
+    """CREATE TABLE IF NOT EXISTS defects (
+        source_file_id INTEGER NOT NULL REFERENCES source_files(id),
+        file_date TEXT,
+        coil_no TEXT,
+        class_name TEXT,
+        defect_name TEXT,
+        grade_defect TEXT,
+        side TEXT,
+        distance_m REAL,
+        distance_left_mm REAL,
+        distance_right_mm REAL,
+        distance_center_mm REAL,
+        height_mm REAL,
+        width_mm REAL,
+        segment_width_ratio REAL,
+        orientation REAL
+    )""",
+    "CREATE INDEX IF NOT EXISTS idx_defects_coil_no ON defects (coil_no)",
+    "CREATE INDEX IF NOT EXISTS idx_defects_class_name ON defects (class_name)",
+    "CREATE INDEX IF NOT EXISTS idx_defects_grade_defect ON defects (grade_defect)",
+    "CREATE INDEX IF NOT EXISTS idx_defects_side ON defects (side)",
+    "CREATE INDEX IF NOT EXISTS idx_defects_file_date ON defects (file_date)",
+    "CREATE INDEX IF NOT EXISTS idx_defects_source_file_id ON defects (source_file_id)",
+]
+
+class SqliteDefectStore:
+    """
+    Local SQLite database of processed defect records, indexed on coil no, class name, grade, side and file date.
+    Each source file is loaded in one transaction together with its size, mtime and the RecordFilter it was read with,
+    so files that are already loaded and unchanged are skipped, and changed files (or files read with another filter)
+    are replaced.
+    Has the writer interface of compile_pipeline (write(df, file_path) and close()).
+    """
+    # Files that could not be read completely are not recorded, so the next run reads them again
+    skip_failed_files = True
+
+    def __init__(self, database_path, console_instance, record_filter=None):
+        self.database_path = database_path
+        self.console_instance = console_instance
+        self.source_variant = source_variant(record_filter)
+        self.rows_written = 0
+        self.files_loaded = 0
+        self._connection = sqlite3.connect(database_path)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute("PRAGMA synchronous=NORMAL")
+        with self._connection:
+            for statement in SCHEMA_STATEMENTS:
+                self._connection.execute(statement)
+            # Databases of schema version 1 have no filter column; their files were loaded unfiltered
+            source_file_columns = [row[1] for row in self._connection.execute("PRAGMA table_info(source_files)")]
+            if "variant" not in source_file_columns:
+                self._connection.execute("ALTER TABLE source_files ADD COLUMN variant TEXT NOT NULL DEFAULT ''")
+            self._connection.execute(f"PRAGMA user_version={SCHEMA_VERSION}")
+
+    @staticmethod
+    def _source_key(file_path):
+        return os.path.normcase(os.path.abspath(file_path))
+
+    def is_loaded(self, file_path):
+        """Returns True if this version (size and mtime) of the source file is already in the database, read with the same filter."""
+        try:
+            file_stat = source_stat(file_path)
+        except OSError:
+            return False
+        row = self._connection.execute("SELECT size, mtime_ns, variant FROM source_files WHERE path = ?", (self._source_key(file_path),)).fetchone()
+        return row is not None and row[0] == file_stat.st_size and row[1] == file_stat.st_mtime_ns and row[2] == self.source_variant
+
+    def files_to_load(self, csv_files):
+        """Returns the files of csv_files that are new or changed (or read with another filter) since they were loaded."""
+        new_files = [file_path for file_path in csv_files if not self.is_loaded(file_path)]
+        if len(new_files) < len(csv_files):
+            self.console_instance.print_message(f"{len(csv_files) - len(new_files)} of {len(csv_files)} files are already in the database and are skipped.", "info")
+        return new_files
+
+    def write(self, df: pd.DataFrame, file_path=None):
+        """Loads the records of one source file in one transaction, replacing an older version of the file."""
+        if file_path is None:
+            raise ValueError("The SQLite store needs the source file path of each batch.")
+        try:
+            file_stat = source_stat(file_path)
+        except OSError as e:
+            self.console_instance.print_message(f"Error: '{source_file_name(file_path)}' is not loaded, it can no longer be read: {e}", "error")
+            return
+        file_date = source_file_date(file_path, file_stat)
+        source_key = self._source_key(file_path)
+
+        df = widen_float32_columns(df.reindex(columns=PROCESSED_RECORD_COLUMNS))
+        df = df.astype(object).where(df.notna(), None)
+        row_values = [(file_date,) + row for row in df.itertuples(index=False, name=None)]
+
+        try:
+            # The file is recorded as loaded in the same transaction as its rows, so a failed load is retried next time
+            with self._connection:
+                old_file = self._connection.execute("SELECT id FROM source_files WHERE path = ?", (source_key,)).fetchone()
+                if old_file is not None:
+                    self._connection.execute("DELETE FROM defects WHERE source_file_id = ?", (old_file[0],))
+                    self._connection.execute("DELETE FROM source_files WHERE id = ?", (old_file[0],))
+                source_file_id = self._connection.execute(
+                    "INSERT INTO source_files (path, size, mtime_ns, file_date, records, loaded_at, variant) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (source_key, file_stat.st_size, file_stat.st_mtime_ns, file_date, len(row_values), datetime.now().isoformat(timespec='seconds'), self.source_variant),
+                ).lastrowid
+
+                insert_statement = (
+                    f"INSERT INTO defects (source_file_id, file_date, {', '.join(DEFECT_COLUMN_MAP.values())}) "
+                    f"VALUES ({source_file_id}, {', '.join(['?'] * (len(DEFECT_COLUMN_MAP) + 1))})"
+                )
+                for batch_start in range(0, len(row_values), INSERT_BATCH_ROWS):
+                    self._connection.executemany(insert_statement, row_values[batch_start:batch_start + INSERT_BATCH_ROWS])
+        except sqlite3.Error as e:
+            self.console_instance.print_message(f"Error: Failed to load '{source_file_name(file_path)}' into the database: {e}", "error")
+            return
+
+        self.rows_written += len(row_values)
+        self.files_loaded += 1
+
+    def close(self):
+        """Closes the database. Returns the number of records loaded."""
+        self._connection.execute("PRAGMA optimize")
+        self._connection.close()
+        self.console_instance.print_message(f"{self.rows_written} records from {self.files_loaded} files were loaded into the database: {self.database_path}", "success")
+        return self.rows_written
+
+def query_defects(database_path, coil_no=None, class_name=None, grade=None, side=None, start_date=None, end_date=None, limit=None):
+    """
+    Returns the stored defect records that match every given filter, with the output column names and 'File Date'.
+    start_date and end_date ('YYYY-MM-DD') filter on the date of the source file, both inclusive.
+    """
+    conditions = []
+    parameters = []
+    for column_name, value in [("coil_no", coil_no), ("class_name", class_name), ("grade_defect", grade), ("side", side)]:
+        if value:
+            conditions.append(f"{column_name} = ?")
+            parameters.append(value)
+    if start_date:
+        conditions.append("file_date >= ?")
+        parameters.append(start_date)
+    if end_date:
+        conditions.append("file_date <= ?")
+        parameters.append(end_date)
+
+    select_columns = ", ".join(["file_date AS \"File Date\""] + [f"{database_column} AS \"{output_column}\"" for output_column, database_column in DEFECT_COLUMN_MAP.items()])
+    query = f"SELECT {select_columns} FROM defects"
+    if conditions:
+        query += " WHERE " + " AND ".join(conditions)
+    query += " ORDER BY file_date, coil_no, rowid"
+    if limit:
+        query += f" LIMIT {int(limit)}"
+
+    # Opened read-only, so a query never creates an empty database by mistake
+    with closing(sqlite3.connect(pathlib.Path(database_path).resolve().as_uri() + "?mode=ro", uri=True)) as connection:
+        return pd.read_sql_query(query, connection, params=parameters)
@@ -0,0 +1,162 @@
+import os
+import json
+import time
+import shutil
+import hashlib
+import importlib.util
+import pandas as pd
+
+from archive_reader import source_stat
+from cli_options import DEFAULT_CACHE_SIZE_MB
+
+CACHE_DIR_NAME = ".sdd_cache"
+CACHE_INDEX_FILE_NAME = "index.json"
+
+class ParseCache:
+    """
+    On-disk cache of the processed records of each CSV file, stored as Feather files.
+    Entries are keyed by file path, size, modification time and parser version, and the least
+    recently used entries are removed once the cache grows past its size limit.
+    """
+    def __init__(self, cache_dir, console_instance, parser_version, max_size_mb=DEFAULT_CACHE_SIZE_MB):
+        self.cache_dir = cache_dir
+        self.console_instance = console_instance
+        self.parser_version = parser_version
+        self.max_size_bytes = max_size_mb * 1024 * 1024
+        self.hits = 0
+        self.misses = 0
+        self._index = {}
+
+        index_path = os.path.join(self.cache_dir, CACHE_INDEX_FILE_NAME)
+        if os.path.exists(index_path):
+            try:
+                with open(index_path, 'r', encoding='utf-8') as f:
+                    self._index = json.load(f)
+            except Exception as e:
+                self.console_instance.print_message(f"Warning: The parse cache index is unreadable and will be rebuilt: {e}", "warning")
+                self._index = {}
+
+    @staticmethod
+    def is_available():
+        """Feather files need pyarrow, so the cache is only available if it is installed."""
+        return importlib.util.find_spec("pyarrow") is not None
+
+    @classmethod
+    def for_folder(cls, folder_path, console_instance, parser_version, max_size_mb=DEFAULT_CACHE_SIZE_MB):
+        """
+        Returns the cache stored in the hidden cache directory of the input folder,
+        or None if it cannot be used.
+        """
+        if not cls.is_available():
+            console_instance.print_message("Parse cache is disabled: pyarrow is not installed.", "info")
+            return None
+        cache_dir = os.path.join(folder_path, CACHE_DIR_NAME)
+        try:
+            os.makedirs(cache_dir, exist_ok=True)
+        except Exception as e:
+            console_instance.print_message(f"Warning: Failed to create the parse cache folder '{cache_dir}': {e}", "warning")
+            return None
+        return cls(cache_dir, console_instance, parser_version, max_size_mb)
+
+    @staticmethod
+    def clear_folder(folder_path, console_instance):
+        """Deletes the cache directory of the input folder."""
+        cache_dir = os.path.join(folder_path, CACHE_DIR_NAME)
+        if not os.path.isdir(cache_dir):
+            return
+        try:
+            shutil.rmtree(cache_dir)
+            console_instance.print_message(f"The parse cache was cleared: {cache_dir}", "info")
+        except Exception as e:
+            console_instance.print_message(f"Error: Failed to clear the parse cache '{cache_dir}': {e}", "error")
+
+    def _entry_key(self, file_path, variant):
+        """Builds the cache key from the file identity and returns (key, file signature)."""
+        file_stat = source_stat(file_path)
+        signature = {
+            "path": os.path.normcase(os.path.abspath(file_path)),
+            "size": file_stat.st_size,
+            "mtime_ns": file_stat.st_mtime_ns,
+            "version": self.parser_version,
+            "variant": variant,
+        }
+        key = hashlib.sha1(json.dumps(signature, sort_keys=True).encode('utf-8')).hexdigest()
+        return key, signature
+
+    def _entry_path(self, key):
+        return os.path.join(self.cache_dir, f"{key}.feather")
+
+    def contains(self, file_path, variant=""):
+        """Returns True if there is a valid entry for the current state of the file."""
+        try:
+            key, _ = self._entry_key(file_path, variant)
+        except OSError:
+            return False
+        return key in self._index and os.path.exists(self._entry_path(key))
+
+    def load(self, file_path, variant=""):
+        """
+        Returns the cached processed records of the file, or None if the file is new or has changed.
+        """
+        try:
+            key, _ = self._entry_key(file_path, variant)
+            if key not in self._index:
+                self.misses += 1
+                return None
+            processed_df = pd.read_feather(self._entry_path(key))
+        except Exception:
+            self.misses += 1
+            return None
+
+        self._index[key]["last_used"] = time.time()
+        self.hits += 1
+        return processed_df
+
+    def store(self, file_path, processed_df, variant=""):
+        """Writes the processed records of the file to the cache."""
+        try:
+            key, signature = self._entry_key(file_path, variant)
+            entry_path = self._entry_path(key)
+            processed_df.reset_index(drop=True).to_feather(entry_path)
+            signature["bytes"] = os.path.getsize(entry_path)
+            signature["last_used"] = time.time()
+            self._index[key] = signature
+        except Exception as e:
+            self.console_instance.print_message(f"    Warning: Failed to cache '{os.path.basename(file_path)}': {e}", "warning")
+
+    def _evict(self):
+        """Removes stale and least recently used entries until the cache fits its size limit."""
+        # Entries of files that have been changed since they were cached can never be hit again
+        current_keys = {}
+        for key, entry in self._index.items():
+            current_keys.setdefault((entry["path"], entry.get("variant", "")), []).append(key)
+        for keys in current_keys.values():
+            keys.sort(key=lambda k: self._index[k]["last_used"])
+            for stale_key in keys[:-1]:
+                self._remove_entry(stale_key)
+
+        total_bytes = sum(entry["bytes"] for entry in self._index.values())
+        for key in sorted(self._index, key=lambda k: self._index[k]["last_used"]):
+            if total_bytes <= self.max_size_bytes:
+                break
+            total_bytes -= self._index[key]["bytes"]
+            self._remove_entry(key)
+
+    def _remove_entry(self, key):
+        self._index.pop(key, None)
+        try:
+            os.remove(self._entry_path(key))
+        except OSError:
+            pass
+
+    def save(self):
+        """Applies the size limit and writes the cache index. Call once at the end of a run."""
+        self._evict()
+        index_path = os.path.join(self.cache_dir, CACHE_INDEX_FILE_NAME)
+        try:
+            temp_index_path = index_path + ".tmp"
+            with open(temp_index_path, 'w', encoding='utf-8') as f:
+                json.dump(self._index, f)
+            os.replace(temp_index_path, index_path)
+        except Exception as e:
+            self.console_instance.print_message(f"Warning: Failed to write the parse cache index: {e}", "warning")
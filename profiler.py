@@ -0,0 +1,199 @@
+import os
+import sys
+import json
+import time
+from contextlib import contextmanager
+
+def peak_memory_bytes():
+    """
+    Returns the peak resident memory of this process in bytes, or None if it cannot be determined.
+    """
+    if sys.platform == "win32":
+        import ctypes
+        from ctypes import wintypes
+
+        class PROCESS_MEMORY_COUNTERS(ctypes.Structure):
+            _fields_ = [
+                ("cb", wintypes.DWORD),
+                ("PageFaultCount", wintypes.DWORD),
+                ("PeakWorkingSetSize", ctypes.c_size_t),
+                ("WorkingSetSize", ctypes.c_size_t),
+                ("QuotaPeakPagedPoolUsage", ctypes.c_size_t),
+                ("QuotaPagedPoolUsage", ctypes.c_size_t),
+                ("QuotaPeakNonPagedPoolUsage", ctypes.c_size_t),
+                ("QuotaNonPagedPoolUsage", ctypes.c_size_t),
+                ("PagefileUsage", ctypes.c_size_t),
+                ("PeakPagefileUsage", ctypes.c_size_t),
+            ]
+
+        counters = PROCESS_MEMORY_COUNTERS()
+        counters.cb = ctypes.sizeof(PROCESS_MEMORY_COUNTERS)
+        get_process_memory_info = ctypes.windll.psapi.GetProcessMemoryInfo
+        get_process_memory_info.argtypes = [wintypes.HANDLE, ctypes.POINTER(PROCESS_MEMORY_COUNTERS), wintypes.DWORD]
+        if get_process_memory_info(ctypes.windll.kernel32.GetCurrentProcess(), ctypes.byref(counters), counters.cb):
+            return counters.PeakWorkingSetSize
+        return None
+
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and in kilobytes on Linux
+    return peak_rss if sys.platform == "darwin" else peak_rss * 1024
+
+def format_bytes(byte_count):
+    """Formats a byte count as a short human readable string, e.g. '12.5 MB'."""
+    if byte_count is None:
+        return "n/a"
+    for unit in ["B", "KB", "MB", "GB"]:
+        if abs(byte_count) < 1024 or unit == "GB":
+            return f"{byte_count:.1f} {unit}" if unit != "B" else f"{byte_count} B"
+        byte_count /= 1024
+
+def peak_worker_memory_bytes():
+    """
+    Returns the peak resident memory of the largest finished worker process in bytes,
+    or None if it cannot be determined (always None on Windows).
+    """
+    if sys.platform == "win32":
+        return None
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak_rss = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    if peak_rss == 0:
+        return None
+    return peak_rss if sys.platform == "darwin" else peak_rss * 1024
+
+# Profiler of the current run; the stage hooks in the pipeline modules report to it
+_active_profiler = None
+
+def set_active_profiler(profiler):
+    """Makes the profiler receive the stage hooks of this process. Returns the previously active profiler."""
+    global _active_profiler
+    previous_profiler = _active_profiler
+    _active_profiler = profiler
+    return previous_profiler
+
+def active_profiler():
+    """Returns the active RunProfiler, or None if the run is not profiled."""
+    return _active_profiler
+
+@contextmanager
+def profile_stage(stage_name):
+    """Adds the wall time of the block to stage_name of the active profiler. Does nothing if no profiler is active."""
+    if _active_profiler is None:
+        yield
+        return
+    with _active_profiler.stage(stage_name):
+        yield
+
+class RunProfiler:
+    """
+    Collects the wall time of each pipeline stage and the parse time of each file of one run.
+    Stages measured inside per-file work (parse, transform, cache load) are summed over the files,
+    so with worker processes they can add up to more than the wall time of the run.
+    """
+    def __init__(self):
+        self.stage_seconds = {}
+        self.file_timings = []
+        self._run_start = time.perf_counter()
+        self._cprofile = None
+
+    @contextmanager
+    def stage(self, stage_name):
+        """Context manager that adds the wall time of the block to the stage."""
+        stage_start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.stage_seconds[stage_name] = self.stage_seconds.get(stage_name, 0.0) + time.perf_counter() - stage_start
+
+    def add_file_timing(self, file_path, parse_seconds, transform_seconds, source_rows, records):
+        """Records the parse and transform time of one file and adds them to the 'parse' and 'transform' stages."""
+        self.stage_seconds["parse"] = self.stage_seconds.get("parse", 0.0) + parse_seconds
+        self.stage_seconds["transform"] = self.stage_seconds.get("transform", 0.0) + transform_seconds
+        self.file_timings.append({
+            "file": file_path,
+            "parse_seconds": round(parse_seconds, 6),
+            "transform_seconds": round(transform_seconds, 6),
+            "source_rows": source_rows,
+            "records": records,
+            "rows_per_second": round(source_rows / parse_seconds, 1) if parse_seconds > 0 else None,
+        })
+
+    def merge_file_timings(self, file_timings):
+        """Adds the file timings collected by a worker process."""
+        for file_timing in file_timings:
+            self.add_file_timing(file_timing["file"], file_timing["parse_seconds"], file_timing["transform_seconds"],
+                                 file_timing["source_rows"], file_timing["records"])
+
+    def start_cprofile(self):
+        """Starts a cProfile capture of this process."""
+        import cProfile
+        self._cprofile = cProfile.Profile()
+        self._cprofile.enable()
+
+    def stop_cprofile(self, output_path, console_instance):
+        """Stops the cProfile capture and writes it to output_path (readable with pstats or snakeviz)."""
+        if self._cprofile is None:
+            return
+        self._cprofile.disable()
+        try:
+            self._cprofile.dump_stats(output_path)
+            console_instance.print_message(f"cProfile data was written to: {output_path}", "success")
+        except Exception as e:
+            console_instance.print_message(f"Warning: Failed to write the cProfile data: {e}", "warning")
+        self._cprofile = None
+
+    def report(self, record_count):
+        """Returns the run report as a dictionary."""
+        total_seconds = time.perf_counter() - self._run_start
+        source_rows = sum(file_timing["source_rows"] for file_timing in self.file_timings)
+        return {
+            "total_seconds": round(total_seconds, 4),
+            "files": len(self.file_timings),
+            "source_rows": source_rows,
+            "records": record_count,
+            "records_per_second": round(record_count / total_seconds, 1) if total_seconds > 0 else None,
+            "peak_memory_bytes": peak_memory_bytes(),
+            "peak_worker_memory_bytes": peak_worker_memory_bytes(),
+            "stages": {stage_name: round(seconds, 4) for stage_name, seconds in self.stage_seconds.items()},
+            "file_timings": self.file_timings,
+        }
+
+    def write_report(self, output_path, record_count, console_instance):
+        """Writes the run report as JSON and prints a short summary. Returns the report."""
+        report = self.report(record_count)
+        try:
+            with open(output_path, 'w', encoding='utf-8') as f:
+                json.dump(report, f, indent=2)
+            console_instance.print_message(f"Profile report was written to: {output_path}", "success")
+        except Exception as e:
+            console_instance.print_message(f"Warning: Failed to write the profile report: {e}", "warning")
+        self.print_summary(report, console_instance)
+        return report
+
+    def finish(self, output_base_path, record_count, console_instance, report_path=None):
+        """
+        Ends the run: detaches the profiler, writes the cProfile data (if started) to '<output_base_path>_profile.prof'
+        and the report to report_path or '<output_base_path>_profile.json'.
+        """
+        if active_profiler() is self:
+            set_active_profiler(None)
+        profile_base_path = output_base_path + "_profile"
+        self.stop_cprofile(profile_base_path + ".prof", console_instance)
+        return self.write_report(report_path or profile_base_path + ".json", record_count, console_instance)
+
+    @staticmethod
+    def print_summary(report, console_instance):
+        """Prints the stage times, throughput, slowest files and peak memory of a run report."""
+        console_instance.print_message(f"Profile: {report['records']} records from {report['files']} files in {report['total_seconds']:.2f} s "
+                                       f"({report['records_per_second'] or 0:.0f} records/s), peak memory {format_bytes(report['peak_memory_bytes'])}.", "info")
+        for stage_name, seconds in report["stages"].items():
+            console_instance.print_message(f"    {stage_name}: {seconds:.3f} s", "info")
+        slowest_files = sorted(report["file_timings"], key=lambda file_timing: file_timing["parse_seconds"], reverse=True)[:3]
+        for file_timing in slowest_files:
+            console_instance.print_message(f"    slowest parse: {os.path.basename(file_timing['file'])} {file_timing['parse_seconds']:.3f} s ({file_timing['source_rows']} rows)", "info")
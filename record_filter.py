@@ -0,0 +1,100 @@
+import re
+import numpy as np
+import pandas as pd
+
+from cli_options import FILTER_SIDES
+
+def split_filter_values(values):
+    """Returns the values of a comma-separated string (or a list of strings) without blanks, or None if there are none."""
+    if values is None:
+        return None
+    if isinstance(values, str):
+        values = values.split(',')
+    values = [value.strip() for value in values if value and value.strip()]
+    return values or None
+
+def source_variant(record_filter):
+    """
+    Returns the filter part of the state kept for each source file by the append output and the SQLite store:
+    '' without an active filter, otherwise RecordFilter.cache_variant().
+    """
+    if record_filter is None or not record_filter.is_active:
+        return ""
+    return record_filter.cache_variant()
+
+class RecordFilter:
+    """
+    Selects the defects to keep while the files are parsed: Class Name and Grade Defect (as split by
+    data_processor.process_records), side and minimum Height/Width in mm. Unset criteria keep every record.
+    Sides that are not wanted are not parsed at all, and with a class filter only the lines that contain one of
+    the class names are handed to the CSV engine (see csv_parser); the exact checks are done in process_records.
+    """
+    def __init__(self, classes=None, grades=None, side=None, min_height=None, min_width=None):
+        self.classes = split_filter_values(classes)
+        self.grades = split_filter_values(grades)
+        self.side = side
+        self.min_height = min_height
+        self.min_width = min_width
+        if self.side is not None and self.side not in FILTER_SIDES:
+            raise ValueError(f"side must be one of {', '.join(FILTER_SIDES)}")
+
+        # A line can only hold a wanted class if the class name appears in it literally (a quoted name with escaped
+        # quotes would not, so no line is skipped for those)
+        self.line_pattern = None
+        if self.classes and not any('"' in class_name for class_name in self.classes):
+            self.line_pattern = re.compile(b"|".join(re.escape(class_name.encode('utf-8')) for class_name in self.classes))
+
+    @property
+    def is_active(self):
+        return any(criterion is not None for criterion in (self.classes, self.grades, self.side, self.min_height, self.min_width))
+
+    def includes_side(self, side):
+        """Returns False if the 'Top' or 'Bottom' section does not need to be parsed."""
+        return self.side is None or self.side == side
+
+    def class_mask(self, unique_class, unique_grade):
+        """Returns a boolean array over the distinct class names: True where Class Name and Grade Defect are wanted."""
+        keep_mask = np.ones(len(unique_class), dtype=bool)
+        if self.classes is not None:
+            keep_mask &= unique_class.isin(self.classes).to_numpy()
+        if self.grades is not None:
+            keep_mask &= unique_grade.isin(self.grades).to_numpy()
+        return keep_mask
+
+    def size_mask(self, section_df: pd.DataFrame):
+        """Returns a boolean array over the rows of a parsed section for the minimum Height/Width, or None if none is set."""
+        keep_mask = None
+        for source_column, minimum in (("Height mm", self.min_height), ("Width mm", self.min_width)):
+            if minimum is None:
+                continue
+            if source_column in section_df.columns:
+                column_mask = (pd.to_numeric(section_df[source_column], errors="coerce") >= minimum).to_numpy(dtype=bool, na_value=False)
+            else:
+                column_mask = np.zeros(len(section_df), dtype=bool)
+            keep_mask = column_mask if keep_mask is None else keep_mask & column_mask
+        return keep_mask
+
+    def cache_variant(self):
+        """Identifies the filter in parse cache keys, so filtered and unfiltered records are stored apart."""
+        return ";".join([
+            "classes=" + ",".join(self.classes or []),
+            "grades=" + ",".join(self.grades or []),
+            f"side={self.side or ''}",
+            f"min_height={'' if self.min_height is None else repr(float(self.min_height))}",
+            f"min_width={'' if self.min_width is None else repr(float(self.min_width))}",
+        ])
+
+    def describe(self):
+        """Returns the criteria as text for the log."""
+        criteria = []
+        if self.classes is not None:
+            criteria.append(f"Class Name in {', '.join(self.classes)}")
+        if self.grades is not None:
+            criteria.append(f"Grade Defect in {', '.join(self.grades)}")
+        if self.side is not None:
+            criteria.append(f"{self.side} side only")
+        if self.min_height is not None:
+            criteria.append(f"Height >= {self.min_height:g} mm")
+        if self.min_width is not None:
+            criteria.append(f"Width >= {self.min_width:g} mm")
+        return "; ".join(criteria)
@@ -0,0 +1,100 @@
+import os
+import numpy as np
+import pandas as pd
+
+from data_processor import widen_float32_columns
+from file_scanner import OUTPUT_CSV_SUFFIX
+
+SUMMARY_GROUP_COLUMNS = ["Coil No", "Class Name", "Grade Defect", "Top/Bottom"]
+SUMMARY_VALUE_COLUMNS = [
+    "Count", "Total Area (mm2)", "Max Area (mm2)",
+    "Min Distance from HE CGL (m)", "Max Distance from HE CGL (m)",
+]
+SUMMARY_COLUMNS = SUMMARY_GROUP_COLUMNS + SUMMARY_VALUE_COLUMNS
+# How each value column of two partial summaries is combined
+SUMMARY_COMBINE_FUNCTIONS = {
+    "Count": "sum",
+    "Total Area (mm2)": "sum",
+    "Max Area (mm2)": "max",
+    "Min Distance from HE CGL (m)": "min",
+    "Max Distance from HE CGL (m)": "max",
+}
+# Partial summaries are merged into one after this many files, so the list does not grow with the run
+COMPACT_AFTER_PARTIALS = 200
+
+def summarize_records(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Returns the partial summary of one batch of processed records: per Coil No, Class Name, Grade Defect and Top/Bottom
+    the number of defects, the total and largest area (Height x Width) and the first and last position along the coil.
+    """
+    if df.empty:
+        return pd.DataFrame(columns=SUMMARY_COLUMNS)
+
+    # Decimal values as written in the CSV, so 12.3 x 4.5 gives 55.35 and not 55.350000858...
+    sizes = widen_float32_columns(df[["Height", "Width"]])
+    grouped_df = pd.DataFrame({
+        **{column_name: df[column_name] for column_name in SUMMARY_GROUP_COLUMNS},
+        "Area": pd.to_numeric(sizes["Height"], errors="coerce") * pd.to_numeric(sizes["Width"], errors="coerce"),
+        # Min and max pick existing values, so the positions keep their type and are widened once in DefectSummary.result()
+        "Position": pd.to_numeric(df["Distance from HE CGL (m)"], errors="coerce"),
+    })
+    groups = grouped_df.groupby(SUMMARY_GROUP_COLUMNS, observed=True, sort=False)
+    partial_summary = pd.DataFrame({
+        "Count": groups.size(),
+        "Total Area (mm2)": groups["Area"].sum(),
+        "Max Area (mm2)": groups["Area"].max(),
+        "Min Distance from HE CGL (m)": groups["Position"].min(),
+        "Max Distance from HE CGL (m)": groups["Position"].max(),
+    })
+    return partial_summary.reset_index()
+
+def combine_summaries(partial_summaries: list) -> pd.DataFrame:
+    """Merges partial summaries (of different files or of earlier merges) into one summary."""
+    non_empty_summaries = [partial_summary for partial_summary in partial_summaries if not partial_summary.empty]
+    if not non_empty_summaries:
+        return pd.DataFrame(columns=SUMMARY_COLUMNS)
+
+    # Group on plain strings: the partial summaries carry categoricals with different categories
+    combined_df = pd.concat([
+        partial_summary.astype({column_name: object for column_name in SUMMARY_GROUP_COLUMNS})
+        for partial_summary in non_empty_summaries
+    ], ignore_index=True)
+    return combined_df.groupby(SUMMARY_GROUP_COLUMNS, sort=False).agg(SUMMARY_COMBINE_FUNCTIONS).reset_index()
+
+class DefectSummary:
+    """
+    Summary aggregates that are updated as each file's records arrive (see compile_pipeline.compile_files),
+    so the summary never needs the complete record set.
+    """
+    def __init__(self):
+        self._partial_summaries = []
+
+    def add(self, df: pd.DataFrame):
+        """Adds the records of one file."""
+        partial_summary = summarize_records(df)
+        if partial_summary.empty:
+            return
+        self._partial_summaries.append(partial_summary)
+        if len(self._partial_summaries) >= COMPACT_AFTER_PARTIALS:
+            self._partial_summaries = [combine_summaries(self._partial_summaries)]
+
+    def result(self) -> pd.DataFrame:
+        """Returns the summary of all records added so far, sorted by Coil No, Class Name, Grade Defect and Top/Bottom."""
+        summary_df = widen_float32_columns(combine_summaries(self._partial_summaries))
+        summary_df = summary_df.sort_values(SUMMARY_GROUP_COLUMNS, kind="stable", ignore_index=True)
+        summary_df["Count"] = summary_df["Count"].astype(np.int64)
+        return summary_df
+
+def write_summary_file(summary_df: pd.DataFrame, folder_path: str, output_file_name_base: str, console_instance):
+    """
+    Writes the summary next to the detail output as '<output_file_name_base>_summary.compiled.csv'.
+    Returns the path of the file, or None if it could not be written.
+    """
+    output_path = os.path.join(folder_path, f"{output_file_name_base}_summary{OUTPUT_CSV_SUFFIX}")
+    try:
+        summary_df.to_csv(output_path, index=False)
+    except Exception as e:
+        console_instance.print_message(f"Error saving summary file: {e}", "error")
+        return None
+    console_instance.print_message(f"The summary file was created successfully: {output_path}", "success")
+    return output_path
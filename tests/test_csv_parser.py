@@ -0,0 +1,36 @@
+import pytest
+
+from console.buffered_console import BufferedConsole
+from csv_parser import parse_csv_sections, COMMON_HEADER_STR
+
+SINGLE_ROW_BOTTOM_FILE = (
+    "SDD Export\n"
+    "Top\n"
+    f"{COMMON_HEADER_STR}\n"
+    "1,Dent-B2-y-Small,1707.61,1203.4,94.7,-573.1,38.048,23.612,0.3796,0\n"
+    "2,Oil-C,2779.52,624.3,1374.4,633.3,5.000,31.468,0.7236,90\n"
+    "\n"
+    # Like the Top section, the Bottom rows start 3 lines after the section name
+    "Bottom\n"
+    "SDD Export\n"
+    f"{COMMON_HEADER_STR}\n"
+    # The last row of the file, without a newline
+    "5,Hole-A-E-Pin,1,2,3,4,5,6,0.5,45"
+)
+
+@pytest.mark.parametrize("mode, engine", [("mmap", "c"), ("mmap", "pyarrow"), ("lines", "c")])
+def test_single_row_final_section_without_newline(tmp_path, mode, engine):
+    if engine == "pyarrow":
+        pytest.importorskip("pyarrow")
+    file_path = tmp_path / "Line1.25-06-01.KE5500 00.Defects.csv"
+    file_path.write_bytes(SINGLE_ROW_BOTTOM_FILE.encode("utf-8"))
+    console = BufferedConsole()
+
+    top_df, bottom_df = parse_csv_sections(str(file_path), console, mode, engine)
+
+    assert not [message for message, message_type in console.messages if message_type == "error"]
+    assert len(top_df) == 2
+    assert len(bottom_df) == 1
+    assert bottom_df["Defect No."].tolist() == [5]
+    assert bottom_df["Class Name"].astype(str).tolist() == ["Hole-A-E-Pin"]
+    assert bottom_df["Orientation"].tolist() == [45]
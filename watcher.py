@@ -0,0 +1,308 @@
+import os
+import csv
+import json
+import time
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+
+from archive_reader import source_stat, source_file_name
+from cli_options import DEFAULT_POLL_SECONDS, DEFAULT_SETTLE_SECONDS
+from data_processor import APPEND_KEY_COLUMNS, DEFECT_NO_COLUMN, encode_defect_keys
+from file_processor import process_csv_file
+from file_scanner import FileManifest
+from record_filter import source_variant
+
+# Sorted key arrays of appended files are merged into one after this many files
+KEY_CHUNKS_BEFORE_MERGE = 16
+# In watch mode a file that cannot be read is tried again after settle_seconds, doubling the wait after each attempt,
+# and given up after this many attempts until the file changes
+MAX_READ_ATTEMPTS = 5
+
+class RollingCsvOutput:
+    """
+    CSV file that grows as new source files are processed, in watch mode and with --append.
+    The source files already appended (path, size, mtime and the RecordFilter they were read with) are kept in a
+    '.sources.json' file next to it, so a restarted run does not append the same file twice; a file read with
+    another filter counts as changed. It also records the length of the CSV and '.keys' files
+    after the last complete append; rows of an interrupted append beyond that length are cut off when the file is
+    opened again, and the source is appended again.
+    If the columns include Defect No., records whose (Coil No, Defect No., Top/Bottom) is already in the file are
+    skipped. Their keys are kept in a '.keys' file next to it (one int64 per record), so the rows written earlier
+    are never read back.
+    Has the writer interface of compile_pipeline (write(df, file_path) and close()).
+    """
+    # Files that could not be read completely are not recorded, so the next run reads them again
+    skip_failed_files = True
+
+    def __init__(self, output_path, columns, console_instance, record_filter=None):
+        self.output_path = output_path
+        self.columns = list(columns)
+        self.console_instance = console_instance
+        self.source_variant = source_variant(record_filter)
+        self.sources_path = output_path + ".sources.json"
+        self.keys_path = output_path + ".keys"
+        self.rows_appended = 0
+        self.files_appended = 0
+        self.duplicates_skipped = 0
+        self._sources = {}
+        # Length in bytes of the CSV and '.keys' files after the last complete append (None: not recorded)
+        self._csv_bytes = None
+        self._keys_bytes = None
+        # Sorted arrays of the keys in the file; loaded on the first append and merged every KEY_CHUNKS_BEFORE_MERGE files
+        self._key_chunks = None
+
+        if os.path.exists(self.sources_path):
+            try:
+                with open(self.sources_path, 'r', encoding='utf-8') as f:
+                    sources_state = json.load(f)
+                if isinstance(sources_state.get("sources"), dict):
+                    self._sources = sources_state["sources"]
+                    self._csv_bytes = sources_state.get("csv_bytes")
+                    self._keys_bytes = sources_state.get("keys_bytes")
+                else:
+                    # Written before the file lengths were recorded: only the sources
+                    self._sources = sources_state
+            except Exception as e:
+                self.console_instance.print_message(f"Warning: Failed to read '{self.sources_path}', sources are tracked from now on: {e}", "warning")
+        self._remove_incomplete_append()
+
+        # Rows are always appended in the column order of an existing file
+        existing_columns = self._read_header()
+        if existing_columns is not None:
+            self.columns = existing_columns
+        self.deduplicate = all(column_name in self.columns for column_name in APPEND_KEY_COLUMNS)
+        if existing_columns is not None and not self.deduplicate:
+            self.console_instance.print_message(f"Warning: '{self.output_path}' has no '{DEFECT_NO_COLUMN}' column, so duplicate records are not detected.", "warning")
+
+    def _remove_incomplete_append(self):
+        """
+        Cuts the CSV file back to its length after the last complete append. The '.keys' file is cut back the same way,
+        or deleted (and rebuilt from the CSV file) if it did not exist at that point.
+        """
+        if self._csv_bytes is None:
+            return
+        if os.path.exists(self.output_path) and os.path.getsize(self.output_path) > self._csv_bytes:
+            self.console_instance.print_message(f"Warning: '{self.output_path}' ends with the rows of an interrupted append; they are removed and their source file is appended again.", "warning")
+            with open(self.output_path, 'r+b') as f:
+                f.truncate(self._csv_bytes)
+        if os.path.exists(self.keys_path):
+            if self._keys_bytes is None:
+                os.remove(self.keys_path)
+            elif os.path.getsize(self.keys_path) > self._keys_bytes:
+                with open(self.keys_path, 'r+b') as f:
+                    f.truncate(self._keys_bytes)
+
+    def _save_sources(self):
+        """Writes the appended sources and the current length of the CSV and '.keys' files to '.sources.json'."""
+        self._csv_bytes = os.path.getsize(self.output_path) if os.path.exists(self.output_path) else 0
+        self._keys_bytes = os.path.getsize(self.keys_path) if os.path.exists(self.keys_path) else None
+        temp_sources_path = self.sources_path + ".tmp"
+        with open(temp_sources_path, 'w', encoding='utf-8') as f:
+            json.dump({"csv_bytes": self._csv_bytes, "keys_bytes": self._keys_bytes, "sources": self._sources}, f)
+        os.replace(temp_sources_path, self.sources_path)
+
+    def _read_header(self):
+        """Returns the column names of the existing output file, or None if it is new or empty."""
+        if not os.path.exists(self.output_path) or os.path.getsize(self.output_path) == 0:
+            return None
+        with open(self.output_path, 'r', encoding='utf-8', newline='') as f:
+            return next(csv.reader(f), None)
+
+    @staticmethod
+    def _source_key(file_path):
+        return os.path.normcase(os.path.abspath(file_path))
+
+    def contains(self, file_path, file_stat):
+        """Returns True if this version of the source file was already appended with the same filter."""
+        source = self._sources.get(self._source_key(file_path))
+        return (source is not None and source["size"] == file_stat.st_size and source["mtime_ns"] == file_stat.st_mtime_ns
+                and source.get("variant", "") == self.source_variant)
+
+    def files_to_append(self, csv_files):
+        """Returns the files of csv_files that are new or changed (or read with another filter) since they were appended."""
+        new_files = []
+        for file_path in csv_files:
+            try:
+                if self.contains(file_path, source_stat(file_path)):
+                    continue
+            except OSError:
+                continue
+            new_files.append(file_path)
+        if len(new_files) < len(csv_files):
+            self.console_instance.print_message(f"{len(csv_files) - len(new_files)} of {len(csv_files)} files are already in '{self.output_path}' and are skipped.", "info")
+        return new_files
+
+    def _load_keys(self):
+        """
+        Loads the keys of the records in the file. An output written before keys were tracked
+        is read once (key columns only) to create the '.keys' file.
+        """
+        if os.path.exists(self.keys_path):
+            known_keys = np.fromfile(self.keys_path, dtype="<i8")
+        elif self._read_header() is not None:
+            existing_df = pd.read_csv(self.output_path, usecols=APPEND_KEY_COLUMNS, dtype={"Coil No": str, "Top/Bottom": str},
+                                      keep_default_na=False, na_values={DEFECT_NO_COLUMN: [""]})
+            known_keys, valid_mask = encode_defect_keys(existing_df)
+            known_keys = np.sort(known_keys[valid_mask])
+            known_keys.astype("<i8").tofile(self.keys_path)
+        else:
+            known_keys = np.empty(0, dtype=np.int64)
+        # The file is a series of sorted runs (one per appended file), which a stable sort merges quickly
+        self._key_chunks = [np.sort(known_keys, kind="stable")]
+
+    def _drop_known_records(self, processed_df):
+        """
+        Returns (the records whose key is neither in the file nor earlier in the batch, their sorted keys).
+        Records without a complete key are always kept.
+        """
+        if self._key_chunks is None:
+            self._load_keys()
+        keys, valid_mask = encode_defect_keys(processed_df)
+
+        first_occurrence = np.zeros(len(keys), dtype=bool)
+        valid_positions = np.flatnonzero(valid_mask)
+        _, first_positions = np.unique(keys[valid_positions], return_index=True)
+        first_occurrence[valid_positions[first_positions]] = True
+
+        known_mask = np.zeros(len(keys), dtype=bool)
+        for key_chunk in self._key_chunks:
+            if len(key_chunk) == 0:
+                continue
+            positions = np.minimum(np.searchsorted(key_chunk, keys), len(key_chunk) - 1)
+            known_mask |= key_chunk[positions] == keys
+
+        keep_mask = ~valid_mask | (first_occurrence & ~known_mask)
+        self.duplicates_skipped += int(len(keep_mask) - keep_mask.sum())
+        new_keys = np.sort(keys[keep_mask & valid_mask])
+        self._key_chunks.append(new_keys)
+        if len(self._key_chunks) > KEY_CHUNKS_BEFORE_MERGE:
+            self._key_chunks = [np.sort(np.concatenate(self._key_chunks), kind="stable")]
+        return processed_df[keep_mask], new_keys
+
+    def append(self, file_path, file_stat, processed_df):
+        """
+        Appends the processed records of a source file, without the records already in the file,
+        and records the file as done. Returns the number of rows appended.
+        """
+        # Before the first append the starting length is recorded, so even that append can be undone if it is interrupted
+        if not os.path.exists(self.sources_path):
+            self._save_sources()
+        processed_df = processed_df.reindex(columns=self.columns, fill_value=None)
+        new_keys = None
+        if self.deduplicate and not processed_df.empty:
+            processed_df, new_keys = self._drop_known_records(processed_df)
+        if not processed_df.empty:
+            write_header = not os.path.exists(self.output_path) or os.path.getsize(self.output_path) == 0
+            processed_df.to_csv(self.output_path, mode='a', header=write_header, index=False)
+        # The source and the new file lengths are recorded last: if the run stops before that, the next run cuts off
+        # the rows and keys written here (see _remove_incomplete_append) and appends the file again
+        if new_keys is not None and len(new_keys) > 0:
+            with open(self.keys_path, 'ab') as f:
+                new_keys.astype("<i8").tofile(f)
+
+        self._sources[self._source_key(file_path)] = {
+            "size": file_stat.st_size, "mtime_ns": file_stat.st_mtime_ns, "rows": len(processed_df), "variant": self.source_variant,
+        }
+        self._save_sources()
+        self.rows_appended += len(processed_df)
+        self.files_appended += 1
+        return len(processed_df)
+
+    def write(self, df, file_path=None):
+        """Appends the records of one source file (compile_pipeline writer interface)."""
+        if file_path is None:
+            raise ValueError("The rolling output needs the source file path of each batch.")
+        try:
+            file_stat = source_stat(file_path)
+        except OSError as e:
+            self.console_instance.print_message(f"Error: '{source_file_name(file_path)}' is not appended, it can no longer be read: {e}", "error")
+            return
+        self.append(file_path, file_stat, df)
+
+    def close(self):
+        """Reports what was appended. Returns the number of rows appended."""
+        duplicates_message = f", {self.duplicates_skipped} duplicate records were skipped" if self.deduplicate else ""
+        self.console_instance.print_message(f"{self.rows_appended} rows from {self.files_appended} files were appended to '{self.output_path}'{duplicates_message}.", "success")
+        return self.rows_appended
+
+def watch_folder(folder_path, rolling_output, console_instance, start_date, recursive=False,
+                 poll_seconds=DEFAULT_POLL_SECONDS, settle_seconds=DEFAULT_SETTLE_SECONDS,
+                 parser_mode="mmap", csv_engine="c", record_filter=None):
+    """
+    Polls the folder for CSV files modified since start_date and appends each one to the rolling output
+    once it has stopped growing (same size and mtime for settle_seconds). Runs until interrupted (Ctrl+C).
+    A file that cannot be read completely is not appended and is tried again with a growing delay, at most
+    MAX_READ_ATTEMPTS times until it changes. A file rewritten after it was appended is appended again.
+    If a RecordFilter is given, only the records it selects are appended.
+    """
+    manifest = FileManifest(folder_path, console_instance)
+    # path -> (size, mtime_ns, time the file was first seen with this size and mtime)
+    pending_files = {}
+    # path -> (size, mtime) in the manifest of the files already in the rolling output; they are not stat'ed
+    # again on later polls unless the manifest shows them changed
+    finished_files = {}
+    # path -> ((size, mtime_ns), failed attempts, time of the next attempt) of the files that could not be read
+    failed_files = {}
+    output_key = RollingCsvOutput._source_key(rolling_output.output_path)
+
+    console_instance.print_message(f"Watching '{folder_path}' for new CSV files. Press Ctrl+C to stop.", "info")
+    try:
+        while True:
+            # The manifest reuses the entries (and gzip/zip reads) of files whose mtime and size are unchanged
+            manifest.update(recursive)
+            now = time.time()
+            for file_path in manifest.files_between(start_date, datetime.now() + timedelta(days=1)):
+                file_info = manifest.file_info(file_path)
+                manifest_state = (file_info["size"], file_info["mtime_on_disk"]) if file_info is not None else None
+                if (manifest_state is not None and finished_files.get(file_path) == manifest_state) or RollingCsvOutput._source_key(file_path) == output_key:
+                    continue
+                try:
+                    file_stat = source_stat(file_path)
+                except OSError:
+                    pending_files.pop(file_path, None)
+                    continue
+                if rolling_output.contains(file_path, file_stat):
+                    finished_files[file_path] = manifest_state
+                    continue
+
+                file_state = (file_stat.st_size, file_stat.st_mtime_ns)
+                failed_state = failed_files.get(file_path)
+                if failed_state is not None:
+                    if failed_state[0] != file_state:
+                        # The file changed, so it gets its full number of attempts again
+                        del failed_files[file_path]
+                    elif failed_state[1] >= MAX_READ_ATTEMPTS or now < failed_state[2]:
+                        continue
+
+                # A file that is still being written keeps changing size or mtime; wait until it settles
+                pending_state = pending_files.get(file_path)
+                if pending_state is None or pending_state[:2] != file_state:
+                    pending_files[file_path] = file_state + (now,)
+                    continue
+                if now - pending_state[2] < settle_seconds:
+                    continue
+
+                del pending_files[file_path]
+                processed_df, read_failed = process_csv_file(file_path, console_instance, parser_mode, csv_engine, record_filter)
+                if read_failed:
+                    # Not recorded as done: the file is read again after a delay that doubles with each attempt
+                    attempts = (failed_state[1] if failed_state is not None and failed_state[0] == file_state else 0) + 1
+                    retry_seconds = settle_seconds * 2 ** attempts
+                    failed_files[file_path] = (file_state, attempts, now + retry_seconds)
+                    if attempts >= MAX_READ_ATTEMPTS:
+                        console_instance.print_message(f"Error: '{source_file_name(file_path)}' could not be read in {attempts} attempts and is skipped until it changes.", "error")
+                    else:
+                        console_instance.print_message(f"Warning: '{source_file_name(file_path)}' could not be read completely and is retried in {retry_seconds:g} s.", "warning")
+                    continue
+                failed_files.pop(file_path, None)
+                finished_files[file_path] = manifest_state
+                appended_rows = rolling_output.append(file_path, file_stat, processed_df)
+                console_instance.print_message(f"Appended {appended_rows} rows from '{source_file_name(file_path)}' to '{rolling_output.output_path}'.", "success")
+
+            manifest.save()
+            time.sleep(poll_seconds)
+    except KeyboardInterrupt:
+        manifest.save()
+        console_instance.print_message("Watch mode stopped.", "info")